@@ -10,9 +10,60 @@ class Settings(BaseSettings):
     app_name: str = Field(default=os.getenv("APP_NAME", "Municipal Data Platform"))
     debug: bool = Field(default=os.getenv("DEBUG", "false").lower() == "true")
     cors_origins: List[str] = Field(default_factory=lambda: _split_csv(os.getenv("CORS_ORIGINS")))
-    llm_provider: str = Field(default=os.getenv("LLM_PROVIDER", "echo"))
+    llm_provider: str = Field(default=os.getenv("LLM_PROVIDER", "echo"))  # echo | fake | http
+    llm_base_url: str = Field(default=os.getenv("LLM_BASE_URL", "https://api.openai.com/v1"))
+    llm_model: str = Field(default=os.getenv("LLM_MODEL", "gpt-4o-mini"))
+    llm_api_key: str = Field(default=os.getenv("LLM_API_KEY", ""))
+    # provider pool: calls in flight, calls allowed to wait (beyond that: 503), deadlines and retries
+    llm_max_in_flight: int = Field(default=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")))
+    llm_max_queue: int = Field(default=int(os.getenv("LLM_MAX_QUEUE", "32")))
+    llm_queue_timeout: float = Field(default=float(os.getenv("LLM_QUEUE_TIMEOUT", "5")))
+    llm_timeout: float = Field(default=float(os.getenv("LLM_TIMEOUT", "30")))
+    llm_retries: int = Field(default=int(os.getenv("LLM_RETRIES", "2")))
+    llm_retry_backoff: float = Field(default=float(os.getenv("LLM_RETRY_BACKOFF", "0.2")))
+    # fake provider (offline load tests): mean latency, +/- jitter (seconds) and failure probability
+    fake_llm_latency: float = Field(default=float(os.getenv("FAKE_LLM_LATENCY", "0.5")))
+    fake_llm_jitter: float = Field(default=float(os.getenv("FAKE_LLM_JITTER", "0.25")))
+    fake_llm_error_rate: float = Field(default=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")))
+    # delay (seconds) before each chunk streamed by the echo provider
+    echo_chunk_delay: float = Field(default=float(os.getenv("ECHO_CHUNK_DELAY", "0")))
+    # token budget for the retrieved school lines in the agent prompt (0 disables retrieval)
+    agent_context_tokens: int = Field(default=int(os.getenv("AGENT_CONTEXT_TOKENS", "600")))
+    # agent reply cache: in-memory LRU (0 entries disables) plus optional on-disk tier (empty dir disables)
+    agent_cache_size: int = Field(default=int(os.getenv("AGENT_CACHE_SIZE", "256")))
+    agent_cache_ttl: float = Field(default=float(os.getenv("AGENT_CACHE_TTL", "3600")))
+    agent_cache_dir: str = Field(default=os.getenv("AGENT_CACHE_DIR", ""))
+    agent_cache_disk_ttl: float = Field(default=float(os.getenv("AGENT_CACHE_DISK_TTL", "86400")))
     data_file: str = Field(default=os.getenv("DATA_FILE", "data/municipalities.sample.json"))
     polygon_file: str = Field(default=os.getenv("POLYGON_FILE", "data/municipalities.polygons.json"))
+    # simplification levels (degrees) served by /municipalities/polygons; level 0 is always the original
+    polygon_tolerances: List[float] = Field(default_factory=lambda: [float(v) for v in _split_csv(os.getenv("POLYGON_TOLERANCES", "0.001,0.005,0.02"))])
+    # school datasets are partitioned by UF: "{uf}" in these paths is replaced by the state code
+    ideb_ef1_file: str = Field(default=os.getenv("IDEB_EF1_FILE", "data/IDEB_ANOS_INICIAIS_{uf}.csv"))
+    ideb_ef2_file: str = Field(default=os.getenv("IDEB_EF2_FILE", "data/IDEB_ANOS_FINAIS_{uf}.csv"))
+    ideb_em_file: str = Field(default=os.getenv("IDEB_EM_FILE", "data/IDEB_ENSINO_MEDIO_{uf}.csv"))
+    # year-partitioned long IDEB store ("{uf}" as above); empty reads the CSVs only,
+    # an empty directory is seeded from the CSVs on first load
+    ideb_store_dir: str = Field(default=os.getenv("IDEB_STORE_DIR", ""))
+    infra_fund_file: str = Field(default=os.getenv("INFRA_FUND_FILE", "data/{uf}_INFRAESTRUTURA_FUND_SCORE_2023.csv"))
+    infra_med_file: str = Field(default=os.getenv("INFRA_MED_FILE", "data/{uf}_INFRAESTRUTURA_MED_SCORE_2023.csv"))
+    # UF used when a request names a city without a code or ?uf=; loaded at startup and never evicted
+    default_uf: str = Field(default=os.getenv("DEFAULT_UF", "PB"))
+    # UFs served (empty: every UF whose IDEB EF1 file exists)
+    ufs: List[str] = Field(default_factory=lambda: [u.upper() for u in _split_csv(os.getenv("UFS"))])
+    # memory budget (MB) for the loaded UF partitions; least recently used states are evicted beyond it
+    partition_budget_mb: float = Field(default=float(os.getenv("PARTITION_BUDGET_MB", "1024")))
+    score_cache_size: int = Field(default=int(os.getenv("SCORE_CACHE_SIZE", "128")))
+    choropleth_cache_size: int = Field(default=int(os.getenv("CHOROPLETH_CACHE_SIZE", "32")))
+    # Cache-Control max-age (seconds) for read endpoints; revalidation uses the dataset ETag
+    cache_max_age: int = Field(default=int(os.getenv("CACHE_MAX_AGE", "300")))
+    schools_file: str = Field(default=os.getenv("SCHOOLS_FILE", "data/ALL_SCHOOLS_{uf}_WITH_SCORES.csv"))
+    # POST /admin/reload requires this token in X-Admin-Token (empty disables the endpoint)
+    admin_token: str = Field(default=os.getenv("ADMIN_TOKEN", ""))
+    # poll the data files every N seconds and reload on change (0 disables)
+    reload_poll_seconds: float = Field(default=float(os.getenv("RELOAD_POLL_SECONDS", "0")))
+    # binary columnar cache of the parsed CSVs; empty disables it
+    snapshot_dir: str = Field(default=os.getenv("SNAPSHOT_DIR", "data/.snapshots"))
 
     class Config:
         env_file = ".env"
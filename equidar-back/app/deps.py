@@ -1,43 +1,374 @@
 from pathlib import Path
+import asyncio
 import json
-import geopandas as gpd
-from fastapi import Depends
+import logging
+import os
+import time
+import pandas as pd
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, Request
 from app.config import settings
-from app.models import Municipality
+from app.models import Municipality, PageParams, ScoreParams
 from app.services.municipalities import MunicipalityService
 from app.services.scoring import ScoringService
 from app.services.agent import AgentService
+from app.services.agent_cache import ResponseCache
+from app.services.ideb import IDEBService
+from app.services.ideb_store import IDEBStore
+from app.services.infra import InfraService
+from app.services.snapshot import load_or_build
+from app.services.indicadores import IndicadoresService, MEANS_VERSION, municipality_means
+from app.services.registry import DataRegistry, dataset_version
+from app.services.keys import SchoolKeyspace, UF_BY_CODE, uf_from_code
+from app.services.partitions import PartitionManager
+from app.services.geometry import GeometryService, read_polygons
+from app.services.spatial import SpatialIndex
+from app.services.choropleth import ChoroplethService
+from app.services.retrieval import SchoolRetriever, PartitionedRetriever
+from app.llm.base import BaseLLM
 from app.llm.echo import EchoProvider
+from app.llm.fake import FakeProvider
+from app.llm.http import HTTPProvider
+from app.llm.pool import PooledProvider
+
+logger = logging.getLogger(__name__)
+
+# format versions of the derived tables: part of the data version (ETags, snapshots)
+DATA_FORMATS = (IDEBService.SNAPSHOT_VERSION, InfraService.SNAPSHOT_VERSION, IDEBStore.VERSION)
 
 # Load data once at startup; keep it simple (in-memory).
 def load_data() -> list[Municipality]:
+    # `polygon` stays unset: geometry is served by /municipalities/polygons and the choropleth
     data_path = Path(settings.data_file)
-    polygon_path = Path(settings.polygon_file)
     items = json.loads(data_path.read_text(encoding="utf-8"))
-    gdf = gpd.read_file(polygon_path)
-    polygons = {row["id"]: row["geometry"] for _, row in gdf.iterrows()}
-    municipalities = [Municipality(**it) for it in items]
-    for m in municipalities:
-        m.polygon = polygons.get(m.id)
-    return municipalities
-
-# Singletons (created in main.py and injected here)
-_municipality_service: MunicipalityService | None = None
-_scoring_service: ScoringService | None = None
-_agent_service: AgentService | None = None
-
-def init_services(data_items: list[Municipality]) -> None:
-    global _municipality_service, _scoring_service, _agent_service
-    _municipality_service = MunicipalityService(data_items)
-    _scoring_service = ScoringService()
-    provider = EchoProvider()  # swap when you add another provider
-    _agent_service = AgentService(provider)
-
-def get_municipality_service() -> MunicipalityService:
-    return _municipality_service  # type: ignore
-
-def get_scoring_service() -> ScoringService:
-    return _scoring_service  # type: ignore
-
-def get_agent_service() -> AgentService:
-    return _agent_service  # type: ignore
+    return [Municipality(**it) for it in items]
+
+def load_geometry() -> GeometryService:
+    polygons, names = read_polygons(settings.polygon_file)
+    return GeometryService(polygons, settings.polygon_tolerances, names=names)
+
+# Datasets shared by every UF (polygons): loaded once per snapshot.
+def load_datasets() -> DataRegistry:
+    registry = DataRegistry()
+    registry.load("geometry", load_geometry)
+    registry.load("spatial", lambda: SpatialIndex(registry.get("geometry").features))
+    registry.version = dataset_version(dataset_sources(), DATA_FORMATS)
+    return registry
+
+def partition_files(uf: str) -> dict[str, str]:
+    # caminhos dos arquivos da UF ("{uf}" nos caminhos configurados)
+    uf = uf.upper()
+    return {
+        "ideb_ef1": settings.ideb_ef1_file.format(uf=uf),
+        "ideb_ef2": settings.ideb_ef2_file.format(uf=uf),
+        "ideb_em": settings.ideb_em_file.format(uf=uf),
+        "infra_fund": settings.infra_fund_file.format(uf=uf),
+        "infra_med": settings.infra_med_file.format(uf=uf),
+        "schools": settings.schools_file.format(uf=uf),
+    }
+
+def ideb_store(uf: str) -> IDEBStore | None:
+    # base longa do IDEB da UF (partições por ano); None quando não configurada
+    if not settings.ideb_store_dir:
+        return None
+    return IDEBStore(settings.ideb_store_dir.format(uf=uf.upper()))
+
+def available_ufs() -> list[str]:
+    if settings.ufs:
+        return settings.ufs
+    if "{uf}" not in settings.ideb_ef1_file:
+        return [settings.default_uf.upper()]  # caminhos fixos: uma única UF
+    return [
+        uf for uf in UF_BY_CODE.values()
+        if Path(partition_files(uf)["ideb_ef1"]).exists() or (ideb_store(uf) or IDEBStore()).partitions()
+    ]
+
+def _load_ideb(uf: str, files: dict[str, str]) -> IDEBService:
+    return IDEBService(
+        files["ideb_ef1"],
+        files["ideb_ef2"],
+        files["ideb_em"],
+        snapshot_dir=settings.snapshot_dir,
+        store=ideb_store(uf),
+    )
+
+def _load_infra(files: dict[str, str]) -> InfraService:
+    return InfraService(files["infra_fund"], files["infra_med"], snapshot_dir=settings.snapshot_dir)
+
+# IDEB/infra datasets of one UF: loaded on first use and shared by every router.
+def load_partition(uf: str) -> DataRegistry:
+    files = partition_files(uf)
+    registry = DataRegistry()
+    registry.load("ideb", lambda: _load_ideb(uf, files))
+    registry.load("infra", lambda: _load_infra(files))
+    # espaço canônico de IDs de escola: une as fontes e mede a cobertura dos joins
+    registry.load("keyspace", lambda: SchoolKeyspace({
+        "ideb": registry.get("ideb").df_escolas["ID_ESCOLA"],
+        "infra": registry.get("infra").df_merged["ID_ESCOLA"],
+        "all_schools": _read_school_ids(files["schools"]),
+    }))
+    registry.load("indicadores", lambda: IndicadoresService(
+        registry.get("ideb"),
+        registry.get("infra"),
+        registry.get("keyspace"),
+    ))
+    # índice BM25 das escolas para o contexto do agente
+    registry.load("retriever", lambda: SchoolRetriever(registry.get("indicadores")))
+    return registry
+
+def load_means(uf: str, partitions: PartitionManager) -> pd.DataFrame | None:
+    # médias por município da UF para o mapa: da partição se já estiver carregada; senão
+    # só de IDEB + infra (sem indicadores/retriever), guardadas num snapshot pequeno por UF
+    if uf not in partitions:
+        return None
+    part = partitions.peek(uf)
+    if part is not None:
+        return part.get("indicadores").por_municipio
+    files = partition_files(uf)
+    store = ideb_store(uf)
+    if store is not None and store.partitions():
+        sources = store.sources()
+    else:
+        sources = [files["ideb_ef1"], files["ideb_ef2"], files["ideb_em"]]
+    sources += [files["infra_fund"], files["infra_med"]]
+    tables = load_or_build(
+        settings.snapshot_dir, "means", sources, MEANS_VERSION,
+        lambda: {"means": municipality_means(_load_ideb(uf, files), _load_infra(files)).reset_index()},
+    )
+    return tables["means"].set_index("municipio_key")
+
+def load_partitions() -> PartitionManager:
+    return PartitionManager(
+        load_partition,
+        available_ufs(),
+        budget_bytes=int(settings.partition_budget_mb * 1024 * 1024),
+        pinned=[settings.default_uf],
+    )
+
+def dataset_sources() -> list[str]:
+    # every file a snapshot is built from (versioning and the reload watcher)
+    out = [settings.data_file, settings.polygon_file]
+    for uf in available_ufs():
+        out += partition_files(uf).values()
+        store = ideb_store(uf)
+        if store is not None:
+            out += store.sources()
+    return out
+
+def _read_school_ids(path: str) -> pd.Series:
+    if not path or not Path(path).exists():
+        return pd.Series([], dtype="Int64")
+    return pd.read_csv(path, usecols=["ID_ESCOLA"], dtype=str)["ID_ESCOLA"]
+
+def build_provider() -> BaseLLM:
+    """LLM_PROVIDER (echo | fake | http), wrapped in the concurrency-limited pool."""
+    kind = settings.llm_provider.lower()
+    if kind == "echo":
+        inner: BaseLLM = EchoProvider(chunk_delay=settings.echo_chunk_delay)
+    elif kind == "fake":
+        inner = FakeProvider(
+            latency=settings.fake_llm_latency,
+            jitter=settings.fake_llm_jitter,
+            error_rate=settings.fake_llm_error_rate,
+        )
+    elif kind == "http":
+        inner = HTTPProvider(
+            settings.llm_base_url, settings.llm_model, settings.llm_api_key or None,
+            max_connections=settings.llm_max_in_flight,
+            timeout=settings.llm_timeout,
+        )
+    else:
+        raise ValueError(f"Unknown LLM_PROVIDER '{settings.llm_provider}'")
+    if settings.llm_max_in_flight <= 0:
+        return inner
+    return PooledProvider(
+        inner,
+        max_in_flight=settings.llm_max_in_flight,
+        max_queue=settings.llm_max_queue,
+        queue_timeout=settings.llm_queue_timeout,
+        timeout=settings.llm_timeout,
+        retries=settings.llm_retries,
+        backoff=settings.llm_retry_backoff,
+    )
+
+class ServiceSnapshot:
+    """
+    Every service built from one version of the data files. Requests resolve a
+    single snapshot (see `get_snapshot`) and use it until they finish, so a
+    reload can build a new one in the background and swap it in atomically.
+    """
+    def __init__(self, registry: DataRegistry, partitions: PartitionManager,
+                 items: list[Municipality], agent: AgentService):
+        self.registry = registry
+        self.partitions = partitions
+        self.version = registry.version
+        self.municipality = MunicipalityService(items)
+        self.scoring = ScoringService(items, cache_size=settings.score_cache_size)
+        self.agent = agent
+        self.choropleth = ChoroplethService(
+            registry.get("geometry"),
+            self.scoring,
+            lambda uf: load_means(uf, partitions),
+            cache_size=settings.choropleth_cache_size,
+        )
+
+    def warm(self) -> None:
+        # fill the default-params caches before the snapshot takes traffic; only the
+        # default choropleth level (no zoom/tolerance), the others are built on first request
+        params = ScoreParams()
+        self.scoring.score_all_json(params)
+        self.choropleth.variant(params, self.registry.get("geometry").level_for())
+
+def build_snapshot(previous: ServiceSnapshot | None = None) -> ServiceSnapshot:
+    """Load every dataset and service from disk; the provider and reply cache carry over."""
+    registry = load_datasets()
+    partitions = load_partitions()
+    items = load_data()
+    if previous is not None:
+        llm, cache = previous.agent.llm, previous.agent.cache
+    else:
+        llm = build_provider()
+        cache = ResponseCache(
+            max_entries=settings.agent_cache_size,
+            ttl=settings.agent_cache_ttl,
+            disk_dir=settings.agent_cache_dir or None,
+            disk_ttl=settings.agent_cache_disk_ttl,
+        )
+    agent = AgentService(
+        llm,
+        cache=cache,
+        retriever=PartitionedRetriever(partitions),
+        context_tokens=settings.agent_context_tokens,
+    )
+    snap = ServiceSnapshot(registry, partitions, items, agent)
+    snap.warm()
+    return snap
+
+# Current snapshot (built in main.py; replaced as a whole by reload_snapshot)
+_snapshot: ServiceSnapshot | None = None
+_reload_lock: asyncio.Lock | None = None
+
+def init_services(snapshot: ServiceSnapshot) -> None:
+    global _snapshot, _reload_lock
+    _snapshot = snapshot
+    _reload_lock = asyncio.Lock()
+
+async def reload_snapshot(force: bool = False) -> dict:
+    """
+    Build a new snapshot in a worker thread while the current one keeps serving,
+    then swap the reference. Requests already running finish on the old snapshot.
+    One reload at a time; unchanged sources are skipped unless `force`.
+    """
+    global _snapshot
+    async with _reload_lock:
+        current = _snapshot
+        previous_version = current.version if current else None
+        t0 = time.perf_counter()
+        if not force and current is not None:
+            version = await asyncio.to_thread(dataset_version, dataset_sources(), DATA_FORMATS)
+            if version == previous_version:
+                return {"reloaded": False, "version": version, "seconds": round(time.perf_counter() - t0, 3)}
+        new = await asyncio.to_thread(build_snapshot, current)
+        _snapshot = new
+        logger.info("snapshot %s -> %s em %.2fs", previous_version, new.version, time.perf_counter() - t0)
+        return {
+            "reloaded": True,
+            "version": new.version,
+            "previous_version": previous_version,
+            "seconds": round(time.perf_counter() - t0, 3),
+        }
+
+def sources_signature() -> tuple:
+    # cheap change detection for the watcher: (size, mtime) of every source file
+    out = []
+    for src in dataset_sources():
+        try:
+            st = os.stat(src)
+            out.append((src, st.st_size, st.st_mtime_ns))
+        except OSError:
+            out.append((src, None, None))
+    return tuple(out)
+
+async def watch_sources(interval: float) -> None:
+    """Poll the source files and reload when one of them changes (runs until cancelled)."""
+    last = sources_signature()
+    while True:
+        await asyncio.sleep(interval)
+        sig = sources_signature()
+        if sig == last:
+            continue
+        last = sig
+        try:
+            await reload_snapshot()
+        except Exception:
+            # keep serving the current snapshot; the next change retries
+            logger.exception("falha ao recarregar os datasets")
+
+def current_snapshot() -> ServiceSnapshot | None:
+    return _snapshot
+
+def get_snapshot(request: Request) -> ServiceSnapshot:
+    # pinned by the middleware when the request starts (same snapshot for ETag and body);
+    # FastAPI caches it for every getter of the request
+    return getattr(request.state, "snapshot", None) or _snapshot  # type: ignore
+
+def get_partition(
+    request: Request,
+    uf: Optional[str] = Query(None, description="UF (e.g., PB); default: from the city code, else DEFAULT_UF"),
+    snap: ServiceSnapshot = Depends(get_snapshot),
+) -> DataRegistry:
+    # UF explícita > prefixo do código IBGE em {cidade} > UF padrão
+    if uf is None:
+        cidade = request.path_params.get("cidade", "")
+        uf = uf_from_code(cidade) if cidade.strip().isdigit() else None
+    uf = (uf or settings.default_uf).upper()
+    if uf not in snap.partitions:
+        raise HTTPException(status_code=404, detail=f"UF '{uf}' não disponível.")
+    return snap.partitions.get(uf)
+
+def get_page_params(
+    sort: Optional[str] = Query(None, description="Sort column (e.g. indice_geral, -nota_ideb_media, escola)"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Page size"),
+    offset: int = Query(0, ge=0, description="Rows to skip"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (e.g. id_escola,escola,indice_geral)"),
+) -> PageParams:
+    names = [f.strip() for f in fields.split(",") if f.strip()] if fields is not None else None
+    if names is not None and not names:
+        raise HTTPException(status_code=422, detail="fields vazio.")
+    return PageParams(sort=sort or None, limit=limit, offset=offset, fields=names)
+
+def get_municipality_service(snap: ServiceSnapshot = Depends(get_snapshot)) -> MunicipalityService:
+    return snap.municipality
+
+def get_scoring_service(snap: ServiceSnapshot = Depends(get_snapshot)) -> ScoringService:
+    return snap.scoring
+
+def get_agent_service(snap: ServiceSnapshot = Depends(get_snapshot)) -> AgentService:
+    return snap.agent
+
+def get_choropleth_service(snap: ServiceSnapshot = Depends(get_snapshot)) -> ChoroplethService:
+    return snap.choropleth
+
+def get_data_registry(snap: ServiceSnapshot = Depends(get_snapshot)) -> DataRegistry:
+    return snap.registry
+
+def get_partitions(snap: ServiceSnapshot = Depends(get_snapshot)) -> PartitionManager:
+    return snap.partitions
+
+def get_ideb_service(part: DataRegistry = Depends(get_partition)) -> IDEBService:
+    return part.get("ideb")
+
+def get_infra_service(part: DataRegistry = Depends(get_partition)) -> InfraService:
+    return part.get("infra")
+
+def get_geometry_service(snap: ServiceSnapshot = Depends(get_snapshot)) -> GeometryService:
+    return snap.registry.get("geometry")
+
+def get_spatial_index(snap: ServiceSnapshot = Depends(get_snapshot)) -> SpatialIndex:
+    return snap.registry.get("spatial")
+
+def get_school_keyspace(part: DataRegistry = Depends(get_partition)) -> SchoolKeyspace:
+    return part.get("keyspace")
+
+def get_indicadores_service(part: DataRegistry = Depends(get_partition)) -> IndicadoresService:
+    return part.get("indicadores")
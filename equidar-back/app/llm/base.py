@@ -1,5 +1,29 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
+
+class ProviderError(Exception):
+    """Provider call failed; `retryable` marks transient failures (timeouts, 429/5xx)."""
+    retryable = False
+
+    def __init__(self, message: str = "", retryable: bool | None = None):
+        super().__init__(message)
+        if retryable is not None:
+            self.retryable = retryable
+
+class ProviderTimeout(ProviderError):
+    retryable = True
+
+class ProviderOverloaded(ProviderError):
+    """Rejected without calling the provider: too many calls in flight and queued."""
 
 class BaseLLM(ABC):
+    # identify the backend in cache keys and stats
+    name: str = "base"
+    model: str = ""
+
     @abstractmethod
     async def generate(self, prompt: str) -> str: ...
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # providers with native streaming override this; the default yields the whole reply once
+        yield await self.generate(prompt)
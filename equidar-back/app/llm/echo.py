@@ -1,5 +1,23 @@
+import asyncio
+import re
+from typing import AsyncIterator
+
 from app.llm.base import BaseLLM
 
 class EchoProvider(BaseLLM):
+    name = "echo"
+    model = "echo"
+
+    def __init__(self, chunk_delay: float = 0.0):
+        # seconds slept before each streamed chunk (simulates token latency in tests)
+        self.chunk_delay = chunk_delay
+
     async def generate(self, prompt: str) -> str:
         return f"[echo] {prompt[:1500]}"
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # one chunk per word (with its trailing whitespace), like a token stream
+        for chunk in re.findall(r"\S+\s*|\s+", await self.generate(prompt)):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield chunk
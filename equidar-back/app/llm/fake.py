@@ -0,0 +1,48 @@
+import asyncio
+import random
+import re
+from typing import AsyncIterator, Optional
+
+from app.llm.base import BaseLLM, ProviderError
+
+class FakeProvider(BaseLLM):
+    """
+    Offline stand-in for a remote LLM for load tests: each call sleeps a random
+    latency, fails with probability `error_rate` (as a retryable error, like a
+    429/5xx) and otherwise returns a canned reply, streamed word by word.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.25, error_rate: float = 0.0,
+                 model: str = "fake", seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.model = model
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    async def _wait(self, seconds: float) -> None:
+        self.calls += 1
+        await asyncio.sleep(max(0.0, seconds))
+        if self._rng.random() < self.error_rate:
+            raise ProviderError("fake provider: simulated upstream failure", retryable=True)
+
+    def _reply(self, prompt: str) -> str:
+        return f"[fake:{self.model}] {len(prompt)} chars of context received. " + prompt[-200:]
+
+    def _latency(self) -> float:
+        return self.latency + self._rng.uniform(-self.jitter, self.jitter)
+
+    async def generate(self, prompt: str) -> str:
+        await self._wait(self._latency())
+        return self._reply(prompt)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # latency spent before the first chunk (time to first token), then small gaps
+        await self._wait(self._latency() / 2)
+        words = re.findall(r"\S+\s*|\s+", self._reply(prompt))
+        gap = self.latency / 2 / max(1, len(words))
+        for w in words:
+            yield w
+            await asyncio.sleep(gap)
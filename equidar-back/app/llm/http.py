@@ -0,0 +1,35 @@
+from typing import Optional
+
+from app.llm.base import BaseLLM, ProviderError
+from app.llm.pool import shared_client
+
+class HTTPProvider(BaseLLM):
+    """OpenAI-compatible `/chat/completions` endpoint over the shared pooled client."""
+    name = "http"
+
+    def __init__(self, base_url: str, model: str, api_key: Optional[str] = None, max_connections: int = 16,
+                 timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+    async def generate(self, prompt: str) -> str:
+        import httpx
+        client = shared_client(self.max_connections)
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        try:
+            r = await client.post(
+                f"{self.base_url}/chat/completions",
+                json={"model": self.model, "messages": [{"role": "user", "content": prompt}]},
+                headers=headers,
+                timeout=self.timeout,  # per request: the shared client may serve other providers
+            )
+        except httpx.TransportError as exc:
+            raise ProviderError(f"LLM request failed: {exc}", retryable=True) from exc
+        if r.status_code == 429 or r.status_code >= 500:
+            raise ProviderError(f"LLM upstream returned {r.status_code}", retryable=True)
+        if r.status_code >= 400:
+            raise ProviderError(f"LLM upstream returned {r.status_code}: {r.text[:200]}")
+        return r.json()["choices"][0]["message"]["content"]
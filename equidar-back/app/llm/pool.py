@@ -0,0 +1,156 @@
+"""
+Concurrency limits, deadlines and retries around any `BaseLLM`, plus the
+process-wide pooled HTTP client used by remote providers.
+
+At most `max_in_flight` provider calls run at once and at most `max_queue`
+more wait for a slot; beyond that (or after waiting `queue_timeout`) calls
+are rejected immediately with `ProviderOverloaded` instead of piling up.
+Each attempt has its own deadline (`timeout`); retryable failures are
+retried with exponential backoff and full jitter.
+"""
+import asyncio
+import random
+from typing import AsyncIterator, Dict, Optional
+
+from app.llm.base import BaseLLM, ProviderError, ProviderOverloaded, ProviderTimeout
+
+_client = None
+
+def shared_client(max_connections: int = 16, timeout: float = 30.0):
+    """Lazily created httpx.AsyncClient reused by every remote provider (keep-alive pool)."""
+    global _client
+    if _client is None or _client.is_closed:
+        import httpx  # only needed by remote providers
+        _client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+    return _client
+
+async def close_shared_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+class Slot:
+    """A provider slot taken ahead of the call (see `PooledProvider.reserve`); `release` is idempotent."""
+    def __init__(self, pool: "PooledProvider"):
+        self._pool = pool
+        self.held = True
+
+    def release(self) -> None:
+        if self.held:
+            self.held = False
+            self._pool._release()
+
+class PooledProvider(BaseLLM):
+    def __init__(self, inner: BaseLLM, max_in_flight: int = 8, max_queue: int = 32,
+                 queue_timeout: float = 5.0, timeout: float = 30.0,
+                 retries: int = 2, backoff: float = 0.2, max_backoff: float = 5.0):
+        self.inner = inner
+        self.name = inner.name
+        self.model = inner.model
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._waiting = 0
+        self._in_flight = 0
+        self.counters = {"calls": 0, "rejected": 0, "timeouts": 0, "retries": 0, "errors": 0}
+
+    async def _acquire(self) -> None:
+        if self._in_flight + self._waiting >= self.max_in_flight + self.max_queue:
+            self.counters["rejected"] += 1
+            raise ProviderOverloaded("LLM provider is saturated; retry later")
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["rejected"] += 1
+            raise ProviderOverloaded("Timed out waiting for an LLM provider slot") from None
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._slots.release()
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def generate(self, prompt: str) -> str:
+        await self._acquire()
+        try:
+            attempt = 0
+            while True:
+                self.counters["calls"] += 1
+                try:
+                    return await asyncio.wait_for(self.inner.generate(prompt), self.timeout)
+                except asyncio.TimeoutError:
+                    self.counters["timeouts"] += 1
+                    err: ProviderError = ProviderTimeout(f"LLM call exceeded {self.timeout}s")
+                except ProviderError as exc:
+                    err = exc
+                if not err.retryable or attempt >= self.retries:
+                    self.counters["errors"] += 1
+                    raise err
+                self.counters["retries"] += 1
+                await asyncio.sleep(self._delay(attempt))
+                attempt += 1
+        finally:
+            self._release()
+
+    async def reserve(self) -> Slot:
+        """Take a slot now (`ProviderOverloaded` when saturated), to hand to `stream` later."""
+        await self._acquire()
+        return Slot(self)
+
+    async def stream(self, prompt: str, slot: Optional[Slot] = None) -> AsyncIterator[str]:
+        # the slot is held for the whole stream; retries only before the first chunk,
+        # and `timeout` bounds the wait for each chunk
+        slot = slot or await self.reserve()
+        try:
+            attempt = 0
+            while True:
+                self.counters["calls"] += 1
+                chunks = self.inner.stream(prompt).__aiter__()
+                started = False
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            return
+                        started = True
+                        yield chunk
+                except asyncio.TimeoutError:
+                    self.counters["timeouts"] += 1
+                    err: ProviderError = ProviderTimeout(f"LLM stream stalled for {self.timeout}s")
+                except ProviderError as exc:
+                    err = exc
+                finally:
+                    if hasattr(chunks, "aclose"):
+                        await chunks.aclose()
+                if started or not err.retryable or attempt >= self.retries:
+                    self.counters["errors"] += 1
+                    raise err
+                self.counters["retries"] += 1
+                await asyncio.sleep(self._delay(attempt))
+                attempt += 1
+        finally:
+            slot.release()
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+        }
@@ -1,17 +1,27 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import hashlib
 
 from app.config import settings
-from app.deps import load_data, init_services
-from app.routes import municipalities, scores, agents, ideb, infra, indicadores
+from app.deps import build_snapshot, init_services, current_snapshot, watch_sources, get_data_registry, get_partitions
+from app.llm.pool import close_shared_client
+from app.routes import municipalities, scores, agents, ideb, infra, indicadores, admin
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    items = load_data()
-    init_services(items)
+    init_services(build_snapshot())
+    watcher = None
+    if settings.reload_poll_seconds > 0:
+        # file-watch reload: new snapshot built in the background, swapped atomically
+        watcher = asyncio.create_task(watch_sources(settings.reload_poll_seconds))
     yield
-    # teardown (if needed)
+    if watcher is not None:
+        watcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await watcher
+    await close_shared_client()
 
 app = FastAPI(
     title=settings.app_name,
@@ -33,13 +43,56 @@ app.add_middleware(
     allow_headers=["*"],  # Permite todos os headers
 )
 
+# Read endpoints only change between deploys/reloads: strong ETag from the dataset
+# version + request, answered with 304 before the route (and any pandas work) runs.
+CACHEABLE_PREFIXES = ("/municipalities", "/scores", "/ideb", "/infra", "/municipios")
+
+def _etag(version: str, request: Request) -> str:
+    h = hashlib.sha1(version.encode("utf-8"))
+    h.update(request.url.path.encode("utf-8"))
+    h.update(b"?" + "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items())).encode("utf-8"))
+    # precompressed routes pick the encoding from this header: different representation, different tag
+    h.update(request.headers.get("accept-encoding", "").encode("utf-8"))
+    return f'"{h.hexdigest()}"'
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    # pin the current snapshot for the whole request (a reload may swap it meanwhile)
+    snapshot = current_snapshot()
+    request.state.snapshot = snapshot
+    if (
+        request.method not in ("GET", "HEAD")
+        or not request.url.path.startswith(CACHEABLE_PREFIXES)
+        or snapshot is None
+        or not snapshot.version
+    ):
+        return await call_next(request)
+
+    etag = _etag(snapshot.version, request)
+    cache_headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.cache_max_age}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=cache_headers)
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(cache_headers)
+    return response
+
 app.include_router(municipalities.router)
 app.include_router(scores.router)
 app.include_router(agents.router)
 app.include_router(ideb.router)
 app.include_router(infra.routes)
 app.include_router(indicadores.router)
+app.include_router(admin.router)
 
 @app.get("/healthz", tags=["misc"])
 def healthz():
     return {"status": "ok"}
+
+@app.get("/datasets", tags=["misc"])
+def datasets(registry = Depends(get_data_registry), partitions = Depends(get_partitions)):
+    # tempo de carga e memória por dataset (carregados uma vez por snapshot) e por partição de UF
+    return {**registry.stats(), "partitions": partitions.stats()}
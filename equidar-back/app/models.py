@@ -30,6 +30,7 @@ class SchoolType(str, Enum):
     MUNICIPAL = "Municipal"
     ESTADUAL = "Estadual"
     PARTICULAR = "Particular"
+    FEDERAL = "Federal"
 
 class School(BaseModel):
     id_escola: str
@@ -39,47 +40,25 @@ class School(BaseModel):
     sg_uf: str
     rede: SchoolType
     
+class IDEBMetrics(BaseModel):
+    # métricas de uma edição do IDEB (uma etapa de uma escola)
+    aprovacao: Optional[float] = None
+    rendimento: Optional[float] = None
+    matematica: Optional[float] = None
+    portugues: Optional[float] = None
+    nota_media: Optional[float] = None
+    observado: Optional[float] = None
+    projecao: Optional[float] = None
+    resultado: Optional[float] = None  # observado - projeção
+
 class IDEBData(BaseModel):
     id_escola: str
-    no_escola: str
-    co_municipio: str
-    no_municipio: str
-    rede: SchoolType
-    
-    # Indicadores de rendimento (aprovação)
-    vl_indicador_rend_2017: Optional[float] = None
-    vl_indicador_rend_2019: Optional[float] = None
-    vl_indicador_rend_2021: Optional[float] = None
-    
-    # Notas de Matemática
-    vl_nota_matematica_2017: Optional[float] = None
-    vl_nota_matematica_2019: Optional[float] = None
-    vl_nota_matematica_2021: Optional[float] = None
-    
-    # Notas de Português
-    vl_nota_portugues_2017: Optional[float] = None
-    vl_nota_portugues_2019: Optional[float] = None
-    vl_nota_portugues_2021: Optional[float] = None
-    
-    # Notas Médias
-    vl_nota_media_2017: Optional[float] = None
-    vl_nota_media_2019: Optional[float] = None
-    vl_nota_media_2021: Optional[float] = None
-    
-    # IDEB Observado
-    vl_observado_2017: Optional[float] = None
-    vl_observado_2019: Optional[float] = None
-    vl_observado_2021: Optional[float] = None
-    
-    # IDEB Projeção
-    vl_projecao_2017: Optional[float] = None
-    vl_projecao_2019: Optional[float] = None
-    vl_projecao_2021: Optional[float] = None
-    
-    # Resultado (diferença observado - projeção)
-    resultado_2017: Optional[float] = None
-    resultado_2019: Optional[float] = None
-    resultado_2021: Optional[float] = None
+    escola: str
+    rede: Optional[str] = None
+    ensino: str  # EF1, EF2, EM
+
+    # edição (ano) -> métricas; novas edições entram como novas chaves
+    anos: Dict[int, IDEBMetrics] = Field(default_factory=dict)
 
 class PerformanceAxis(str, Enum):
     RENDIMENTO = "rendimento"  # Aprovação
@@ -89,17 +68,14 @@ class PerformanceAxis(str, Enum):
 
 class AxisPerformance(BaseModel):
     axis: PerformanceAxis
-    score_2017: Optional[float] = None
-    score_2019: Optional[float] = None
-    score_2021: Optional[float] = None
+    scores: Dict[int, Optional[float]] = Field(default_factory=dict)  # ano -> score
     trend: str  # "improving", "declining", "stable"
     normalized_score: Optional[float] = Field(default=None, ge=0, le=100)  # Score normalizado 0-100
 
 class IDEBPerformanceIndex(BaseModel):
-    ideb_2017: Optional[float] = None
-    ideb_2019: Optional[float] = None
-    ideb_2021: Optional[float] = None
-    meta_2021: Optional[float] = None
+    ideb: Dict[int, Optional[float]] = Field(default_factory=dict)  # ano -> IDEB observado
+    ano_meta: Optional[int] = None
+    meta: Optional[float] = None
     atingiu_meta: Optional[bool] = None
     distancia_meta: Optional[float] = None
     trend: str  # "improving", "declining", "stable"
@@ -142,11 +118,12 @@ class MunicipalityPerformanceReport(BaseModel):
     municipality_name: str
     total_schools: int
     
-    # Médias municipais
-    avg_ideb_2021: Optional[float] = None
-    avg_matematica_2021: Optional[float] = None
-    avg_portugues_2021: Optional[float] = None
-    avg_rendimento_2021: Optional[float] = None
+    # Médias municipais da edição `ano`
+    ano: Optional[int] = None
+    avg_ideb: Optional[float] = None
+    avg_matematica: Optional[float] = None
+    avg_portugues: Optional[float] = None
+    avg_rendimento: Optional[float] = None
     
     # Distribuição de classificações
     schools_by_classification: Dict[str, int]
@@ -173,6 +150,22 @@ class ScoreOut(BaseModel):
     score: Optional[float]
     breakdown: Dict[str, float | dict]
 
+class PageParams(BaseModel):
+    sort: Optional[str] = None  # coluna, "-coluna" = decrescente
+    limit: Optional[int] = Field(default=None, ge=1)
+    offset: int = Field(default=0, ge=0)
+    fields: Optional[List[str]] = None  # projeção; None = todos os campos
+
+    @property
+    def paginated(self) -> bool:
+        return self.limit is not None or self.offset > 0
+
+class IndicadoresBulkRequest(BaseModel):
+    cidades: List[str] = Field(default_factory=list)  # nomes ou códigos IBGE
+    uf: Optional[str] = None  # estado inteiro quando `cidades` vazio
+    ano: Optional[int] = None
+    formato: str = Field(default="ndjson", pattern="^(ndjson|csv)$")
+
 class AgentMessage(BaseModel):
     municipality_id: str
     message: str
@@ -0,0 +1,23 @@
+import hmac
+from fastapi import APIRouter, Header, HTTPException, Query
+from typing import Optional
+
+from app.config import settings
+from app.deps import reload_snapshot
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.post("/reload")
+async def reload_datasets(
+    force: bool = Query(False, description="Rebuild even if the source files did not change"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    # builds a full new snapshot in the background and swaps it in; current requests are unaffected
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        return await reload_snapshot(force=force)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving the previous data: {exc}")
@@ -1,6 +1,11 @@
+import json
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from app.deps import get_municipality_service, get_agent_service
 from app.models import AgentMessage, AgentResponse
+from app.llm.base import ProviderError, ProviderOverloaded, ProviderTimeout
+from app.llm.pool import Slot
 
 router = APIRouter(prefix="/agents", tags=["agents"])
 
@@ -9,4 +14,75 @@ async def chat(payload: AgentMessage, msvc = Depends(get_municipality_service),
     m = msvc.get(payload.municipality_id)
     if not m:
         raise HTTPException(status_code=404, detail="Municipality not found")
-    return await asvc.chat(m, payload.message, payload.system_goal or "")
+    try:
+        return await asvc.chat(m, payload.message, payload.system_goal or "")
+    except ProviderOverloaded as exc:
+        # backpressure: fail fast and let the client retry instead of queueing without bound
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+    except ProviderTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc))
+    except ProviderError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+
+@router.get("/provider/stats")
+def provider_stats(asvc = Depends(get_agent_service)):
+    # in-flight / queued / rejected / retried calls when the provider is pooled
+    stats = getattr(asvc.llm, "stats", None)
+    return {"provider": asvc.llm.name, "model": asvc.llm.model, **(stats() if stats else {})}
+
+@router.get("/cache/stats")
+def cache_stats(asvc = Depends(get_agent_service)):
+    # hit / disk_hit / miss / coalesced counters of the reply cache
+    if asvc.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "provider": asvc.llm.name, "model": asvc.llm.model, **asvc.cache.stats()}
+
+class _ReservedStream(StreamingResponse):
+    """StreamingResponse that gives the provider slot back even if the client leaves before the body starts."""
+    def __init__(self, content, slot: Optional[Slot], **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.slot is not None:
+                self.slot.release()
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream(payload: AgentMessage, msvc = Depends(get_municipality_service), asvc = Depends(get_agent_service)):
+    """
+    Server-Sent Events version of /agents/chat: a `context` event, one `delta`
+    event per chunk as the provider yields it, then `done` (or `error`).
+    """
+    m = msvc.get(payload.municipality_id)
+    if not m:
+        raise HTTPException(status_code=404, detail="Municipality not found")
+
+    prompt, keys = await asvc.prepare(m, payload.message, payload.system_goal or "")
+    try:
+        # the provider slot is taken before the 200 goes out, so saturation is a 503 like /chat
+        chunks, slot = await asvc.open_stream(prompt)
+    except ProviderOverloaded as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+    async def events():
+        yield _sse("context", {"used_context_keys": keys})
+        try:
+            async for chunk in chunks:
+                yield _sse("delta", {"text": chunk})
+        except Exception as exc:  # headers are already sent: report in-band
+            yield _sse("error", {"detail": str(exc)})
+            return
+        yield _sse("done", {})
+
+    return _ReservedStream(
+        events(),
+        slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
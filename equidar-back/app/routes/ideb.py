@@ -1,29 +1,46 @@
 # app/routes/ideb.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Dict, Optional
-from app.services.ideb import IDEBService
+from app.deps import get_ideb_service, get_indicadores_service, get_page_params
+from app.models import PageParams
+from app.serialization import JSONBytes, dumps, page_headers
 
 router = APIRouter(prefix="/ideb", tags=["IDEB"])
 
-ideb_service = IDEBService(
-    "data/IDEB_ANOS_INICIAIS_PB.csv",
-    "data/IDEB_ANOS_FINAIS_PB.csv",
-    "data/IDEB_ENSINO_MEDIO_PB.csv",
-)
-
 @router.get("/municipios/{cidade}/escolas")
-def listar_escolas_por_cidade(cidade: str) -> List[Dict]:
-    escolas = ideb_service.list_schools_by_city(cidade)
-    if not escolas:
+def listar_escolas_por_cidade(cidade: str, ideb_service = Depends(get_ideb_service)) -> List[Dict]:
+    body = ideb_service.list_schools_json(cidade)
+    if body is None:
         raise HTTPException(status_code=404, detail=f"Nenhuma escola encontrada para '{cidade}'.")
-    return escolas
+    return JSONBytes(body)
 
 @router.get("/municipios/{cidade}/ideb")
 def ideb_por_cidade(
     cidade: str,
     ano: Optional[int] = Query(default=None, description="Filtrar por ano"),
+    page: PageParams = Depends(get_page_params),
+    indicadores_service = Depends(get_indicadores_service),
+) -> List[Dict]:
+    # {ensino: {ano: nota}} de cada escola já vem serializado da tabela materializada
+    try:
+        body = indicadores_service.ideb_json(
+            cidade, ano=ano, sort=page.sort, limit=page.limit, offset=page.offset, fields=page.fields,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if body is None:
+        raise HTTPException(status_code=404, detail=f"Não encontrei IDEB para '{cidade}'.")
+    return JSONBytes(body, headers=page_headers(page, indicadores_service.count(cidade, ano)))
+
+@router.get("/municipios/{cidade}/ideb/metricas")
+def ideb_metricas_por_cidade(
+    cidade: str,
+    ano: Optional[int] = Query(default=None, description="Filtrar por ano"),
+    ensino: Optional[str] = Query(default=None, description="Filtrar por etapa (EF1, EF2, EM)"),
+    ideb_service = Depends(get_ideb_service),
 ) -> List[Dict]:
-    data = ideb_service.ideb_by_city(cidade, ano=ano)
-    if not data:
+    # rendimento, notas, observado, projeção e resultado de cada escola/etapa, por ano
+    rows = ideb_service.metricas_by_city(cidade, ano=ano, ensino=ensino)
+    if not rows:
         raise HTTPException(status_code=404, detail=f"Não encontrei IDEB para '{cidade}'.")
-    return data
+    return JSONBytes(dumps(rows))
@@ -1,83 +1,92 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional
-import pandas as pd
-import numpy as np
+from urllib.parse import quote
 
-from app.services.ideb import IDEBService
-from app.services.infra import InfraService
+from app.config import settings
+from app.deps import get_indicadores_service, get_page_params, get_partitions
+from app.models import IndicadoresBulkRequest, PageParams
+from app.serialization import JSONBytes, page_headers
+from app.services.indicadores import CSV_COLUMNS
+from app.services.keys import uf_from_code
 
 router = APIRouter(prefix="/municipios", tags=["Indicadores"])
 
-ideb_service = IDEBService(
-    "data/IDEB_ANOS_INICIAIS_PB.csv",
-    "data/IDEB_ANOS_FINAIS_PB.csv",
-    "data/IDEB_ENSINO_MEDIO_PB.csv",
-)
-infra_service = InfraService(
-    "data/PB_INFRAESTRUTURA_FUND_SCORE_2023.csv",
-    "data/PB_INFRAESTRUTURA_MED_SCORE_2023.csv",
-)
+def _bulk(partitions, cidades: Optional[List[str]], uf: Optional[str], ano: Optional[int], formato: str):
+    # cidades agrupadas por UF (código IBGE > `uf` > UF padrão); só `uf` = o estado inteiro
+    if not cidades and not uf:
+        raise HTTPException(status_code=422, detail="Informe ao menos uma cidade ou uma UF.")
+    default_uf = (uf or settings.default_uf).upper()
+    plan: Dict[str, Optional[List[str]]] = {}
+    missing: List[str] = []
+    if cidades:
+        for cidade in cidades:
+            c = cidade.strip()
+            city_uf = (uf_from_code(c) if c.isdigit() else None) or default_uf
+            if city_uf in partitions:
+                plan.setdefault(city_uf, []).append(cidade)
+            else:
+                missing.append(cidade)
+    elif default_uf in partitions:
+        plan[default_uf] = None
+    else:
+        raise HTTPException(status_code=404, detail=f"UF '{default_uf}' não disponível.")
 
-@router.get("/{cidade}/indicadores")
-def indicadores_por_cidade(
-    cidade: str,
-    ano: Optional[int] = Query(default=None, description="Filtrar IDEB por ano (opcional)")
-) -> List[Dict]:
-    # --- 1) IDEB: filtra por cidade e estrutura por escola (tem nome e município)
-    ideb_list = ideb_service.ideb_by_city(cidade, ano=ano)
-    if not ideb_list:
-        raise HTTPException(status_code=404, detail=f"Não encontrei IDEB para '{cidade}'.")
-    df_ideb = pd.DataFrame(ideb_list)
-    df_ideb["id_escola"] = df_ideb["id_escola"].astype(str)
-
-    # média do IDEB entre EF1, EF2, EM (considera os anos disponíveis)
-    def media_ideb(ideb_dict):
-        if not isinstance(ideb_dict, dict):
-            return np.nan
-        by_level = []
-        for anos in ideb_dict.values():
-            if isinstance(anos, dict):
-                vals = [v for v in anos.values() if v is not None]
-                if vals:
-                    by_level.append(np.mean(vals))
-        return float(np.mean(by_level)) if by_level else np.nan
+    # faixas resolvidas antes de começar a resposta: 404 só quando nada foi encontrado
+    work = []
+    for city_uf, wanted in plan.items():
+        svc = partitions.get(city_uf).get("indicadores")
+        found, miss = svc.city_ranges(wanted, ano)
+        missing += miss
+        if found:
+            work.append((svc, found))
+    if not work:
+        raise HTTPException(status_code=404, detail="Não encontrei indicadores para as cidades pedidas.")
 
-    df_ideb["nota_ideb_media"] = df_ideb["ideb"].apply(media_ideb)
+    def body():
+        if formato == "csv":
+            yield (",".join(CSV_COLUMNS) + "\r\n").encode("utf-8")
+        for svc, found in work:
+            if formato == "csv":
+                yield from svc.iter_csv(found, ano)
+            else:
+                yield from svc.iter_ndjson(found, ano)
 
-    # --- 2) INFRA: pega os scores por ID (sem nome/municipio) e junta
-    df_infra = infra_service.df_merged.copy()
-    df_infra["ID_ESCOLA"] = df_infra["ID_ESCOLA"].astype(str)
+    headers = {"X-Missing-Cities": quote(",".join(missing))} if missing else None
+    media_type = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
 
-    merged = pd.merge(
-        df_ideb,
-        df_infra[["ID_ESCOLA", "score_fund", "score_med", "score_infraestrutura"]],
-        left_on="id_escola",
-        right_on="ID_ESCOLA",
-        how="left"
-    ).drop(columns=["ID_ESCOLA"])
+@router.get("/indicadores/bulk")
+def indicadores_em_lote(
+    cidade: Optional[List[str]] = Query(default=None, description="Cidades (nome ou código IBGE; repetível)"),
+    uf: Optional[str] = Query(default=None, description="UF inteira (sem `cidade`) ou UF dos nomes de cidade"),
+    ano: Optional[int] = Query(default=None, description="Filtrar IDEB por ano (opcional)"),
+    formato: str = Query(default="ndjson", pattern="^(ndjson|csv)$", description="ndjson ou csv"),
+    partitions = Depends(get_partitions),
+):
+    # uma escola por linha, em streaming a partir das tabelas materializadas de cada UF
+    return _bulk(partitions, cidade, uf, ano, formato)
 
-    # --- 3) monta resposta
-    out: List[Dict] = []
-    for r in merged.itertuples(index=False):
-        nota_media = None if pd.isna(r.nota_ideb_media) else float(r.nota_ideb_media)
-        score_infra = None if pd.isna(r.score_infraestrutura) else float(r.score_infraestrutura)
-        indice_geral = None
-        if (nota_media is not None) and (score_infra is not None):
-            indice_geral = float(np.mean([nota_media, score_infra]))
+@router.post("/indicadores/bulk")
+def indicadores_em_lote_post(req: IndicadoresBulkRequest, partitions = Depends(get_partitions)):
+    # mesma resposta do GET, para listas de cidades longas demais para a URL
+    return _bulk(partitions, req.cidades, req.uf, req.ano, req.formato)
 
-        out.append({
-            "id_escola": r.id_escola,
-            "escola": r.escola,
-            "nota_ideb_media": None if nota_media is None else round(nota_media, 2),
-            "score_infraestrutura": None if score_infra is None else round(score_infra, 2),
-            "indice_geral": None if indice_geral is None else round(indice_geral, 2),
-            "scores_infra": {
-                "FUND": None if pd.isna(getattr(r, "score_fund", np.nan)) else round(float(getattr(r, "score_fund")), 2),
-                "MED":  None if pd.isna(getattr(r, "score_med", np.nan)) else round(float(getattr(r, "score_med")), 2),
-            },
-            "ideb": r.ideb
-        })
-
-    # ordena pelo índice geral quando existir
-    out.sort(key=lambda x: (-(x["indice_geral"] or -1e9), x["escola"] or ""))
-    return out
+@router.get("/{cidade}/indicadores")
+def indicadores_por_cidade(
+    cidade: str,
+    ano: Optional[int] = Query(default=None, description="Filtrar IDEB por ano (opcional)"),
+    page: PageParams = Depends(get_page_params),
+    indicadores_service = Depends(get_indicadores_service),
+) -> List[Dict]:
+    # tabela materializada na carga: aqui é só o recorte da cidade + serialização,
+    # já ordenado pelo índice geral quando existir (ou por `sort`, com ordem pré-calculada)
+    try:
+        body = indicadores_service.indicadores_json(
+            cidade, ano=ano, sort=page.sort, limit=page.limit, offset=page.offset, fields=page.fields,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if body is None:
+        raise HTTPException(status_code=404, detail=f"Não encontrei IDEB para '{cidade}'.")
+    return JSONBytes(body, headers=page_headers(page, indicadores_service.count(cidade, ano)))
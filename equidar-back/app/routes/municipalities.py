@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import Optional, List
-from app.deps import get_municipality_service
-from app.models import MunicipalityOut
+from app.deps import get_municipality_service, get_geometry_service, get_spatial_index, get_choropleth_service
+from app.models import MunicipalityOut, ScoreParams
+from app.services.choropleth import negotiate_encoding
+from app.serialization import JSONBytes
 
 router = APIRouter(prefix="/municipalities", tags=["municipalities"])
 
@@ -13,21 +15,75 @@ def list_municipalities(
     offset: int = Query(0, ge=0),
     svc = Depends(get_municipality_service),
 ):
-    return [m.model_dump() for m in svc.list(state, q, limit, offset)]
+    # items are encoded once at startup; the page is just their bytes joined
+    return JSONBytes(svc.list_json(state, q, limit, offset))
+
+# declared before /{municipality_id} so the static paths are not captured as ids
+@router.get("/locate")
+def locate_municipality(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    idx = Depends(get_spatial_index),
+    geo = Depends(get_geometry_service),
+):
+    fid = idx.locate(lon, lat)
+    if fid is None:
+        raise HTTPException(status_code=404, detail="No municipality contains this point")
+    return {"id": fid, "name": geo.names.get(fid)}
+
+@router.get("/in-bbox", response_model=List[str])
+def municipalities_in_bbox(
+    min_lon: float = Query(..., ge=-180, le=180),
+    min_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    idx = Depends(get_spatial_index),
+):
+    # ids of the polygons whose bounding box intersects the map viewport
+    return idx.in_bbox(min_lon, min_lat, max_lon, max_lat)
+
+@router.get("/choropleth")
+def municipalities_choropleth(
+    request: Request,
+    zoom: Optional[float] = Query(None, ge=0, le=24, description="Map zoom; picks the simplification level"),
+    tolerance: Optional[float] = Query(None, ge=0, description="Max simplification tolerance in degrees (overrides zoom)"),
+    params: ScoreParams = Depends(),
+    geo = Depends(get_geometry_service),
+    svc = Depends(get_choropleth_service),
+):
+    # one FeatureCollection (polygons + score, mean IDEB, infra) built once per variant, precompressed
+    variant = svc.variant(params, geo.level_for(zoom=zoom, tolerance=tolerance))
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), variant)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=variant[encoding], media_type="application/geo+json", headers=headers)
 
 @router.get("/{municipality_id}", response_model=MunicipalityOut)
 def get_municipality(municipality_id: str, svc = Depends(get_municipality_service)):
-    m = svc.get(municipality_id)
-    if not m:
+    body = svc.get_json(municipality_id)
+    if body is None:
         raise HTTPException(status_code=404, detail="Municipality not found")
-    return m
+    return JSONBytes(body)
 
 @router.get("/polygons/{municipality_id}")
-def get_municipality_polygon(municipality_id: str, svc = Depends(get_municipality_service)):
-    polygon = svc.get_polygon(municipality_id)
-    if not polygon:
+def get_municipality_polygon(
+    municipality_id: str,
+    request: Request,
+    zoom: Optional[float] = Query(None, ge=0, le=24, description="Map zoom; picks the simplification level"),
+    tolerance: Optional[float] = Query(None, ge=0, description="Max simplification tolerance in degrees (overrides zoom)"),
+    geo = Depends(get_geometry_service),
+):
+    # geometries are pre-encoded (and pre-gzipped) per level at startup: just pick the bytes
+    level = geo.level_for(zoom=zoom, tolerance=tolerance)
+    gzipped = negotiate_encoding(request.headers.get("accept-encoding", ""), ("gzip",)) == "gzip"
+    body = geo.geometry_bytes(municipality_id, level, gzipped=gzipped)
+    if body is None:
         raise HTTPException(status_code=404, detail="Municipality polygon not found")
-    return polygon
+    headers = {"Vary": "Accept-Encoding"}
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/geo+json", headers=headers)
 
 @router.get("/{municipality_id}/schools", response_model=List[dict])
 def get_municipality_schools(municipality_id: str, svc = Depends(get_municipality_service)):
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.deps import get_municipality_service, get_scoring_service
 from app.models import ScoreParams, ScoreOut
+from app.serialization import JSONBytes
 
 router = APIRouter(prefix="/scores", tags=["scores"])
 
@@ -19,8 +20,6 @@ def compute_score(
 @router.get("/", response_model=list[ScoreOut])
 def compute_scores(
     params: ScoreParams = Depends(),
-    msvc = Depends(get_municipality_service),
     ssvc = Depends(get_scoring_service),
 ):
-    municipalities = msvc.list_all()
-    return [ssvc.score(m, params) for m in municipalities]
\ No newline at end of file
+    return JSONBytes(ssvc.score_all_json(params))
\ No newline at end of file
@@ -0,0 +1,60 @@
+# app/serialization.py
+"""
+JSON encoding for the hot read paths.
+
+Routes that already hold plain data (pre-validated models, pandas columns)
+encode it here and return a `JSONBytes` response: FastAPI skips the
+response_model validation and its generic `jsonable_encoder` walk when a
+route returns a Response. orjson is used when installed; the stdlib encoder
+produces the same JSON otherwise.
+"""
+import json
+from typing import Iterable, List, Optional
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_strs(values: Iterable[Optional[str]]) -> List[str]:
+    """JSON literal of every string (NaN/None -> null)."""
+    enc = json.encoder.encode_basestring
+    return ["null" if v is None or v != v else enc(v) for v in values]
+
+
+def encode_floats(values: Iterable[float], ndigits: Optional[int] = None) -> List[str]:
+    """JSON literal of every float (NaN -> null), optionally rounded first."""
+    if ndigits is None:
+        return ["null" if v != v else repr(float(v)) for v in values]
+    return ["null" if v != v else repr(round(v, ndigits)) for v in values]
+
+
+def json_array(items: Iterable[str]) -> bytes:
+    """Join already-encoded JSON values into one array body."""
+    return ("[" + ",".join(items) + "]").encode("utf-8")
+
+
+def join_arrays(parts: Iterable[bytes]) -> bytes:
+    """Join already-encoded JSON values (bytes) into one array body."""
+    return b"[" + b",".join(parts) + b"]"
+
+
+def page_headers(page, total: int) -> Optional[dict]:
+    """X-Total-Count (and the page window) for paginated list responses."""
+    if not page.paginated:
+        return None
+    return {"X-Total-Count": str(total), "X-Offset": str(page.offset), "X-Limit": str(page.limit or "")}
+
+
+class JSONBytes(Response):
+    """Response for a body that is already encoded JSON."""
+    media_type = "application/json"
@@ -1,10 +1,24 @@
+import asyncio
 from textwrap import dedent
+from typing import AsyncIterator, List, Optional, Tuple
 from app.models import Municipality, AgentResponse
 from app.llm.base import BaseLLM
+from app.llm.pool import Slot
+from app.services.agent_cache import ResponseCache, prompt_key
+from app.services.retrieval import SchoolRetriever
+
+USED_CONTEXT_KEYS = [
+    "population","internet_coverage_pct","accessibility_index",
+    "school_infrastructure_index","revenue_per_capita"
+]
 
 class AgentService:
-    def __init__(self, provider: BaseLLM):
+    def __init__(self, provider: BaseLLM, cache: Optional[ResponseCache] = None,
+                 retriever: Optional[SchoolRetriever] = None, context_tokens: int = 600):
         self.llm = provider
+        self.cache = cache
+        self.retriever = retriever
+        self.context_tokens = context_tokens
 
     def _ctx(self, m: Municipality) -> dict:
         return dict(
@@ -16,9 +30,9 @@ class AgentService:
             revenue_per_capita=m.revenue_per_capita or 0,
         )
 
-    async def chat(self, m: Municipality, user_message: str, system_goal: str) -> AgentResponse:
+    def _prompt(self, m: Municipality, user_message: str, system_goal: str, schools: str = "") -> str:
         c = self._ctx(m)
-        prompt = dedent(f"""
+        sections = [dedent(f"""
         Goal: {system_goal}
 
         Municipality:
@@ -28,18 +42,66 @@ class AgentService:
         - Accessibility index: {c['accessibility_index']}
         - School infra index: {c['school_infrastructure_index']}
         - Revenue per capita: {c['revenue_per_capita']}
-
+        """).strip()]
+        if schools:
+            sections.append(f"Schools (most relevant to the question first):\n{schools}")
+        sections.append(dedent(f"""
         User message:
         {user_message}
 
         Respond with up to 8 bullet points, concrete and actionable, citing numbers above when relevant.
-        """).strip()
-
-        reply = await self.llm.generate(prompt)
-        return AgentResponse(
-            reply=reply,
-            used_context_keys=[
-                "population","internet_coverage_pct","accessibility_index",
-                "school_infrastructure_index","revenue_per_capita"
-            ],
-        )
+        """).strip())
+        return "\n\n".join(sections)
+
+    async def prepare(self, m: Municipality, user_message: str, system_goal: str) -> Tuple[str, List[str]]:
+        """Prompt for this question plus the context keys it contains."""
+        keys = list(USED_CONTEXT_KEYS)
+        schools = ""
+        if self.retriever is not None and self.context_tokens > 0:
+            # only the schools relevant to the message, within the token budget; off the event
+            # loop, since a cold UF builds its whole partition (and waits on the partition lock)
+            schools, school_keys = await asyncio.to_thread(
+                self.retriever.context, m.id, user_message, self.context_tokens
+            )
+            keys += school_keys
+        return self._prompt(m, user_message, system_goal, schools), keys
+
+    def _key(self, prompt: str) -> str:
+        return prompt_key(self.llm.name, self.llm.model, prompt)
+
+    async def chat(self, m: Municipality, user_message: str, system_goal: str) -> AgentResponse:
+        prompt, keys = await self.prepare(m, user_message, system_goal)
+        if self.cache is None:
+            reply = await self.llm.generate(prompt)
+        else:
+            # the prompt is deterministic: identical questions share one provider call
+            reply = await self.cache.get_or_generate(self._key(prompt), lambda: self.llm.generate(prompt))
+        return AgentResponse(reply=reply, used_context_keys=keys)
+
+    async def open_stream(self, prompt: str) -> Tuple[AsyncIterator[str], Optional[Slot]]:
+        """
+        Start replying to a `prepare`d prompt. The cache lookup and the provider
+        slot are taken here, so `ProviderOverloaded` is raised before anything is
+        sent. Returns the chunks and the slot they hold (None for a cached reply
+        or an unpooled provider); the slot is released when the chunks end.
+        """
+        key = self._key(prompt)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return _once(cached), None
+        reserve = getattr(self.llm, "reserve", None)
+        slot = await reserve() if reserve is not None else None
+        return self._chunks(key, prompt, slot), slot
+
+    async def _chunks(self, key: str, prompt: str, slot: Optional[Slot]) -> AsyncIterator[str]:
+        parts = []
+        chunks = self.llm.stream(prompt) if slot is None else self.llm.stream(prompt, slot=slot)
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        if self.cache is not None:
+            # only complete replies are cached (a disconnect stops the loop above)
+            await self.cache.put(key, "".join(parts))
+
+async def _once(reply: str) -> AsyncIterator[str]:
+    yield reply
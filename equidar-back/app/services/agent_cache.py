@@ -0,0 +1,145 @@
+# app/services/agent_cache.py
+"""
+Reply cache for the agent, keyed by a hash of (provider, model, prompt).
+
+Two tiers, each with its own TTL: a bounded in-memory LRU and an optional
+directory of small JSON files (survives restarts, shared by workers).
+Concurrent misses on the same key are coalesced: the first one starts a
+single provider call in its own task and every other request awaits it.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+def prompt_key(provider: str, model: str, prompt: str) -> str:
+    h = hashlib.sha256()
+    for part in (provider, model, prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0,
+                 disk_dir: Optional[str] = None, disk_ttl: float = 86400.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir or None
+        self.disk_ttl = disk_ttl
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # key -> (expires_at, reply)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+
+    # ---------- tiers ----------
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry[1]
+
+    def _put_memory(self, key: str, reply: str) -> None:
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        self._memory[key] = (time.time() + self.ttl, reply)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at", 0) < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get("reply")
+
+    def _put_disk(self, key: str, reply: str) -> None:
+        path = self._disk_path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"expires_at": time.time() + self.disk_ttl, "reply": reply}, fh, ensure_ascii=False)
+            os.replace(tmp, path)  # readers never see a partial file
+        except OSError:
+            pass  # the disk tier is best effort; the reply is still served
+
+    # ---------- API ----------
+
+    def get(self, key: str) -> Optional[str]:
+        """Memory tier only (no I/O): used by the streaming path."""
+        reply = self._get_memory(key)
+        if reply is not None:
+            self.counters["hits"] += 1
+        return reply
+
+    async def put(self, key: str, reply: str) -> None:
+        self._put_memory(key, reply)
+        if self.disk_dir:
+            # disk write off the event loop, like the read in `_load`
+            await asyncio.to_thread(self._put_disk, key, reply)
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Awaitable[str]]) -> str:
+        reply = self.get(key)
+        if reply is not None:
+            return reply
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._load(key, generate))
+            self._inflight[key] = task
+        # shield: a disconnecting client must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, generate: Callable[[], Awaitable[str]]) -> str:
+        try:
+            if self.disk_dir:
+                reply = await asyncio.to_thread(self._get_disk, key)
+                if reply is not None:
+                    self.counters["disk_hits"] += 1
+                    self._put_memory(key, reply)
+                    return reply
+            self.counters["misses"] += 1
+            reply = await generate()
+            self._put_memory(key, reply)
+            if self.disk_dir:
+                await asyncio.to_thread(self._put_disk, key, reply)
+            return reply
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "inflight": len(self._inflight),
+            "ttl": self.ttl,
+            "disk_dir": self.disk_dir,
+            "disk_ttl": self.disk_ttl if self.disk_dir else None,
+        }
@@ -0,0 +1,115 @@
+# app/services/choropleth.py
+"""
+Choropleth FeatureCollection: every municipality polygon with its composite
+score, mean IDEB and infra score as properties. Each variant (score params x
+simplification level) is built once and kept precompressed in a bounded LRU.
+"""
+import gzip
+import json
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from app.models import ScoreParams
+from app.services.geometry import GeometryService
+from app.services.keys import municipality_key, uf_from_code
+from app.services.scoring import ScoringService
+
+try:
+    import brotli
+except ImportError:  # optional: serve gzip only
+    brotli = None
+
+
+def negotiate_encoding(accept_encoding: str, available) -> str:
+    """Best of br/gzip accepted by the client and present in `available`; else identity."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.lower()] = q
+    # highest q wins; br before gzip on ties; q=0 means "not acceptable"
+    candidates = [
+        (accepted.get(enc, accepted.get("*", 0.0)), -rank, enc)
+        for rank, enc in enumerate(("br", "gzip"))
+        if enc in available
+    ]
+    q, _, enc = max(candidates, default=(0.0, 0, "identity"))
+    return enc if q > 0 else "identity"
+
+
+def _number(v) -> Optional[float]:
+    return None if v is None or v != v else round(float(v), 4)
+
+
+class ChoroplethService:
+    def __init__(self, geometry: GeometryService, scoring: ScoringService,
+                 means: Callable[[str], Optional[pd.DataFrame]], cache_size: int = 32):
+        self.geometry = geometry
+        self.scoring = scoring
+        # UF -> mean IDEB / infra by municipality key (None: UF not available); small, kept per UF
+        self._means_loader = means
+        self._means: Dict[str, Optional[pd.DataFrame]] = {}
+        self._cache: "OrderedDict[tuple, Dict[str, bytes]]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = Lock()
+
+    def means(self, uf: Optional[str]) -> Optional[pd.DataFrame]:
+        """Per-municipality means of one UF, loaded on first use (never the whole partition)."""
+        with self._lock:
+            if uf in self._means:
+                return self._means[uf]
+        means = None if uf is None else self._means_loader(uf)
+        with self._lock:
+            self._means[uf] = means
+        return means
+
+    def _build(self, p: ScoreParams, level: int) -> bytes:
+        scores = {municipality_key(s.municipality_id): s.score for s in self.scoring.score_all(p)}
+        geoms = self.geometry.levels[level]
+        parts = []
+        for fid, geom in geoms.items():
+            key = municipality_key(fid)
+            means = self.means(uf_from_code(key))
+            row = means.loc[key] if means is not None and key in means.index else None
+            props = {
+                "id": fid,
+                "name": self.geometry.names.get(fid),
+                "score": scores.get(key),
+                "nota_ideb_media": None if row is None else _number(row["nota_ideb_media"]),
+                "score_infraestrutura": None if row is None else _number(row["score_infraestrutura"]),
+            }
+            parts.append(
+                b'{"type":"Feature","properties":'
+                + json.dumps(props, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                + b',"geometry":' + geom + b"}"
+            )
+        return b'{"type":"FeatureCollection","features":[' + b",".join(parts) + b"]}"
+
+    def variant(self, p: ScoreParams, level: int) -> Dict[str, bytes]:
+        """{encoding: bytes} for these params and level (identity, gzip and, if available, br)."""
+        key = (tuple(sorted(p.model_dump().items())), level)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        raw = self._build(p, level)
+        out = {"identity": raw, "gzip": gzip.compress(raw, 6)}
+        if brotli is not None:
+            out["br"] = brotli.compress(raw, quality=9)
+
+        with self._lock:
+            self._cache[key] = out
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return out
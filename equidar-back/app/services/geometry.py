@@ -0,0 +1,273 @@
+# app/services/geometry.py
+"""
+Municipality polygons simplified at several tolerances, kept as pre-encoded
+(and gzip-precompressed) GeoJSON geometry bytes.
+
+Simplification is topology-preserving: rings are split into arcs at the
+vertices where the set of polygons sharing a border changes, every distinct
+arc is simplified once (Douglas-Peucker, endpoints fixed) and the same
+simplified arc is reused by both neighbours, so shared borders stay aligned.
+
+The FeatureCollection is read incrementally (`read_polygons`) into compact
+coordinate arrays; no geo library is needed at startup. shapely is only
+imported for optional operations (`GeometryService.shape`).
+"""
+import gzip
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.keys import municipality_key
+
+Ring = np.ndarray  # (n, 2) float64, open (no repeated closing vertex)
+
+
+def _douglas_peucker(pts: np.ndarray, tol: float) -> np.ndarray:
+    n = len(pts)
+    if n <= 2 or tol <= 0:
+        return pts
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = pts[b] - pts[a]
+        rel = pts[a + 1:b] - pts[a]
+        norm = np.hypot(seg[0], seg[1])
+        if norm == 0:
+            d = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            d = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / norm
+        i = int(np.argmax(d))
+        if d[i] > tol:
+            m = a + 1 + i
+            keep[m] = True
+            stack.append((a, m))
+            stack.append((m, b))
+    return pts[keep]
+
+
+def iter_features(path: str, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """Yield the features of a GeoJSON FeatureCollection one at a time."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as fh:
+        buf = ""
+        while True:  # advance to the opening bracket of "features"
+            i = buf.find('"features"')
+            j = buf.find("[", i) if i >= 0 else -1
+            if j >= 0:
+                buf = buf[j + 1:]
+                break
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                return
+            buf = buf[-16:] + chunk
+        while True:
+            buf = buf.lstrip(" \t\r\n,")
+            if buf.startswith("]"):
+                return
+            try:
+                feature, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                # incomplete feature: read more (growing the read for large features)
+                chunk = fh.read(max(chunk_size, len(buf)))
+                if not chunk:
+                    raise
+                buf += chunk
+                continue
+            yield feature
+            buf = buf[end:]
+
+
+def read_polygons(path: str) -> Tuple[Dict[str, List[List[Ring]]], Dict[str, str]]:
+    """
+    ({properties.id: polygons -> rings -> (n, 2) arrays}, {properties.id: properties.name})
+    for every feature with a polygon geometry.
+    """
+    polygons, names = {}, {}
+    for feature in iter_features(path):
+        geom = feature.get("geometry")
+        props = feature.get("properties") or {}
+        fid = props.get("id")
+        if geom and fid is not None and geom.get("type") in ("Polygon", "MultiPolygon"):
+            polygons[str(fid)] = _rings_from_geojson(geom)
+            names[str(fid)] = props.get("name")
+    return polygons, names
+
+
+def _rings_from_geojson(geom: dict) -> List[List[Ring]]:
+    polys = geom["coordinates"] if geom["type"] == "MultiPolygon" else [geom["coordinates"]]
+    out = []
+    for poly in polys:
+        rings = []
+        for ring in poly:
+            arr = np.asarray(ring, dtype="float64")[:, :2]
+            if len(arr) > 1 and np.array_equal(arr[0], arr[-1]):
+                arr = arr[:-1]
+            rings.append(arr)
+        out.append(rings)
+    return out
+
+
+class _Topology:
+    """Rings of every feature expressed as sequences of shared arcs."""
+    def __init__(self, features: Dict[str, List[List[Ring]]]):
+        owners: Dict[Tuple[float, float], set] = {}
+        for fid, polys in features.items():
+            for rings in polys:
+                for ring in rings:
+                    for pt in map(tuple, ring.tolist()):
+                        owners.setdefault(pt, set()).add(fid)
+
+        self.arcs: List[np.ndarray] = []
+        arc_ids: Dict[tuple, int] = {}
+        # feature -> polygons -> rings -> [(arc id, reversed)]
+        self.features: Dict[str, List[List[List[Tuple[int, bool]]]]] = {}
+        for fid, polys in features.items():
+            out_polys = []
+            for rings in polys:
+                out_rings = []
+                for ring in rings:
+                    out_rings.append([
+                        self._arc_ref(arc, arc_ids) for arc in self._split(ring, owners)
+                    ])
+                out_polys.append(out_rings)
+            self.features[fid] = out_polys
+
+    @staticmethod
+    def _split(ring: Ring, owners: Dict) -> List[np.ndarray]:
+        n = len(ring)
+        if n < 3:
+            return [np.vstack([ring, ring[:1]])]
+        sets = [frozenset(owners[pt]) for pt in map(tuple, ring.tolist())]
+        # arcs break at shared vertices where the set of owning polygons changes
+        fixed = [
+            i for i in range(n)
+            if len(sets[i]) > 1 and (sets[i] != sets[i - 1] or sets[i] != sets[(i + 1) % n])
+        ]
+        if not fixed:
+            fixed = [0, n // 2]
+        arcs = []
+        for j, start in enumerate(fixed):
+            stop = fixed[(j + 1) % len(fixed)]
+            idx = list(range(start, stop + 1)) if stop > start else list(range(start, n)) + list(range(0, stop + 1))
+            arcs.append(ring[idx])
+        return arcs
+
+    def _arc_ref(self, arc: np.ndarray, arc_ids: Dict) -> Tuple[int, bool]:
+        fwd = tuple(map(tuple, arc.tolist()))
+        rev = fwd[::-1]
+        key, reversed_ = (fwd, False) if fwd <= rev else (rev, True)
+        if key not in arc_ids:
+            arc_ids[key] = len(self.arcs)
+            self.arcs.append(arc[::-1] if reversed_ else arc)
+        return arc_ids[key], reversed_
+
+    def rebuild(self, arcs: List[np.ndarray], fid: str, originals: List[List[Ring]]) -> List[List[Ring]]:
+        polys = []
+        for p, rings in enumerate(self.features[fid]):
+            out = []
+            for r, refs in enumerate(rings):
+                parts = [arcs[a][::-1] if rev else arcs[a] for a, rev in refs]
+                ring = np.vstack([parts[0]] + [part[1:] for part in parts[1:]])[:-1]
+                if len(ring) < 3:
+                    ring = originals[p][r]  # collapsed: keep the original ring
+                out.append(ring)
+            polys.append(out)
+        return polys
+
+
+def _encode(polys: List[List[Ring]], decimals: Optional[int]) -> bytes:
+    def ring_coords(ring: Ring):
+        closed = np.vstack([ring, ring[:1]])
+        if decimals is not None:
+            closed = np.round(closed, decimals)
+        return closed.tolist()
+
+    coords = [[ring_coords(r) for r in rings] for rings in polys]
+    if len(coords) == 1:
+        geom = {"type": "Polygon", "coordinates": coords[0]}
+    else:
+        geom = {"type": "MultiPolygon", "coordinates": coords}
+    return json.dumps(geom, separators=(",", ":")).encode("utf-8")
+
+
+class GeometryService:
+    """
+    Polygons by municipality at several simplification levels.
+    Level 0 is the original geometry; level i uses `tolerances[i]` (degrees).
+    Features are looked up by canonical municipality key (6 or 7-digit IBGE code).
+    `features` and `names` come from `read_polygons`.
+    """
+    def __init__(self, features: Dict[str, List[List[Ring]]], tolerances: List[float],
+                 names: Optional[Dict[str, str]] = None):
+        self.tolerances = [0.0] + sorted(t for t in set(tolerances) if t > 0)
+        rings = {fid: polys for fid, polys in features.items() if polys}
+        self._ids = {municipality_key(fid): fid for fid in rings}
+        self._rings = rings
+        self.names = names or {}
+
+        topo = _Topology(rings)
+        # levels[i][fid] = raw GeoJSON bytes; gzipped[i][fid] = same bytes gzip-compressed
+        self.levels: List[Dict[str, bytes]] = []
+        self.gzipped: List[Dict[str, bytes]] = []
+        self._vertices: List[int] = []
+        for tol in self.tolerances:
+            arcs = [_douglas_peucker(a, tol) for a in topo.arcs] if tol > 0 else topo.arcs
+            encoded, vertices = {}, 0
+            for fid in rings:
+                polys = topo.rebuild(arcs, fid, rings[fid]) if tol > 0 else rings[fid]
+                vertices += sum(len(r) for rings_ in polys for r in rings_)
+                encoded[fid] = _encode(polys, decimals=6 if tol > 0 else None)
+            self.levels.append(encoded)
+            self.gzipped.append({fid: gzip.compress(b, 6) for fid, b in encoded.items()})
+            self._vertices.append(vertices)
+
+    @property
+    def features(self) -> Dict[str, List[List[Ring]]]:
+        """Original (level 0) rings by feature id."""
+        return self._rings
+
+    def feature_id(self, municipality_id: str) -> Optional[str]:
+        return self._ids.get(municipality_key(municipality_id))
+
+    def level_for(self, zoom: Optional[float] = None, tolerance: Optional[float] = None) -> int:
+        # tolerance wins; otherwise roughly one screen pixel at this web-mercator zoom
+        if tolerance is None and zoom is not None:
+            tolerance = 360.0 / (256 * 2 ** zoom)
+        if tolerance is None:
+            return 0
+        return max(i for i, t in enumerate(self.tolerances) if t <= tolerance)
+
+    def geometry_bytes(self, municipality_id: str, level: int = 0, gzipped: bool = False) -> Optional[bytes]:
+        fid = self.feature_id(municipality_id)
+        if fid is None:
+            return None
+        return (self.gzipped if gzipped else self.levels)[level][fid]
+
+    def geojson(self, municipality_id: str) -> Optional[dict]:
+        raw = self.geometry_bytes(municipality_id, 0)
+        return None if raw is None else json.loads(raw)
+
+    def shape(self, municipality_id: str):
+        """Original geometry as a shapely object (optional dependency)."""
+        from shapely.geometry import shape
+        geom = self.geojson(municipality_id)
+        return None if geom is None else shape(geom)
+
+    def report(self) -> Dict:
+        return {
+            "features": len(self._rings),
+            "levels": [
+                {
+                    "tolerance": t,
+                    "vertices": self._vertices[i],
+                    "bytes": sum(map(len, self.levels[i].values())),
+                    "gzip_bytes": sum(map(len, self.gzipped[i].values())),
+                }
+                for i, t in enumerate(self.tolerances)
+            ],
+        }
@@ -1,7 +1,12 @@
 # app/services/ideb.py
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+from app.services import snapshot
+from app.services.ideb_store import IDEBStore, KEY_COLS, METRICS, melt_wide, wide_years
+from app.services.keys import municipality_key
+from app.serialization import encode_strs, json_array
 
 def _normalize(s: str) -> str:
     import unicodedata, re
@@ -11,57 +16,140 @@ def _normalize(s: str) -> str:
     s = re.sub(r"\s+", " ", s)
     return s
 
+def _contiguous_ranges(values: np.ndarray) -> Dict:
+    # values já ordenado: {valor: (início, fim)} de cada bloco contíguo
+    if len(values) == 0:
+        return {}
+    starts = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate(([0], starts))
+    stops = np.concatenate((starts[1:], [len(values)]))
+    return {values[a]: (int(a), int(b)) for a, b in zip(starts, stops)}
+
 class IDEBService:
     """
     Novo serviço: carrega EF1, EF2 e EM; unifica em formato longo:
-      [ID_ESCOLA, NO_ESCOLA, NO_MUNICIPIO, municipio_norm, ensino, ano, nota_ideb]
+      [ID_ESCOLA, NO_ESCOLA, CO_MUNICIPIO, NO_MUNICIPIO, REDE, municipio_norm, ensino, ano,
+       nota_ideb, aprovacao, rendimento, matematica, portugues, nota_media, projecao]
+    (nota_ideb = IDEB observado; anos são linhas, não colunas) com ID_ESCOLA e
+    CO_MUNICIPIO já nas chaves canônicas int64 (app/services/keys.py),
+    ordenado por cidade/escola/ensino/ano, com um índice cidade -> faixa de linhas
+    (por nome normalizado e por código IBGE) para as consultas por cidade.
+    Com `store` (app/services/ideb_store.py) não vazia, os dados vêm das partições
+    por ano da base longa em vez dos CSVs; vazia, é semeada a partir dos CSVs.
+    Consultas filtradas por ano (`metricas_by_city`) leem só as partições daquele ano.
+    Com `snapshot_dir`, as tabelas já normalizadas são lidas do snapshot colunar
+    (ver app/services/snapshot.py) em vez de reprocessar os CSVs.
     """
+    # incremente quando mudar o formato de df_long/df_escolas (invalida snapshots)
+    SNAPSHOT_VERSION = 4
+
     def __init__(self,
                  csv_ef1: str,
                  csv_ef2: str,
-                 csv_em: str):
-        self.df_long = self._load_three(csv_ef1, csv_ef2, csv_em)
+                 csv_em: str,
+                 snapshot_dir: Optional[str] = None,
+                 store: Optional[IDEBStore] = None):
+        self.store = store
+        if store is not None and not store.partitions():
+            # base longa vazia: semeada dos CSVs, haja ou não snapshot colunar válido
+            store.append(self._load_three(csv_ef1, csv_ef2, csv_em))
+        use_store = store is not None and bool(store.partitions())
+        sources = store.sources() if use_store else [csv_ef1, csv_ef2, csv_em]
+        tables = snapshot.load_or_build(
+            snapshot_dir, "ideb", sources, self.SNAPSHOT_VERSION,
+            lambda: self._build_tables(csv_ef1, csv_ef2, csv_em, use_store),
+        )
+        self.df_long = tables["df_long"]
+        self.df_escolas = tables["df_escolas"]
+        self._build_index()
+        # edição -> (linhas só da partição do ano, faixas por cidade); ver `_year`. Só entram
+        # as edições que a base tem, então o cache fica limitado a elas
+        self._store_years = frozenset(store.years()) if use_store else frozenset()
+        self._years: Dict[int, Tuple[pd.DataFrame, Dict]] = {}
+
+    def _build_tables(self, ef1: str, ef2: str, em: str, use_store: bool = False) -> Dict[str, pd.DataFrame]:
+        long = self.store.read() if use_store else self._load_three(ef1, ef2, em)
+        df_long = self._long_table(long)
         # tabela de escolas única (ajuda no endpoint /municipios/{cidade}/escolas)
-        self.df_escolas = (
-            self.df_long[["ID_ESCOLA", "NO_ESCOLA", "NO_MUNICIPIO", "municipio_norm"]]
+        df_escolas = (
+            df_long[["ID_ESCOLA", "NO_ESCOLA", "NO_MUNICIPIO", "municipio_norm"]]
             .drop_duplicates()
             .rename(columns={"NO_ESCOLA": "escola", "NO_MUNICIPIO": "municipio"})
+            .sort_values(["municipio_norm", "escola", "ID_ESCOLA"], kind="stable")
+            .reset_index(drop=True)
         )
+        return {"df_long": df_long, "df_escolas": df_escolas}
+
+    @staticmethod
+    def _long_table(long: pd.DataFrame) -> pd.DataFrame:
+        # formato longo da base/CSVs -> df_long (colunas, tipos e ordem por cidade/escola/etapa/ano)
+        long = long.assign(municipio_norm=long["NO_MUNICIPIO"].map(_normalize))
+        cols = ["ID_ESCOLA", "NO_ESCOLA", "CO_MUNICIPIO", "NO_MUNICIPIO", "REDE", "municipio_norm", "ensino", "ano"]
+        long = long[cols + list(METRICS)].rename(columns={"observado": "nota_ideb"})
+        long = long.astype({"ID_ESCOLA": "int64", "ano": "Int64"})
+        df_long = (
+            long
+            .sort_values(["municipio_norm", "ID_ESCOLA", "NO_ESCOLA", "ensino", "ano"], kind="stable")
+            .reset_index(drop=True)
+        )
+        # nota_ideb logo depois de ano, como nas versões anteriores da tabela
+        front = cols + ["nota_ideb"]
+        return df_long[front + [c for c in df_long.columns if c not in front]]
+
+    def _year(self, ano: int) -> Optional[Tuple[pd.DataFrame, Dict]]:
+        # uma edição lida só das suas partições na base longa, indexada por cidade como df_long;
+        # None (sem leitura nem cache) para edições que a base não tem
+        if ano not in self._store_years:
+            return None
+        cached = self._years.get(ano)
+        if cached is None:
+            df = self._long_table(self.store.read(anos=[ano]))
+            cached = self._years[ano] = (df, _contiguous_ranges(df["municipio_norm"].to_numpy()))
+        return cached
+
+    def _build_index(self) -> None:
+        # faixas contíguas por cidade nas duas tabelas (ambas ordenadas por municipio_norm)
+        self._rows_by_city = _contiguous_ranges(self.df_long["municipio_norm"].to_numpy())
+        self._escolas_by_city = _contiguous_ranges(self.df_escolas["municipio_norm"].to_numpy())
+        # código IBGE (6 dígitos) -> nome normalizado (primeira linha de cada cidade)
+        codes = self.df_long["CO_MUNICIPIO"]
+        self._city_by_code = {
+            municipality_key(codes.iat[start]): city
+            for city, (start, _) in self._rows_by_city.items()
+            if not pd.isna(codes.iat[start])
+        }
+
+    def city_key(self, city: str) -> Optional[str]:
+        # aceita nome do município ou código IBGE (6 ou 7 dígitos)
+        c = (city or "").strip()
+        if c.isdigit():
+            return self._city_by_code.get(municipality_key(c))
+        return _normalize(c)
 
     def _read_and_melt(self, path: str, ensino_label: str) -> pd.DataFrame:
-        df = pd.read_csv(path, dtype={"ID_ESCOLA": str}, low_memory=False)
+        df = pd.read_csv(path, dtype={"ID_ESCOLA": str, "CO_MUNICIPIO": str}, low_memory=False)
         df.replace(["-", ""], np.nan, inplace=True)
 
         # 2 formatos possíveis:
-        # (A) largo: VL_OBSERVADO_2017, VL_OBSERVADO_2019, VL_OBSERVADO_2021
-        wide_cols = [c for c in df.columns if str(c).startswith("VL_OBSERVADO_")]
-        if wide_cols:
-            melted = df.melt(
-                id_vars=["ID_ESCOLA", "NO_ESCOLA", "NO_MUNICIPIO"],
-                value_vars=wide_cols,
-                var_name="metric",
-                value_name="nota_ideb",
-            )
-            # extrai o ano do sufixo
-            melted["ano"] = pd.to_numeric(
-                melted["metric"].str.replace("VL_OBSERVADO_", "", regex=False),
-                errors="coerce"
-            ).astype("Int64")
-            melted.drop(columns=["metric"], inplace=True)
-        else:
-            # (B) longo: VL_OBSERVADO + coluna de ano (AN_REFERENCIA/ANO/NU_ANO)
-            ano_col = next((c for c in ["AN_REFERENCIA", "ANO", "NU_ANO"] if c in df.columns), None)
-            if not ano_col:
-                raise ValueError(f"Não encontrei coluna de ano em {path}")
-            melted = df[["ID_ESCOLA", "NO_ESCOLA", "NO_MUNICIPIO", ano_col, "VL_OBSERVADO"]].copy()
-            melted.rename(columns={ano_col: "ano", "VL_OBSERVADO": "nota_ideb"}, inplace=True)
-
-        melted["ensino"] = ensino_label
-        melted["municipio_norm"] = melted["NO_MUNICIPIO"].map(_normalize)
-        # normalizações numéricas
-        melted["ano"] = pd.to_numeric(melted["ano"], errors="coerce").astype("Int64")
-        melted["nota_ideb"] = pd.to_numeric(melted["nota_ideb"], errors="coerce")
-        return melted[["ID_ESCOLA", "NO_ESCOLA", "NO_MUNICIPIO", "municipio_norm", "ensino", "ano", "nota_ideb"]]
+        # (A) largo: VL_<MÉTRICA>_<ano> (qualquer conjunto de anos)
+        if wide_years(df.columns):
+            return melt_wide(df, ensino_label)
+        # (B) longo: VL_<MÉTRICA> sem ano + coluna de ano (AN_REFERENCIA/ANO/NU_ANO)
+        ano_col = next((c for c in ["AN_REFERENCIA", "ANO", "NU_ANO"] if c in df.columns), None)
+        if not ano_col:
+            raise ValueError(f"Não encontrei coluna de ano em {path}")
+        wide = df[[c for c in KEY_COLS if c in df.columns]].copy()
+        anos = pd.to_numeric(df[ano_col], errors="coerce")
+        parts = []
+        for ano in sorted(anos.dropna().unique()):
+            sel = (anos == ano).to_numpy()
+            part = wide[sel].copy()
+            for template in METRICS.values():
+                col = template.replace("_{ano}", "")
+                if col in df.columns:
+                    part[template.format(ano=int(ano))] = df.loc[sel, col].to_numpy()
+            parts.append(melt_wide(part, ensino_label))
+        return pd.concat(parts, ignore_index=True) if parts else melt_wide(wide, ensino_label)
 
     def _load_three(self, ef1: str, ef2: str, em: str) -> pd.DataFrame:
         parts = [
@@ -73,33 +161,91 @@ class IDEBService:
 
     # ---------- NOVOS MÉTODOS para endpoints por nome da cidade ----------
 
-    def list_schools_by_city(self, city_name: str) -> List[Dict]:
-        c = _normalize(city_name)
-        sub = self.df_escolas[self.df_escolas["municipio_norm"] == c]
-        return [
-            {"id_escola": r.ID_ESCOLA, "escola": r.escola}
-            for r in sub.sort_values("escola").itertuples(index=False)
-        ]
+    def list_schools_json(self, city_name: str) -> Optional[bytes]:
+        """[{id_escola, escola}] das escolas da cidade, já serializado (None = cidade sem escolas)."""
+        rng = self._escolas_by_city.get(self.city_key(city_name))
+        if rng is None or rng[0] == rng[1]:
+            return None
+        sub = self.df_escolas.iloc[rng[0]:rng[1]]
+        return json_array(
+            f'{{"id_escola":"{i}","escola":{e}}}'
+            for i, e in zip(sub["ID_ESCOLA"].tolist(), encode_strs(sub["escola"].tolist()))
+        )
 
-    def ideb_by_city(self, city_name: str, ano: Optional[int] = None) -> List[Dict]:
-        c = _normalize(city_name)
-        df = self.df_long[self.df_long["municipio_norm"] == c].copy()
-        if ano is not None:
-            df = df[df["ano"] == ano]
+    @staticmethod
+    def _pack(df: pd.DataFrame) -> List[Dict]:
+        # Empacota {ensino: {ano: nota}}; linhas já vêm ordenadas por escola/ensino/ano
+        out = []
+        key = None
+        ideb: Dict = {}
+        for id_escola, escola, ens, a, v in zip(
+            df["ID_ESCOLA"].tolist(),
+            df["NO_ESCOLA"].tolist(),
+            df["ensino"].tolist(),
+            df["ano"].to_numpy(dtype="float64", na_value=np.nan).tolist(),
+            df["nota_ideb"].tolist(),
+        ):
+            if pd.isna(escola):
+                continue
+            if (id_escola, escola) != key:
+                key = (id_escola, escola)
+                ideb = {}
+                out.append({"id_escola": str(id_escola), "escola": escola, "ideb": ideb})
+            anos = ideb.setdefault(ens, {})
+            if a != a:  # ano ausente
+                continue
+            anos[int(a)] = None if v != v else float(v)
+        return out
 
-        if df.empty:
+    def metricas_by_city(self, city_name: str, ano: Optional[int] = None,
+                         ensino: Optional[str] = None) -> List[Dict]:
+        """
+        Todas as métricas por escola e etapa: {ano: {métrica: valor}}, com
+        resultado = observado - projeção. Linhas já vêm ordenadas por escola/etapa/ano.
+        """
+        if ano is not None and self.store is not None:
+            year = self._year(ano)  # só as partições do ano pedido
+            if year is None:
+                return []
+            table, ranges = year
+        else:
+            table, ranges = self.df_long, self._rows_by_city
+        rng = ranges.get(self.city_key(city_name))
+        if rng is None:
             return []
+        df = table.iloc[rng[0]:rng[1]]
+        if ano is not None:
+            df = df[df["ano"] == ano]
+        if ensino is not None:
+            df = df[df["ensino"] == ensino.upper()]
 
-        # Empacota {ensino: {ano: nota}}
+        # métrica -> coluna de df_long (o observado é a nota_ideb)
+        metrics = [(m, "nota_ideb" if m == "observado" else m) for m in METRICS]
+        values = {col: df[col].to_numpy(dtype="float64").tolist() for _, col in metrics}
         out = []
-        for (id_escola, escola), g in df.groupby(["ID_ESCOLA", "NO_ESCOLA"]):
-            ideb = {}
-            for ens, gg in g.groupby("ensino"):
-                ser = gg.dropna(subset=["ano"]).set_index("ano")["nota_ideb"].sort_index()
-                ideb[ens] = {int(a): (None if pd.isna(v) else float(v)) for a, v in ser.items()}
-            out.append({
-                "id_escola": id_escola,
-                "escola": escola,
-                "ideb": ideb
-            })
-        return out
\ No newline at end of file
+        key = None
+        anos: Dict = {}
+        for i, (id_escola, escola, rede, ens, a) in enumerate(zip(
+            df["ID_ESCOLA"].tolist(),
+            df["NO_ESCOLA"].tolist(),
+            df["REDE"].tolist(),
+            df["ensino"].tolist(),
+            df["ano"].to_numpy(dtype="float64", na_value=np.nan).tolist(),
+        )):
+            if pd.isna(escola) or a != a:
+                continue
+            if (id_escola, escola, ens) != key:
+                key = (id_escola, escola, ens)
+                anos = {}
+                out.append({
+                    "id_escola": str(id_escola),
+                    "escola": escola,
+                    "rede": None if pd.isna(rede) else rede,
+                    "ensino": ens,
+                    "anos": anos,
+                })
+            row = {name: (None if values[col][i] != values[col][i] else values[col][i]) for name, col in metrics}
+            obs, proj = row["observado"], row["projecao"]
+            row["resultado"] = None if obs is None or proj is None else round(obs - proj, 6)
+            anos[int(a)] = row
+        return out
@@ -0,0 +1,185 @@
+# app/services/ideb_store.py
+"""
+Base longa do IDEB, independente de ano, com todas as métricas.
+
+Uma linha por (escola, etapa, ano) com as colunas de `METRICS`; o ano é um
+valor da linha e não parte do nome da coluna, então uma edição nova (2023,
+2025...) não muda o formato. Em disco, cada (ano, etapa) é uma partição
+própria em `<raiz>/ano=<AAAA>/<etapa>/`, no formato colunar dos snapshots
+(app/services/snapshot.py): acrescentar uma edição grava só as partições
+novas, e uma leitura filtrada por ano abre só os diretórios daquele ano.
+"""
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from app.services import snapshot
+from app.services.keys import school_ids
+
+# métrica longa -> coluna larga dos CSVs do INEP ("{ano}" = ano da edição)
+METRICS = {
+    "aprovacao": "VL_APROVACAO_{ano}_SI_4",
+    "rendimento": "VL_INDICADOR_REND_{ano}",
+    "matematica": "VL_NOTA_MATEMATICA_{ano}",
+    "portugues": "VL_NOTA_PORTUGUES_{ano}",
+    "nota_media": "VL_NOTA_MEDIA_{ano}",
+    "observado": "VL_OBSERVADO_{ano}",
+    "projecao": "VL_PROJECAO_{ano}",
+}
+KEY_COLS = ["ID_ESCOLA", "NO_ESCOLA", "CO_MUNICIPIO", "NO_MUNICIPIO", "REDE"]
+_WIDE = re.compile(
+    "^(?:" + "|".join(
+        f"(?P<{m}>" + re.escape(t).replace(re.escape("{ano}"), r"\d{4}") + ")" for m, t in METRICS.items()
+    ) + ")$"
+)
+_PART = re.compile(r"^ano=(\d{4})$")
+
+
+def numeric(s: pd.Series) -> pd.Series:
+    # "-", "ND" e vazios viram NaN; decimais com vírgula são aceitos
+    # (texto pode vir como object ou como o dtype str do pandas 3)
+    if not pd.api.types.is_numeric_dtype(s):
+        s = s.astype(str).str.replace(",", ".", regex=False)
+    return pd.to_numeric(s, errors="coerce")
+
+
+def wide_years(columns: Iterable[str]) -> Dict[int, Dict[str, str]]:
+    """{ano: {métrica: coluna larga}} das colunas presentes."""
+    out: Dict[int, Dict[str, str]] = {}
+    for col in columns:
+        m = _WIDE.match(str(col))
+        if m is None:
+            continue
+        metric = m.lastgroup
+        ano = int(re.search(r"\d{4}", col).group())
+        out.setdefault(ano, {})[metric] = col
+    return dict(sorted(out.items()))
+
+
+def melt_wide(df: pd.DataFrame, ensino: str, anos: Optional[Iterable[int]] = None) -> pd.DataFrame:
+    """
+    Formato largo do INEP (VL_*_<ano>) -> formato longo
+      [ID_ESCOLA, NO_ESCOLA, CO_MUNICIPIO, NO_MUNICIPIO, REDE, ensino, ano, <METRICS>]
+    um bloco por ano (na ordem dos anos), métricas ausentes naquele ano como NaN.
+    """
+    by_year = wide_years(df.columns)
+    if anos is not None:
+        wanted = set(anos)
+        by_year = {a: cols for a, cols in by_year.items() if a in wanted}
+    keys = df[[c for c in KEY_COLS if c in df.columns]].reindex(columns=KEY_COLS)
+    ids = school_ids(keys["ID_ESCOLA"]).array
+    codes = school_ids(keys["CO_MUNICIPIO"]).array
+
+    parts = []
+    for ano, cols in by_year.items():
+        part = keys.assign(ID_ESCOLA=ids, CO_MUNICIPIO=codes, ensino=ensino, ano=ano)
+        for metric in METRICS:
+            col = cols.get(metric)
+            part[metric] = numeric(df[col]).to_numpy(dtype="float64") if col else float("nan")
+        parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=KEY_COLS + ["ensino", "ano"] + list(METRICS))
+    out = pd.concat(parts, ignore_index=True)
+    out = out[out["ID_ESCOLA"].notna()].astype({"ID_ESCOLA": "int64", "ano": "int64"})
+    return out.reset_index(drop=True)
+
+
+class IDEBStore:
+    """
+    Partições (ano, etapa) da base longa. Com `root`, persistidas em disco;
+    sem `root`, só em memória (mesma API). Partições lidas ficam em cache.
+    """
+    VERSION = 1
+    TABLE = "ideb"
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root) if root else None
+        self._cache: Dict[Tuple[int, str], pd.DataFrame] = {}
+
+    def _dir(self, ano: int, ensino: str) -> Path:
+        return self.root / f"ano={ano}" / ensino
+
+    def partitions(self) -> List[Tuple[int, str]]:
+        if self.root is None:
+            return sorted(self._cache)
+        found = []
+        if self.root.is_dir():
+            for year_dir in self.root.iterdir():
+                m = _PART.match(year_dir.name)
+                if m is None or not year_dir.is_dir():
+                    continue
+                for stage_dir in year_dir.iterdir():
+                    if (stage_dir / snapshot.MANIFEST).exists():
+                        found.append((int(m.group(1)), stage_dir.name))
+        return sorted(found)
+
+    def years(self) -> List[int]:
+        return sorted({ano for ano, _ in self.partitions()})
+
+    def sources(self) -> List[str]:
+        """Manifestos das partições (versão dos dados e detecção de mudanças)."""
+        if self.root is None:
+            return []
+        return [str(self._dir(a, e) / snapshot.MANIFEST) for a, e in self.partitions()]
+
+    def append(self, df: pd.DataFrame, replace: bool = False) -> List[Tuple[int, str]]:
+        """
+        Grava as partições (ano, etapa) de `df` (formato de `melt_wide`) e devolve
+        as gravadas. Partições já existentes ficam intactas, a não ser com `replace`.
+        """
+        existing = set(self.partitions())
+        written = []
+        for (ano, ensino), part in df.groupby(["ano", "ensino"], sort=True):
+            key = (int(ano), str(ensino))
+            if key in existing and not replace:
+                continue
+            part = part.drop(columns=["ano", "ensino"]).reset_index(drop=True)
+            if self.root is not None:
+                snapshot.write_snapshot(self._dir(*key), {self.TABLE: part}, [], self.VERSION)
+            self._cache[key] = part
+            written.append(key)
+        return written
+
+    def drop(self, ano: int, ensino: Optional[str] = None) -> None:
+        for key in [k for k in self.partitions() if k[0] == ano and ensino in (None, k[1])]:
+            self._cache.pop(key, None)
+            if self.root is not None:
+                shutil.rmtree(self._dir(*key), ignore_errors=True)
+
+    def _load(self, key: Tuple[int, str]) -> Optional[pd.DataFrame]:
+        part = self._cache.get(key)
+        if part is None and self.root is not None:
+            tables = snapshot.read_snapshot(self._dir(*key), [], self.VERSION)
+            if tables is not None:
+                part = self._cache[key] = tables[self.TABLE]
+        return part
+
+    def read(self, anos: Optional[Iterable[int]] = None, ensinos: Optional[Iterable[str]] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Linhas das partições pedidas (todas por padrão), na ordem (ano, etapa)."""
+        anos = None if anos is None else set(anos)
+        ensinos = None if ensinos is None else set(ensinos)
+        parts = []
+        for ano, ensino in self.partitions():
+            if (anos is not None and ano not in anos) or (ensinos is not None and ensino not in ensinos):
+                continue
+            part = self._load((ano, ensino))
+            if part is None:
+                continue
+            if columns is not None:
+                part = part[[c for c in columns if c in part.columns]]
+            parts.append(part.assign(ensino=ensino, ano=ano))
+        if not parts:
+            cols = (columns or KEY_COLS + list(METRICS)) + ["ensino", "ano"]
+            return pd.DataFrame(columns=cols)
+        return pd.concat(parts, ignore_index=True)
+
+    def stats(self) -> Dict:
+        return {
+            "root": str(self.root) if self.root else None,
+            "years": self.years(),
+            "partitions": [f"{a}/{e}" for a, e in self.partitions()],
+        }
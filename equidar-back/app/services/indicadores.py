@@ -0,0 +1,309 @@
+# app/services/indicadores.py
+import csv
+import io
+import pandas as pd
+import numpy as np
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.services.ideb import IDEBService, _contiguous_ranges
+from app.services.infra import InfraService
+from app.services.keys import SchoolKeyspace, municipality_keys
+from app.serialization import dumps, encode_floats, encode_strs, json_array
+
+# colunas do CSV em bloco (`iter_csv`), na ordem do arquivo
+CSV_COLUMNS = [
+    "cidade", "id_escola", "escola", "nota_ideb_media", "score_infraestrutura",
+    "indice_geral", "score_fund", "score_med",
+]
+
+# colunas aceitas em `sort` (prefixo "-" = decrescente)
+SORT_COLUMNS = [
+    "escola", "id_escola", "nota_ideb_media", "score_infraestrutura", "indice_geral", "score_fund", "score_med",
+]
+
+def _scores_infra(sub: pd.DataFrame, ndigits: Optional[int]) -> List[str]:
+    return [
+        f'{{"FUND":{f},"MED":{m}}}'
+        for f, m in zip(encode_floats(sub["score_fund"].tolist(), ndigits),
+                        encode_floats(sub["score_med"].tolist(), ndigits))
+    ]
+
+def _encoders(ndigits: Optional[int], names: List[str]) -> Dict[str, Callable[[pd.DataFrame], List[str]]]:
+    # campo da resposta -> valores JSON da coluna; só os campos pedidos são montados
+    enc: Dict[str, Callable[[pd.DataFrame], List[str]]] = {
+        "id_escola": lambda sub: [f'"{i}"' for i in sub["id_escola"].tolist()],
+        "escola": lambda sub: encode_strs(sub["escola"].tolist()),
+        "nota_ideb_media": lambda sub: encode_floats(sub["nota_ideb_media"].tolist(), ndigits),
+        "score_infraestrutura": lambda sub: encode_floats(sub["score_infraestrutura"].tolist(), ndigits),
+        "indice_geral": lambda sub: encode_floats(sub["indice_geral"].tolist(), ndigits),
+        "scores_infra": lambda sub: _scores_infra(sub, ndigits),
+        "ideb": lambda sub: sub["ideb_json"].tolist(),
+    }
+    return {name: enc[name] for name in names}
+
+# campos de cada endpoint, na ordem da resposta completa
+INDICADORES_FIELDS = _encoders(2, [
+    "id_escola", "escola", "nota_ideb_media", "score_infraestrutura", "indice_geral", "scores_infra", "ideb",
+])
+IDEB_FIELDS = _encoders(None, ["id_escola", "escola", "ideb"])
+INFRA_FIELDS = _encoders(None, ["id_escola", "escola", "score_infraestrutura", "scores_infra"])
+
+def _project(sub: pd.DataFrame, fields: List[str], encoders: Dict) -> List[str]:
+    """Objetos JSON só com `fields` (na ordem pedida)."""
+    unknown = [f for f in fields if f not in encoders]
+    if unknown:
+        raise ValueError(f"fields inválidos: {', '.join(unknown)} (use {', '.join(encoders)})")
+    keys = [f'"{f}":' for f in fields]
+    cols = [encoders[f](sub) for f in fields]
+    return ["{" + ",".join(k + v for k, v in zip(keys, vals)) + "}" for vals in zip(*cols)]
+
+def _round2(v) -> Optional[float]:
+    return None if v != v else round(v, 2)
+
+def _school_table(df_long: pd.DataFrame, infra: InfraService, infra_rows: np.ndarray,
+                  keyspace: SchoolKeyspace) -> pd.DataFrame:
+    # uma linha por escola (cidade, ID, nome): média do IDEB, scores de infra e índice geral
+    keys = ["municipio_norm", "ID_ESCOLA", "NO_ESCOLA"]
+    escolas = df_long.groupby(keys, sort=True)["CO_MUNICIPIO"].first()
+
+    # média do IDEB entre EF1, EF2, EM: média dos anos por etapa, depois média das etapas
+    com_ano = df_long[df_long["ano"].notna()]
+    por_etapa = com_ano.groupby(keys + ["ensino"], sort=True)["nota_ideb"].mean()
+    media = por_etapa.groupby(level=keys, sort=True).mean().reindex(escolas.index)
+
+    tbl = escolas.reset_index().rename(columns={"ID_ESCOLA": "id_escola", "NO_ESCOLA": "escola"})
+    tbl.insert(2, "municipio_key", municipality_keys(tbl["CO_MUNICIPIO"]).to_numpy())
+    tbl["nota_ideb_media"] = media.to_numpy()
+
+    # infra só tem ID e scores; junta pela chave densa (lookup em array inteiro)
+    rows = infra_rows[keyspace.positions(tbl["id_escola"])]
+    ok = rows >= 0
+    for col in ["score_fund", "score_med", "score_infraestrutura"]:
+        vals = infra.df_merged[col].to_numpy(dtype="float64")
+        tbl[col] = np.where(ok, vals[np.where(ok, rows, 0)], np.nan) if len(vals) else np.nan
+
+    tbl["indice_geral"] = tbl[["nota_ideb_media", "score_infraestrutura"]].mean(axis=1, skipna=False)
+    return tbl
+
+def _means(tbl: pd.DataFrame) -> pd.DataFrame:
+    return tbl.groupby("municipio_key")[["nota_ideb_media", "score_infraestrutura"]].mean()
+
+# incremente quando mudar o cálculo de `municipality_means` (invalida snapshots)
+MEANS_VERSION = 1
+
+def municipality_means(ideb: IDEBService, infra: InfraService) -> pd.DataFrame:
+    """
+    Mesmas médias por município de `IndicadoresService.por_municipio`, sem montar
+    a tabela de indicadores (nem o keyspace com o ALL_SCHOOLS): o mapa usa isso
+    para as UFs cuja partição não está carregada.
+    """
+    keyspace = SchoolKeyspace({"ideb": ideb.df_long["ID_ESCOLA"], "infra": infra.df_merged["ID_ESCOLA"]})
+    tbl = _school_table(ideb.df_long, infra, keyspace.row_index(infra.df_merged["ID_ESCOLA"]), keyspace)
+    return _means(tbl)
+
+class IndicadoresService:
+    """
+    Tabela materializada de indicadores por escola, montada uma vez na carga
+    (para "todos os anos" e para cada ano do IDEB):
+      [municipio_norm, CO_MUNICIPIO, municipio_key, id_escola, escola, nota_ideb_media,
+       score_fund, score_med, score_infraestrutura, indice_geral, ideb_json]
+    Linhas ordenadas por cidade/escola, com índice cidade -> faixa de linhas e a
+    permutação que dá a ordem do endpoint de indicadores (maior índice geral primeiro).
+    `por_municipio` traz as médias por município (chave IBGE de 6 dígitos).
+    `ideb_json` é o {ensino: {ano: nota}} da escola já serializado; os métodos
+    `*_json` montam o corpo da resposta direto das colunas, sem dicts por linha.
+    """
+    def __init__(self, ideb: IDEBService, infra: InfraService, keyspace: SchoolKeyspace):
+        self.ideb = ideb
+        self.infra = infra
+        self.keyspace = keyspace
+        # chave densa de escola -> linha de infra.df_merged
+        self._infra_rows = keyspace.row_index(infra.df_merged["ID_ESCOLA"])
+        anos = ideb.df_long["ano"].dropna().unique().tolist()
+        self.tables: Dict[Optional[int], Dict] = {None: self._build(ideb.df_long)}
+        for ano in sorted(int(a) for a in anos):
+            self.tables[ano] = self._build(ideb.df_long[ideb.df_long["ano"] == ano])
+        self.por_municipio = _means(self.tables[None]["df"])
+
+    def _build(self, df_long: pd.DataFrame) -> Dict:
+        tbl = _school_table(df_long, self.infra, self._infra_rows, self.keyspace)
+
+        # mesma ordenação (cidade, ID, nome) e mesmas escolas (sem nome = fora) do groupby acima
+        tbl["ideb_json"] = [dumps(r["ideb"]).decode("utf-8") for r in IDEBService._pack(df_long)]
+
+        # ordem do endpoint: -(índice geral arredondado), nome da escola; estável por ID
+        indice = [-(_round2(v) or -1e9) for v in tbl["indice_geral"].tolist()]
+        nomes = ["" if pd.isna(e) else e for e in tbl["escola"].tolist()]
+        cidade = tbl["municipio_norm"].to_numpy()
+        ordem = np.lexsort((np.array(nomes, dtype=object), np.array(indice), cidade))
+
+        return {
+            "df": tbl,
+            "ranges": _contiguous_ranges(cidade),
+            "ordem": ordem,
+        }
+
+    def _order(self, t: Dict, sort: str) -> np.ndarray:
+        """
+        Permutação da tabela ordenada por cidade e pela coluna `sort` ("-col" =
+        decrescente; sem nota sempre no fim; empate pelo nome da escola).
+        Calculada na primeira vez que a ordenação é pedida e guardada na tabela.
+        """
+        orders = t.setdefault("orders", {})
+        order = orders.get(sort)
+        if order is not None:
+            return order
+        col, desc = sort.lstrip("-"), sort.startswith("-")
+        if col not in SORT_COLUMNS:
+            raise ValueError(f"sort inválido: '{sort}' (use {', '.join(SORT_COLUMNS)}, com '-' para decrescente)")
+        df = t["df"]
+        if "nome_rank" not in t:
+            nomes = np.array(["" if pd.isna(e) else e for e in df["escola"].tolist()], dtype=object)
+            t["nome_rank"] = np.unique(nomes, return_inverse=True)[1].astype("float64")
+        vals = t["nome_rank"] if col == "escola" else df[col].to_numpy(dtype="float64")
+        vals = -vals if desc else vals
+        vals = np.where(np.isnan(vals), np.inf, vals)
+        order = np.lexsort((t["nome_rank"], vals, df["municipio_norm"].to_numpy()))
+        orders[sort] = order
+        return order
+
+    def _page(self, city_name: str, ano: Optional[int], ordered: bool, sort: Optional[str] = None,
+              limit: Optional[int] = None, offset: int = 0) -> Optional[pd.DataFrame]:
+        """
+        Linhas da cidade (None = cidade sem dados): na ordem da tabela, na ordem do
+        endpoint de indicadores (`ordered`) ou na de `sort`, recortadas por offset/limit.
+        """
+        t = self.tables.get(ano)
+        if t is None:
+            return None
+        rng = t["ranges"].get(self.ideb.city_key(city_name))
+        if rng is None:
+            return None
+        lo, hi = rng
+        start = min(lo + offset, hi)
+        stop = hi if limit is None else min(hi, start + limit)
+        if sort:
+            return t["df"].take(self._order(t, sort)[start:stop])
+        if ordered:
+            return t["df"].take(t["ordem"][start:stop])
+        return t["df"].iloc[start:stop]
+
+    def count(self, city_name: str, ano: Optional[int] = None) -> int:
+        """Total de escolas da cidade (para paginação)."""
+        t = self.tables.get(ano)
+        rng = t["ranges"].get(self.ideb.city_key(city_name)) if t is not None else None
+        return 0 if rng is None else rng[1] - rng[0]
+
+    def city_ranges(self, cities: Optional[Iterable[str]] = None,
+                    ano: Optional[int] = None) -> Tuple[List[Tuple[str, int, int]], List[str]]:
+        """
+        (rótulo, início, fim) de cada cidade pedida na tabela do ano, e as cidades
+        sem dados. Rótulo = nome pedido, ou o nome do município quando `cities`
+        é None (todas as cidades, em ordem alfabética normalizada).
+        """
+        t = self.tables.get(ano)
+        if t is None:
+            return [], list(cities or [])
+        if cities is None:
+            nomes = self.ideb.df_escolas.drop_duplicates("municipio_norm").set_index("municipio_norm")["municipio"]
+            return [(nomes.get(c, c), lo, hi) for c, (lo, hi) in t["ranges"].items()], []
+        found, missing = [], []
+        for city in cities:
+            rng = t["ranges"].get(self.ideb.city_key(city))
+            if rng is None:
+                missing.append(city)
+            else:
+                found.append((city, *rng))
+        return found, missing
+
+    def rows_for_cities(self, cities: Optional[Iterable[str]] = None,
+                        ano: Optional[int] = None) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Linhas de várias cidades de uma vez, cada cidade na ordem do endpoint de
+        indicadores, com a coluna `cidade` (ver `city_ranges`). Devolve também as
+        cidades sem dados.
+        """
+        found, missing = self.city_ranges(cities, ano)
+        t = self.tables.get(ano, self.tables[None])
+        ordem = t["ordem"]
+        idx = np.concatenate([ordem[lo:hi] for _, lo, hi in found]) if found else np.array([], dtype="int64")
+        labels = np.repeat(np.array([c for c, _, _ in found], dtype=object), [hi - lo for _, lo, hi in found])
+        return t["df"].take(idx).assign(cidade=labels), missing
+
+    def iter_ndjson(self, found: List[Tuple[str, int, int]], ano: Optional[int] = None,
+                    chunk_rows: int = 1000) -> Iterator[bytes]:
+        """
+        Uma linha JSON por escola (objeto do endpoint de indicadores + `cidade`),
+        em blocos de até `chunk_rows` escolas: a memória não cresce com o total.
+        """
+        t = self.tables[ano]
+        for label, lo, hi in found:
+            cidade = encode_strs([label])[0]
+            for start in range(lo, hi, chunk_rows):
+                sub = t["df"].take(t["ordem"][start:min(hi, start + chunk_rows)])
+                yield "".join(
+                    f'{{"cidade":{cidade},{obj[1:]}\n' for obj in self._objects(sub)
+                ).encode("utf-8")
+
+    def iter_csv(self, found: List[Tuple[str, int, int]], ano: Optional[int] = None,
+                 chunk_rows: int = 1000) -> Iterator[bytes]:
+        """Mesmas linhas de `iter_ndjson` em CSV (colunas `CSV_COLUMNS`, sem cabeçalho)."""
+        t = self.tables[ano]
+        for label, lo, hi in found:
+            for start in range(lo, hi, chunk_rows):
+                sub = t["df"].take(t["ordem"][start:min(hi, start + chunk_rows)])
+                cols = [sub["id_escola"].tolist(), sub["escola"].tolist()] + [
+                    sub[c].round(2).astype(object).where(sub[c].notna(), None).tolist()
+                    for c in CSV_COLUMNS[3:]
+                ]
+                buf = io.StringIO()
+                csv.writer(buf).writerows(zip([label] * len(sub), *cols))
+                yield buf.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _objects(sub: pd.DataFrame) -> List[str]:
+        # objeto JSON de cada linha da tabela materializada (formato do endpoint de indicadores)
+        cols = zip(
+            sub["id_escola"].tolist(), encode_strs(sub["escola"].tolist()),
+            encode_floats(sub["nota_ideb_media"].tolist(), 2),
+            encode_floats(sub["score_infraestrutura"].tolist(), 2),
+            encode_floats(sub["indice_geral"].tolist(), 2),
+            encode_floats(sub["score_fund"].tolist(), 2), encode_floats(sub["score_med"].tolist(), 2),
+            sub["ideb_json"].tolist(),
+        )
+        return [
+            f'{{"id_escola":"{i}","escola":{e},"nota_ideb_media":{n},"score_infraestrutura":{s},'
+            f'"indice_geral":{g},"scores_infra":{{"FUND":{f},"MED":{m}}},"ideb":{j}}}'
+            for i, e, n, s, g, f, m, j in cols
+        ]
+
+    def indicadores_json(self, city_name: str, ano: Optional[int] = None, sort: Optional[str] = None,
+                         limit: Optional[int] = None, offset: int = 0,
+                         fields: Optional[List[str]] = None) -> Optional[bytes]:
+        """
+        Escolas da cidade com notas, scores de infra, índice geral e IDEB por
+        etapa/ano, já serializadas (None = sem dados).
+        """
+        sub = self._page(city_name, ano, True, sort, limit, offset)
+        if sub is None:
+            return None
+        if fields is None:
+            return json_array(self._objects(sub))
+        return json_array(_project(sub, fields, INDICADORES_FIELDS))
+
+    def ideb_json(self, city_name: str, ano: Optional[int] = None, sort: Optional[str] = None,
+                  limit: Optional[int] = None, offset: int = 0,
+                  fields: Optional[List[str]] = None) -> Optional[bytes]:
+        """{ensino: {ano: nota}} do IDEB de cada escola da cidade, já serializado (None = sem dados)."""
+        sub = self._page(city_name, ano, False, sort, limit, offset)
+        if sub is None:
+            return None
+        return json_array(_project(sub, fields or list(IDEB_FIELDS), IDEB_FIELDS))
+
+    def infra_json(self, city_name: str, sort: Optional[str] = None, limit: Optional[int] = None,
+                   offset: int = 0, fields: Optional[List[str]] = None) -> Optional[bytes]:
+        """Scores de infraestrutura (geral, FUND e MED) das escolas da cidade, já serializados (None = sem dados)."""
+        sub = self._page(city_name, None, False, sort, limit, offset)
+        if sub is None:
+            return None
+        return json_array(_project(sub, fields or list(INFRA_FIELDS), INFRA_FIELDS))
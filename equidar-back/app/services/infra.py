@@ -1,20 +1,37 @@
 # app/services/infra.py
 import pandas as pd
 import numpy as np
+from typing import Dict, Optional
+
+from app.services import snapshot
+from app.services.keys import school_ids
 
 class InfraService:
     """
     Lê infra FUND e MED por ID de escola e calcula um score combinado.
     Saída: df_merged com colunas:
-      - ID_ESCOLA (str)
+      - ID_ESCOLA (int64, chave canônica de app/services/keys.py)
       - score_fund (float, opcional)
       - score_med (float, opcional)
       - score_infraestrutura (float, média entre fund/med se ambos existirem; senão o que houver)
+    Com `snapshot_dir`, as tabelas são lidas do snapshot colunar quando válido.
     """
-    def __init__(self, csv_fund: str, csv_med: str):
-        self.df_fund = self._load_one(csv_fund, nivel="FUND")
-        self.df_med  = self._load_one(csv_med,  nivel="MED")
-        self.df_merged = self._merge_levels(self.df_fund, self.df_med)
+    # incremente quando mudar o formato das tabelas (invalida snapshots)
+    SNAPSHOT_VERSION = 2
+
+    def __init__(self, csv_fund: str, csv_med: str, snapshot_dir: Optional[str] = None):
+        tables = snapshot.load_or_build(
+            snapshot_dir, "infra", [csv_fund, csv_med], self.SNAPSHOT_VERSION,
+            lambda: self._build_tables(csv_fund, csv_med),
+        )
+        self.df_fund = tables["df_fund"]
+        self.df_med = tables["df_med"]
+        self.df_merged = tables["df_merged"]
+
+    def _build_tables(self, csv_fund: str, csv_med: str) -> Dict[str, pd.DataFrame]:
+        df_fund = self._load_one(csv_fund, nivel="FUND")
+        df_med = self._load_one(csv_med, nivel="MED")
+        return {"df_fund": df_fund, "df_med": df_med, "df_merged": self._merge_levels(df_fund, df_med)}
 
     def _load_one(self, path: str, nivel: str) -> pd.DataFrame:
         df = pd.read_csv(path, dtype=str, low_memory=False)
@@ -48,8 +65,9 @@ class InfraService:
         out.columns = ["ID_ESCOLA", f"score_{nivel.lower()}"]
         # força numérico
         out[f"score_{nivel.lower()}"] = pd.to_numeric(out[f"score_{nivel.lower()}"], errors="coerce")
-        # garante string
-        out["ID_ESCOLA"] = out["ID_ESCOLA"].astype(str)
+        # chave canônica int64 (descarta IDs inválidos)
+        out["ID_ESCOLA"] = school_ids(out["ID_ESCOLA"]).to_numpy()
+        out = out[out["ID_ESCOLA"].notna()].astype({"ID_ESCOLA": "int64"})
         # 1 linha por escola (caso venham duplicadas)
         out = out.groupby("ID_ESCOLA", as_index=False).agg({f"score_{nivel.lower()}": "mean"})
         return out
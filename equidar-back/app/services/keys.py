@@ -0,0 +1,94 @@
+# app/services/keys.py
+"""
+Chaves canônicas compartilhadas entre os datasets.
+
+- escola: ID INEP como int64 ("25033204.0", "25033204" e 25033204 viram 25033204)
+- município: código IBGE de 6 dígitos como int64 (o 7º dígito do código IBGE
+  é só verificador; 2507507 e 250750 viram 250750)
+- UF: os 2 primeiros dígitos do código do município (25 -> PB)
+
+`SchoolKeyspace` reúne os IDs de todas as fontes num espaço denso 0..n-1, de
+modo que os joins entre datasets viram lookups em arrays inteiros.
+"""
+import numpy as np
+import pandas as pd
+from itertools import combinations
+from typing import Dict, Optional
+
+
+def school_ids(values) -> pd.Series:
+    # aceita texto ("25033204.0"), float ou int; inválidos viram <NA>
+    num = pd.to_numeric(pd.Series(values), errors="coerce")
+    num = num.where(np.isfinite(num) & (num == np.floor(num)))
+    return num.astype("Int64")
+
+
+def municipality_keys(values) -> pd.Series:
+    codes = school_ids(values)
+    return codes.where(codes < 1_000_000, codes // 10)
+
+
+def municipality_key(value) -> Optional[int]:
+    try:
+        code = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return code if code < 1_000_000 else code // 10
+
+
+UF_BY_CODE = {
+    11: "RO", 12: "AC", 13: "AM", 14: "RR", 15: "PA", 16: "AP", 17: "TO",
+    21: "MA", 22: "PI", 23: "CE", 24: "RN", 25: "PB", 26: "PE", 27: "AL", 28: "SE", 29: "BA",
+    31: "MG", 32: "ES", 33: "RJ", 35: "SP",
+    41: "PR", 42: "SC", 43: "RS",
+    50: "MS", 51: "MT", 52: "GO", 53: "DF",
+}
+
+
+def uf_from_code(value) -> Optional[str]:
+    """Sigla da UF de um código IBGE de município (6 ou 7 dígitos); None se inválido."""
+    key = municipality_key(value)
+    if key is None or not 100_000 <= key < 1_000_000:
+        return None
+    return UF_BY_CODE.get(key // 10_000)
+
+
+class SchoolKeyspace:
+    """
+    Espaço denso de IDs de escola: `ids` é o array ordenado de todos os IDs
+    conhecidos, e a posição de cada ID nele é a sua chave densa.
+    """
+    def __init__(self, sources: Dict[str, pd.Series]):
+        self.sources = {
+            name: np.unique(school_ids(ids).dropna().to_numpy(dtype="int64"))
+            for name, ids in sources.items()
+        }
+        parts = list(self.sources.values())
+        self.ids = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype="int64")
+
+    def positions(self, ids) -> np.ndarray:
+        """Chave densa de cada ID (-1 quando o ID não existe no espaço)."""
+        ids = school_ids(ids).fillna(-1).to_numpy(dtype="int64")
+        if not len(self.ids):
+            return np.full(len(ids), -1, dtype="int64")
+        pos = np.searchsorted(self.ids, ids).clip(max=len(self.ids) - 1)
+        return np.where(self.ids[pos] == ids, pos, -1)
+
+    def row_index(self, ids) -> np.ndarray:
+        """Array denso chave -> linha da tabela cujos IDs são `ids` (-1 = ausente)."""
+        out = np.full(len(self.ids), -1, dtype="int64")
+        pos = self.positions(ids)
+        ok = pos >= 0
+        out[pos[ok]] = np.flatnonzero(ok)
+        return out
+
+    def report(self) -> Dict:
+        # cobertura dos joins: quantas escolas cada par de fontes tem em comum
+        return {
+            "schools": int(len(self.ids)),
+            "by_source": {name: int(len(ids)) for name, ids in self.sources.items()},
+            "matched": {
+                f"{a}&{b}": int(len(np.intersect1d(self.sources[a], self.sources[b], assume_unique=True)))
+                for a, b in combinations(self.sources, 2)
+            },
+        }
@@ -1,37 +1,88 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Set
 from app.models import Municipality
+from app.services.ideb import _normalize
+from app.serialization import join_arrays
+
+NGRAM = 3
+
+def _ngrams(s: str) -> Set[str]:
+    return {s[i:i + NGRAM] for i in range(len(s) - NGRAM + 1)}
 
 class MunicipalityService:
     def __init__(self, items: List[Municipality]):
         self.items = items
+        # indexes built once; positions keep the original order for stable pagination
+        self._by_id: Dict[str, Municipality] = {}
+        self._pos_by_id: Dict[str, int] = {}
+        self._by_state: Dict[str, List[int]] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        self._folded: List[tuple] = []
+        self._states: List[str] = [m.state.lower() for m in items]
+        # items are validated on load and never mutated: encode each one once
+        self._json: List[bytes] = [m.model_dump_json().encode("utf-8") for m in items]
+        for pos, m in enumerate(items):
+            self._by_id.setdefault(m.id, m)
+            self._pos_by_id.setdefault(m.id, pos)
+            self._by_state.setdefault(self._states[pos], []).append(pos)
+            name, mid = _normalize(m.name), _normalize(m.id)
+            self._folded.append((name, mid))
+            for g in _ngrams(name) | _ngrams(mid):
+                self._grams.setdefault(g, set()).add(pos)
 
-    def list(self, state: Optional[str], q: Optional[str], limit: int, offset: int) -> List[Municipality]:
-        data = self.items
-        if state:
-            data = [m for m in data if m.state.lower() == state.lower()]
+    def _search(self, q: str) -> List[int]:
+        # case/accent-folded substring match on name or id
+        ql = _normalize(q)
+        if len(ql) >= NGRAM:
+            postings = sorted((self._grams.get(g, set()) for g in _ngrams(ql)), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+        else:
+            candidates = range(len(self.items))
+        return sorted(
+            pos for pos in candidates
+            if ql in self._folded[pos][0] or ql in self._folded[pos][1]
+        )
+
+    def _positions(self, state: Optional[str], q: Optional[str], limit: int, offset: int):
         if q:
-            ql = q.lower()
-            data = [m for m in data if ql in m.name.lower() or ql in m.id.lower()]
-        return data[offset: offset + limit]
+            positions = self._search(q)
+            if state:
+                st = state.lower()
+                positions = [p for p in positions if self._states[p] == st]
+        elif state:
+            positions = self._by_state.get(state.lower(), [])
+        else:
+            positions = range(len(self.items))
+        return positions[offset: offset + limit]
+
+    def list(self, state: Optional[str], q: Optional[str], limit: int, offset: int) -> List[Municipality]:
+        return [self.items[p] for p in self._positions(state, q, limit, offset)]
+
+    def list_json(self, state: Optional[str], q: Optional[str], limit: int, offset: int) -> bytes:
+        """Same page as `list`, as a JSON array body."""
+        return join_arrays(self._json[p] for p in self._positions(state, q, limit, offset))
 
     def get(self, municipality_id: str) -> Municipality | None:
-        return next((m for m in self.items if m.id == municipality_id), None)
-    
+        return self._by_id.get(municipality_id)
+
+    def get_json(self, municipality_id: str) -> bytes | None:
+        pos = self._pos_by_id.get(municipality_id)
+        return None if pos is None else self._json[pos]
+
     def get_polygon(self, municipality_id: str) -> dict | None:
         municipality = self.get(municipality_id)
         if municipality:
             return municipality.polygon
         return None
-    
+
     def list_all(self) -> List[Municipality]:
         return self.items
-    
+
     def get_all_schools_for_city(self, municipality_id: str) -> List[dict]:
         municipality = self.get(municipality_id)
         if municipality:
             return municipality.schools
         return []
-    
+
     def get_rankings(self) -> List[dict]:
         # Example ranking logic based on number of schools
         rankings = sorted(
@@ -39,4 +90,4 @@ class MunicipalityService:
             key=lambda x: x['school_count'],
             reverse=True
         )
-        return rankings
\ No newline at end of file
+        return rankings
@@ -0,0 +1,114 @@
+# app/services/partitions.py
+"""
+Datasets de escolas particionados por UF.
+
+Cada partição é um `DataRegistry` próprio (IDEB, infra, keyspace, indicadores,
+retriever) carregado na primeira consulta àquela UF. As partições carregadas
+ficam numa LRU com orçamento de memória: ao passar do orçamento, as UFs menos
+usadas (exceto as fixas, carregadas já na subida) são descartadas e voltam a
+ser carregadas (do snapshot colunar) se forem pedidas de novo.
+"""
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.services.keys import uf_from_code
+from app.services.registry import DataRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionManager:
+    def __init__(self, loader: Callable[[str], DataRegistry], ufs: Iterable[str],
+                 budget_bytes: int, pinned: Iterable[str] = ()):
+        self.loader = loader
+        self.ufs: List[str] = sorted({u.upper() for u in ufs})
+        self.budget_bytes = budget_bytes
+        self.pinned = {u.upper() for u in pinned} & set(self.ufs)
+        self._loaded: "OrderedDict[str, DataRegistry]" = OrderedDict()
+        # por UF: bytes, tempo da última carga, cargas, acessos, descartes
+        self._info: Dict[str, Dict] = {
+            uf: {"bytes": 0, "load_seconds": None, "loads": 0, "hits": 0, "evictions": 0}
+            for uf in self.ufs
+        }
+        self._lock = Lock()
+        # uma carga por UF de cada vez: requisições simultâneas esperam a mesma carga
+        self._loading: Dict[str, Lock] = {uf: Lock() for uf in self.ufs}
+        for uf in sorted(self.pinned):
+            self.get(uf)
+
+    def __contains__(self, uf: str) -> bool:
+        return (uf or "").upper() in self._loading
+
+    def get(self, uf: str) -> DataRegistry:
+        uf = (uf or "").upper()
+        if uf not in self._loading:
+            raise KeyError(f"UF '{uf}' não disponível")
+        with self._lock:
+            registry = self._loaded.get(uf)
+            if registry is not None:
+                self._loaded.move_to_end(uf)
+                self._info[uf]["hits"] += 1
+                return registry
+        with self._loading[uf]:
+            with self._lock:
+                registry = self._loaded.get(uf)
+                if registry is not None:
+                    self._info[uf]["hits"] += 1
+                    return registry
+            t0 = time.perf_counter()
+            registry = self.loader(uf)
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self._loaded[uf] = registry
+                info = self._info[uf]
+                info.update(bytes=registry.nbytes(), load_seconds=round(elapsed, 4))
+                info["loads"] += 1
+                self._evict(keep=uf)
+            logger.info("partição %s carregada em %.3fs (%d bytes)", uf, elapsed, info["bytes"])
+            return registry
+
+    def peek(self, uf: str) -> Optional[DataRegistry]:
+        """Partição da UF se já estiver carregada (não carrega nem conta acesso)."""
+        with self._lock:
+            return self._loaded.get((uf or "").upper())
+
+    def for_municipality(self, code) -> Optional[DataRegistry]:
+        """Partição da UF do município (código IBGE); None se a UF não estiver disponível."""
+        uf = uf_from_code(code)
+        return self.get(uf) if uf in self else None
+
+    def _used(self) -> int:
+        return sum(self._info[uf]["bytes"] for uf in self._loaded)
+
+    def _evict(self, keep: str) -> None:
+        # LRU: mais antigas primeiro; a recém-carregada e as fixas nunca saem
+        used = self._used()
+        for uf in list(self._loaded):
+            if used <= self.budget_bytes:
+                break
+            if uf == keep or uf in self.pinned:
+                continue
+            used -= self._info[uf]["bytes"]
+            del self._loaded[uf]
+            self._info[uf]["evictions"] += 1
+            logger.info("partição %s descartada (orçamento de %d bytes)", uf, self.budget_bytes)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": self._used(),
+                "pinned": sorted(self.pinned),
+                "loaded": list(self._loaded),
+                "partitions": {
+                    uf: {
+                        **info,
+                        "loaded": uf in self._loaded,
+                        "datasets": self._loaded[uf].stats()["datasets"] if uf in self._loaded else None,
+                    }
+                    for uf, info in self._info.items()
+                },
+            }
@@ -0,0 +1,118 @@
+# app/services/registry.py
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.snapshot import fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes() -> Optional[int]:
+    # RSS atual do processo (Linux); None quando /proc não está disponível
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            pages = int(fh.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    import resource
+    return pages * resource.getpagesize()
+
+
+def _frames_bytes(obj: Any) -> int:
+    # soma o uso de memória (deep) dos DataFrames e arrays NumPy do serviço, inclusive
+    # dentro de dicts; outros serviços referenciados não entram (já são contados no
+    # próprio dataset). Serviços com estruturas Python próprias (listas, índices)
+    # informam o total com `nbytes()`
+    nbytes = getattr(obj, "nbytes", None)
+    if callable(nbytes):
+        return int(nbytes())
+    values = obj.values() if isinstance(obj, dict) else vars(obj).values()
+    total = 0
+    for value in values:
+        if isinstance(value, pd.DataFrame):
+            total += int(value.memory_usage(index=True, deep=True).sum())
+        elif isinstance(value, np.ndarray):
+            total += int(value.nbytes)
+        elif isinstance(value, dict):
+            total += _frames_bytes(value)
+    return total
+
+
+# path -> (tamanho, mtime_ns, sha256): o hash só é refeito quando o arquivo muda
+_hashes: Dict[str, Tuple[int, int, str]] = {}
+
+
+def _content_hash(path: str) -> str:
+    st = os.stat(path)
+    cached = _hashes.get(path)
+    if cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns):
+        return cached[2]
+    digest = fingerprint(path)["sha256"]
+    _hashes[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+
+def dataset_version(sources: Iterable[str], formats: Iterable[int] = ()) -> str:
+    """
+    Hash do conteúdo dos arquivos de origem + versões de formato dos serviços
+    (`SNAPSHOT_VERSION`): muda quando os dados ou o formato mudam (base dos ETags).
+    """
+    h = hashlib.sha256()
+    for src in sources:
+        if src and Path(src).exists():
+            h.update(f"{src}:{_content_hash(src)}\n".encode("utf-8"))
+    h.update(",".join(str(v) for v in formats).encode("utf-8"))
+    return h.hexdigest()[:20]
+
+
+class DataRegistry:
+    """
+    Registro central dos datasets: cada um é carregado uma única vez
+    e a mesma instância (somente leitura) é entregue a todos os routers.
+    Guarda, por dataset, o tempo de carga e o uso de memória.
+    """
+    def __init__(self):
+        self._datasets: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict] = {}
+        self.version: Optional[str] = None
+
+    def load(self, name: str, factory: Callable[[], Any]) -> Any:
+        if name in self._datasets:
+            return self._datasets[name]
+        rss_before = _rss_bytes()
+        t0 = time.perf_counter()
+        obj = factory()
+        elapsed = time.perf_counter() - t0
+        rss_after = _rss_bytes()
+
+        self._datasets[name] = obj
+        self._stats[name] = {
+            "load_seconds": round(elapsed, 4),
+            "frames_bytes": _frames_bytes(obj),
+            "rss_delta_bytes": None if rss_before is None or rss_after is None else rss_after - rss_before,
+        }
+        # datasets podem anexar um relatório próprio (ex.: cobertura dos joins)
+        if hasattr(obj, "report"):
+            self._stats[name]["report"] = obj.report()
+        logger.info("dataset %s carregado em %.3fs (%d bytes)", name, elapsed, self._stats[name]["frames_bytes"])
+        return obj
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._datasets[name]
+        except KeyError:
+            raise KeyError(f"dataset '{name}' não foi carregado") from None
+
+    def nbytes(self) -> int:
+        """Memória medida de todos os datasets (DataFrames e arrays)."""
+        return sum(st["frames_bytes"] for st in self._stats.values())
+
+    def stats(self) -> Dict[str, Dict]:
+        return {"version": self.version, "datasets": dict(self._stats), "rss_bytes": _rss_bytes()}
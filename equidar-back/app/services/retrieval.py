@@ -0,0 +1,211 @@
+# app/services/retrieval.py
+"""
+Recuperação local de escolas para o contexto do agente.
+
+Índice BM25 montado uma vez na carga sobre a tabela materializada de
+indicadores (nome da escola + etapas avaliadas), com filtros numéricos
+simples lidos da mensagem ("ideb abaixo de 4", "infra > 0.5") e ordenação
+pelo indicador pedido. As escolas escolhidas viram linhas compactas que
+entram no prompt até um orçamento de tokens.
+"""
+import json
+import math
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.ideb import _normalize
+from app.services.indicadores import IndicadoresService
+from app.services.partitions import PartitionManager
+
+STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "na", "no", "nas", "nos",
+    "para", "por", "com", "que", "qual", "quais", "um", "uma", "ao", "se", "the", "of", "and",
+    "in", "to", "for", "which", "what", "escola", "escolas", "school", "schools",
+}
+# etapas do IDEB viram termos pesquisáveis do documento
+STAGE_TERMS = {
+    "EF1": "ef1 anos iniciais fundamental",
+    "EF2": "ef2 anos finais fundamental",
+    "EM": "em ensino medio",
+}
+METRICS = {"ideb": "nota_ideb_media", "infra": "score_infraestrutura", "indice": "indice_geral"}
+_FILTER = re.compile(
+    r"\b(ideb|infra\w*|indice)\s*(<=|>=|<|>|abaixo de|acima de|menor que|maior que|below|above)\s*(\d+(?:[.,]\d+)?)"
+)
+_DESC = re.compile(r"\b(melhor|melhores|maior|maiores|best|top|highest)\b")
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", _normalize(text)) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 caracteres por token: suficiente para orçar o prompt sem depender de tokenizer
+    return (len(text) + 3) // 4
+
+
+def _fmt(v: float) -> str:
+    return "n/d" if v != v else f"{v:.2f}"
+
+
+class SchoolRetriever:
+    """
+    BM25 sobre as escolas de `indicadores.tables[None]` (mesma ordem de linhas,
+    então o recorte por cidade é a mesma faixa contígua usada pelos endpoints).
+    """
+    def __init__(self, indicadores: IndicadoresService, k1: float = 1.5, b: float = 0.75):
+        t = indicadores.tables[None]
+        df = t["df"]
+        self.city_key = indicadores.ideb.city_key
+        self.ranges = t["ranges"]
+        self.k1, self.b = k1, b
+        self.ids = df["id_escola"].tolist()
+        self.names = ["" if e != e else e for e in df["escola"].tolist()]
+        self.metrics = {col: df[col].to_numpy(dtype="float64") for col in METRICS.values()}
+        # última nota disponível de cada etapa, já formatada ("EF1 2021: 5.20")
+        self.latest: List[str] = []
+        docs = []
+        for name, raw in zip(self.names, df["ideb_json"].tolist()):
+            stages = json.loads(raw)
+            parts = []
+            for ens, anos in stages.items():
+                notas = [(a, v) for a, v in anos.items() if v is not None]
+                if notas:
+                    a, v = max(notas)
+                    parts.append(f"{ens} {a}: {v:.2f}")
+            self.latest.append(", ".join(parts))
+            docs.append(_tokens(name) + " ".join(STAGE_TERMS.get(e, e) for e in stages).split())
+
+        self._len = np.array([len(d) for d in docs], dtype="float64")
+        self._avgdl = float(self._len.mean()) if len(docs) else 0.0
+        # normalização por tamanho do documento, fixa para o índice
+        self._norm = self.k1 * (1 - self.b + self.b * self._len / (self._avgdl or 1))
+        postings: Dict[str, Dict[int, int]] = {}
+        for i, doc in enumerate(docs):
+            for term in doc:
+                tf = postings.setdefault(term, {})
+                tf[i] = tf.get(i, 0) + 1
+        n = len(docs)
+        # termo -> (linhas em ordem crescente, frequências, idf); as linhas são inseridas
+        # na ordem dos documentos, então o recorte de uma cidade é uma busca binária
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {
+            term: (
+                np.fromiter(tf.keys(), dtype="int64", count=len(tf)),
+                np.fromiter(tf.values(), dtype="float64", count=len(tf)),
+                math.log(1 + (n - len(tf) + 0.5) / (len(tf) + 0.5)),
+            )
+            for term, tf in postings.items()
+        }
+
+    def _bm25(self, terms: List[str], lo: int, hi: int) -> np.ndarray:
+        scores = np.zeros(hi - lo)
+        for term in set(terms):
+            p = self._postings.get(term)
+            if p is None:
+                continue
+            rows, tf, idf = p
+            a, z = np.searchsorted(rows, (lo, hi))
+            r, f = rows[a:z], tf[a:z]
+            scores[r - lo] += idf * f * (self.k1 + 1) / (f + self._norm[r])
+        return scores
+
+    def search(self, city: str, message: str, limit: Optional[int] = None) -> List[int]:
+        """Linhas das escolas da cidade, mais relevantes primeiro."""
+        rng = self.ranges.get(self.city_key(city))
+        if rng is None:
+            return []
+        lo, hi = rng
+        text = _normalize(message)
+
+        keep = np.ones(hi - lo, dtype=bool)
+        for name, op, value in _FILTER.findall(text):
+            col = self.metrics[METRICS["infra" if name.startswith("infra") else name]][lo:hi]
+            v = float(value.replace(",", "."))
+            with np.errstate(invalid="ignore"):
+                if op in ("<", "abaixo de", "menor que", "below"):
+                    keep &= col < v
+                elif op == "<=":
+                    keep &= col <= v
+                elif op == ">=":
+                    keep &= col >= v
+                else:
+                    keep &= col > v
+
+        # indicador de ordenação: o citado na mensagem; senão índice geral (IDEB quando faltar infra)
+        if "infra" in text:
+            metric = self.metrics["score_infraestrutura"][lo:hi]
+        elif "ideb" in text:
+            metric = self.metrics["nota_ideb_media"][lo:hi]
+        else:
+            geral = self.metrics["indice_geral"][lo:hi]
+            metric = np.where(np.isnan(geral), self.metrics["nota_ideb_media"][lo:hi], geral)
+        # padrão: piores primeiro (prioridade de investimento); "melhores" inverte
+        metric = -metric if _DESC.search(text) else metric
+        metric = np.where(np.isnan(metric), np.inf, metric)  # sem nota vai para o fim
+
+        scores = self._bm25(_tokens(message), lo, hi)
+        matched = keep & (scores > 0)
+        if matched.any():
+            keep = matched
+        order = np.lexsort((metric, -scores))
+        rows = [lo + int(i) for i in order if keep[i]]
+        return rows if limit is None else rows[:limit]
+
+    def _line(self, row: int) -> str:
+        m = self.metrics
+        line = (
+            f"- {self.names[row]} (ID {self.ids[row]}): IDEB médio {_fmt(m['nota_ideb_media'][row])}; "
+            f"infra {_fmt(m['score_infraestrutura'][row])}; índice geral {_fmt(m['indice_geral'][row])}"
+        )
+        if self.latest[row]:
+            line += f"; último IDEB {self.latest[row]}"
+        return line
+
+    def context(self, city: str, message: str, budget_tokens: int) -> Tuple[str, List[str]]:
+        """Linhas das escolas mais relevantes que cabem em `budget_tokens`, e as chaves usadas."""
+        lines, keys, used = [], [], 0
+        if budget_tokens <= 0:
+            return "", keys
+        for row in self.search(city, message):
+            line = self._line(row)
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget_tokens:
+                break
+            lines.append(line)
+            keys.append(f"school:{self.ids[row]}")
+            used += cost
+        return "\n".join(lines), keys
+
+    def nbytes(self) -> int:
+        """Memória do índice: arrays exatos; listas e dicts pelo tamanho dos objetos Python."""
+        arrays = [self._len, self._norm, *self.metrics.values()]
+        total = sum(a.nbytes for a in arrays)
+        for values in (self.ids, self.names, self.latest):
+            total += sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+        # dicts: tabela + chaves + tuplas (os arrays das postings com cabeçalho e dados;
+        # floats/ints da tupla estimados em 28 bytes cada)
+        total += sys.getsizeof(self._postings)
+        for term, entry in self._postings.items():
+            total += sys.getsizeof(term) + sys.getsizeof(entry) + 28 + sum(sys.getsizeof(a) for a in entry[:2])
+        total += sys.getsizeof(self.ranges)
+        for key, entry in self.ranges.items():
+            total += sys.getsizeof(key) + sys.getsizeof(entry) + 28 * len(entry)
+        return total
+
+    def report(self) -> Dict:
+        return {"schools": len(self.ids), "terms": len(self._postings), "avg_doc_len": round(self._avgdl, 2)}
+
+
+class PartitionedRetriever:
+    """Mesmo `context` de `SchoolRetriever`, usando o índice da UF do município."""
+    def __init__(self, partitions: PartitionManager):
+        self.partitions = partitions
+
+    def context(self, city: str, message: str, budget_tokens: int) -> Tuple[str, List[str]]:
+        part = self.partitions.for_municipality(city)
+        if part is None:
+            return "", []
+        return part.get("retriever").context(city, message, budget_tokens)
@@ -1,6 +1,33 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional
+
+import numpy as np
+from pydantic import TypeAdapter
+
 from app.models import Municipality, ScoreParams, ScoreOut
 
+_scores_json = TypeAdapter(List[ScoreOut])
+
+def _column(items: List[Municipality], attr: str, default: Optional[float] = None) -> np.ndarray:
+    values = [getattr(m, attr) for m in items]
+    return np.array([default if v is None else v for v in values], dtype="float64")
+
 class ScoringService:
+    def __init__(self, items: Optional[List[Municipality]] = None, cache_size: int = 128):
+        # municipality indicators kept as columns for the batch path
+        self.items = items or []
+        self._ids = [m.id for m in self.items]
+        self._internet = _column(self.items, "internet_coverage_pct")
+        self._access = _column(self.items, "accessibility_index")
+        self._school = _column(self.items, "school_infrastructure_index")
+        self._population = _column(self.items, "population")
+        self._revenue = _column(self.items, "revenue_per_capita", default=0)
+        # results per distinct ScoreParams (bounded LRU): [scores, encoded JSON or None]
+        self._cache: "OrderedDict[tuple, list]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = Lock()
+
     def score(self, m: Municipality, p: ScoreParams) -> ScoreOut:
         internet = m.internet_coverage_pct / 100.0 if p.normalize else m.internet_coverage_pct
         access = m.accessibility_index
@@ -26,3 +53,56 @@ class ScoringService:
                 "weights_in_use": p.model_dump(),
             },
         )
+
+    def score_all(self, p: ScoreParams) -> List[ScoreOut]:
+        """Same result as `score` for every municipality, in one vectorized pass (memoized per params)."""
+        return self._entry(p)[0]
+
+    def score_all_json(self, p: ScoreParams) -> bytes:
+        """`score_all` as a JSON array body, encoded once per cached params."""
+        entry = self._entry(p)
+        if entry[1] is None:
+            entry[1] = _scores_json.dump_json(entry[0])
+        return entry[1]
+
+    def _entry(self, p: ScoreParams) -> list:
+        weights = p.model_dump()
+        key = tuple(sorted(weights.items()))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        internet = self._internet / 100.0 if p.normalize else self._internet
+        base = p.w_internet * internet + p.w_access * self._access + p.w_school * self._school
+
+        pop_factor = np.select([self._population < 50_000, self._population < 200_000], [1.0, 0.5], 0.2)
+        rev_factor = np.where(self._revenue < 3000, 1.0, 0.5)
+        equity = p.w_equity_boost * (0.5 * pop_factor + 0.5 * rev_factor)
+
+        total = np.clip(base + equity, 0.0, 1.0)
+
+        out = []
+        for mid, t, i, a, s, e in zip(
+            self._ids, total.tolist(), internet.tolist(), self._access.tolist(),
+            self._school.tolist(), equity.tolist(),
+        ):
+            # missing indicators propagate as NaN: no score and no breakdown entry
+            breakdown = {
+                k: round(v, 4)
+                for k, v in (("internet", i), ("accessibility", a), ("school_infrastructure", s), ("equity_bonus", e))
+                if v == v
+            }
+            breakdown["weights_in_use"] = weights
+            out.append(ScoreOut.model_construct(
+                municipality_id=mid,
+                score=None if t != t else round(t, 4),
+                breakdown=breakdown,
+            ))
+
+        entry = [out, None]
+        with self._lock:
+            self._cache[key] = entry
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return entry
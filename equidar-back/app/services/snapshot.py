@@ -0,0 +1,181 @@
+# app/services/snapshot.py
+"""
+Snapshot colunar em disco para os datasets derivados de CSV.
+
+Cada snapshot é um diretório com um `manifest.json` e um arquivo `.npy`
+por coluna. Colunas numéricas são abertas com memory-map; colunas de texto
+são gravadas como códigos inteiros + lista de categorias. O manifesto guarda
+tamanho, mtime e sha256 de cada arquivo de origem: se algum mudar (ou se a
+versão do formato do serviço mudar), o snapshot é descartado e refeito.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(path: str) -> Dict:
+    st = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": _sha256(path),
+    }
+
+
+def snapshot_name(prefix: str, sources: List[str]) -> str:
+    # o mesmo diretório pode guardar snapshots de configurações diferentes
+    key = hashlib.sha1("|".join(os.path.abspath(s) for s in sources).encode("utf-8")).hexdigest()[:12]
+    return f"{prefix}-{key}"
+
+
+def _sources_match(recorded: List[Dict], sources: List[str]) -> bool:
+    if [r["path"] for r in recorded] != [os.path.abspath(s) for s in sources]:
+        return False
+    for rec, src in zip(recorded, sources):
+        try:
+            st = os.stat(src)
+        except OSError:
+            return False
+        if st.st_size != rec["size"]:
+            return False
+        # caminho rápido: mesmo tamanho e mtime dispensam o hash
+        if st.st_mtime_ns == rec["mtime_ns"]:
+            continue
+        if _sha256(src) != rec["sha256"]:
+            return False
+    return True
+
+
+# ---------- escrita/leitura de colunas ----------
+
+def _write_column(directory: Path, fname: str, ser: pd.Series) -> Dict:
+    if isinstance(ser.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(ser.dtype):
+        mask = ser.isna().to_numpy()
+        values = ser.fillna(0).to_numpy(dtype="int64")
+        np.save(directory / f"{fname}.npy", values)
+        np.save(directory / f"{fname}.mask.npy", mask)
+        return {"kind": "nullable_int", "file": fname}
+    if pd.api.types.is_bool_dtype(ser.dtype) or pd.api.types.is_numeric_dtype(ser.dtype):
+        np.save(directory / f"{fname}.npy", ser.to_numpy())
+        return {"kind": "numeric", "file": fname}
+    codes, cats = pd.factorize(ser, use_na_sentinel=True)
+    np.save(directory / f"{fname}.npy", codes.astype("int32"))
+    (directory / f"{fname}.cats.json").write_text(
+        json.dumps([str(c) for c in cats], ensure_ascii=False), encoding="utf-8"
+    )
+    return {"kind": "str", "file": fname}
+
+
+def _read_column(directory: Path, spec: Dict):
+    kind, fname = spec["kind"], spec["file"]
+    values = np.load(directory / f"{fname}.npy", mmap_mode="r")
+    if kind == "numeric":
+        return values
+    if kind == "nullable_int":
+        mask = np.load(directory / f"{fname}.mask.npy", mmap_mode="r")
+        return pd.arrays.IntegerArray(values, mask)
+    cats = json.loads((directory / f"{fname}.cats.json").read_text(encoding="utf-8"))
+    lookup = np.empty(len(cats) + 1, dtype=object)
+    lookup[:-1] = cats
+    lookup[-1] = np.nan  # código -1 (ausente) cai na última posição
+    return lookup[values]
+
+
+def write_snapshot(directory: Path, tables: Dict[str, pd.DataFrame], sources: List[str], version: int) -> None:
+    directory = Path(directory)
+    tmp = directory.with_name(f"{directory.name}.tmp.{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "sources": [fingerprint(s) for s in sources],
+        "tables": {},
+    }
+    for tname, df in tables.items():
+        cols = []
+        for i, col in enumerate(df.columns):
+            spec = _write_column(tmp, f"{tname}.{i}", df[col])
+            spec["name"] = col
+            cols.append(spec)
+        manifest["tables"][tname] = {"rows": len(df), "columns": cols}
+    (tmp / MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    # troca o diretório inteiro de uma vez; outro worker pode ter chegado antes
+    shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_snapshot(directory: Path, sources: List[str], version: int) -> Optional[Dict[str, pd.DataFrame]]:
+    directory = Path(directory)
+    try:
+        manifest = json.loads((directory / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != FORMAT_VERSION or manifest.get("version") != version:
+        return None
+    if not _sources_match(manifest.get("sources", []), sources):
+        return None
+
+    tables = {}
+    for tname, spec in manifest["tables"].items():
+        data = {c["name"]: _read_column(directory, c) for c in spec["columns"]}
+        tables[tname] = pd.DataFrame(data, copy=False)
+    return tables
+
+
+def load_or_build(
+    snapshot_dir: Optional[str],
+    name: str,
+    sources: List[str],
+    version: int,
+    build: Callable[[], Dict[str, pd.DataFrame]],
+) -> Dict[str, pd.DataFrame]:
+    """
+    Devolve as tabelas do snapshot `name` se ele estiver válido para `sources`;
+    caso contrário executa `build()` e grava um snapshot novo.
+    Sem `snapshot_dir` apenas executa `build()`.
+    """
+    if not snapshot_dir:
+        return build()
+    directory = Path(snapshot_dir) / snapshot_name(name, sources)
+    tables = read_snapshot(directory, sources, version)
+    if tables is not None:
+        return tables
+
+    tables = build()
+    try:
+        write_snapshot(directory, tables, sources, version)
+    except OSError as e:
+        # snapshot é só cache: sem permissão de escrita seguimos com o CSV
+        logger.warning("não foi possível gravar snapshot %s: %s", directory, e)
+    return tables
+
+
+def clear(snapshot_dir: str) -> None:
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
@@ -0,0 +1,121 @@
+# app/services/spatial.py
+"""
+Spatial index over municipality polygons: an STR-packed R-tree of bounding
+boxes (built once, static) plus an exact point-in-polygon test for the
+candidates that survive the bbox prefilter.
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services.geometry import Ring
+
+
+def _str_order(bounds: np.ndarray, node_size: int) -> np.ndarray:
+    # Sort-Tile-Recursive: slices by x center, then y center inside each slice
+    n = len(bounds)
+    cx = (bounds[:, 0] + bounds[:, 2]) / 2
+    cy = (bounds[:, 1] + bounds[:, 3]) / 2
+    leaves = math.ceil(n / node_size)
+    per_slice = math.ceil(math.sqrt(leaves)) * node_size
+    by_x = np.argsort(cx, kind="stable")
+    parts = []
+    for start in range(0, n, per_slice):
+        chunk = by_x[start:start + per_slice]
+        parts.append(chunk[np.argsort(cy[chunk], kind="stable")])
+    return np.concatenate(parts) if parts else by_x
+
+
+def _group_bounds(bounds: np.ndarray, node_size: int) -> np.ndarray:
+    starts = np.arange(0, len(bounds), node_size)
+    return np.column_stack([
+        np.minimum.reduceat(bounds[:, 0], starts),
+        np.minimum.reduceat(bounds[:, 1], starts),
+        np.maximum.reduceat(bounds[:, 2], starts),
+        np.maximum.reduceat(bounds[:, 3], starts),
+    ])
+
+
+def _intersects(bounds: np.ndarray, box) -> np.ndarray:
+    min_x, min_y, max_x, max_y = box
+    return (
+        (bounds[:, 0] <= max_x) & (bounds[:, 2] >= min_x)
+        & (bounds[:, 1] <= max_y) & (bounds[:, 3] >= min_y)
+    )
+
+
+def _ring_contains(ring: Ring, x: float, y: float) -> bool:
+    xs, ys = ring[:, 0], ring[:, 1]
+    xj, yj = np.roll(xs, 1), np.roll(ys, 1)
+    crosses = (ys > y) != (yj > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at = (xj - xs) * (y - ys) / (yj - ys) + xs
+    return bool(np.count_nonzero(crosses & (x < x_at)) % 2)
+
+
+def _polygons_contain(polys: List[List[Ring]], x: float, y: float) -> bool:
+    # even-odd over the rings of each polygon (holes included); any polygon counts
+    return any(sum(_ring_contains(r, x, y) for r in rings) % 2 for rings in polys)
+
+
+class SpatialIndex:
+    """
+    Static R-tree (STR packing) over the bounding boxes of `features`.
+    Level 0 holds the feature boxes (in `self._order`); every upper level
+    holds node boxes plus the [start, stop) range of their children one
+    level below.
+    """
+    def __init__(self, features: Dict[str, List[List[Ring]]], node_size: int = 16):
+        self.node_size = node_size
+        self.ids = list(features)
+        self._polys = [features[fid] for fid in self.ids]
+        bounds = np.array([
+            [
+                min(r[:, 0].min() for rings in p for r in rings),
+                min(r[:, 1].min() for rings in p for r in rings),
+                max(r[:, 0].max() for rings in p for r in rings),
+                max(r[:, 1].max() for rings in p for r in rings),
+            ]
+            for p in self._polys
+        ], dtype="float64").reshape(-1, 4)
+
+        self._order = _str_order(bounds, node_size) if len(bounds) else np.empty(0, dtype="int64")
+        self._bounds: List[np.ndarray] = [bounds[self._order]]
+        self._children: List[np.ndarray] = [np.empty((0, 2), dtype="int64")]
+        while len(self._bounds[-1]) > node_size:
+            level = self._bounds[-1]
+            if len(self._bounds) > 1:
+                # STR-order this level's nodes; their child ranges move with them
+                perm = _str_order(level, node_size)
+                self._bounds[-1] = level = level[perm]
+                self._children[-1] = self._children[-1][perm]
+            starts = np.arange(0, len(level), node_size)
+            self._children.append(np.column_stack([starts, np.minimum(starts + node_size, len(level))]))
+            self._bounds.append(_group_bounds(level, node_size))
+
+    def _candidates(self, box) -> np.ndarray:
+        top = len(self._bounds) - 1
+        nodes = np.arange(len(self._bounds[top]))
+        for k in range(top, 0, -1):
+            nodes = nodes[_intersects(self._bounds[k][nodes], box)]
+            if not len(nodes):
+                return nodes
+            ranges = self._children[k][nodes]
+            nodes = np.concatenate([np.arange(a, b) for a, b in ranges])
+        nodes = nodes[_intersects(self._bounds[0][nodes], box)]
+        return self._order[nodes]
+
+    def in_bbox(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[str]:
+        """Ids whose bounding box intersects the box (sorted)."""
+        return sorted(self.ids[i] for i in self._candidates((min_x, min_y, max_x, max_y)))
+
+    def locate(self, x: float, y: float) -> Optional[str]:
+        """Id of the polygon containing (x, y): bbox prefilter, then exact test."""
+        for i in sorted(self._candidates((x, y, x, y))):
+            if _polygons_contain(self._polys[i], x, y):
+                return self.ids[i]
+        return None
+
+    def report(self) -> Dict:
+        return {"features": len(self.ids), "levels": [len(b) for b in self._bounds]}
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Gerador de dados sintéticos para os benchmarks, nos mesmos formatos de `data/`:
+
+  - IDEB_ANOS_INICIAIS_<UF>.csv, IDEB_ANOS_FINAIS_<UF>.csv, IDEB_ENSINO_MEDIO_<UF>.csv
+  - <UF>_INFRAESTRUTURA_FUND_SCORE_2023.csv, <UF>_INFRAESTRUTURA_MED_SCORE_2023.csv
+  - ALL_SCHOOLS_<UF>_WITH_SCORES.csv
+  - municipalities.json (lista de municípios) e municipalities.polygons.json (GeoJSON)
+
+A escala é relativa à amostra da PB (~2,3 mil escolas IDEB, 223 municípios):
+`--scale 1` gera só a PB; `--scale 27` gera 27 UFs do tamanho da PB; acima de 27
+as 27 UFs crescem na mesma proporção. Mesma semente = mesmos arquivos.
+
+    python -m benchmarks.generate --scale 1 --out /tmp/equidar-bench/x1
+    python -m benchmarks.generate --scale 27 --out /tmp/equidar-bench/x27 --vertices 60
+"""
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app.services.keys import UF_BY_CODE
+from ingest import aggregate
+
+# tamanhos da amostra da PB (linhas dos CSVs em data/)
+PB_MUNICIPIOS = 223
+PB_ESCOLAS = {"EF1": 1899, "EF2": 1225, "EM": 483}
+PB_INFRA = {"FUND": 4476, "MED": 495}
+ANOS = (2017, 2019, 2021)
+ARQUIVOS = {
+    "EF1": "IDEB_ANOS_INICIAIS_{uf}.csv",
+    "EF2": "IDEB_ANOS_FINAIS_{uf}.csv",
+    "EM": "IDEB_ENSINO_MEDIO_{uf}.csv",
+    "FUND": "{uf}_INFRAESTRUTURA_FUND_SCORE_2023.csv",
+    "MED": "{uf}_INFRAESTRUTURA_MED_SCORE_2023.csv",
+    "SCHOOLS": "ALL_SCHOOLS_{uf}_WITH_SCORES.csv",
+    "MUNICIPIOS": "municipalities.json",
+    "POLIGONOS": "municipalities.polygons.json",
+}
+# PB primeiro: é a UF padrão (fixa) do backend
+UF_ORDER = [25] + [c for c in sorted(UF_BY_CODE) if c != 25]
+REDES = np.array(["Municipal", "Estadual", "Federal"], dtype=object)
+AUSENTES = np.array(["-", "ND"], dtype=object)
+ID_COLS = ["SG_UF", "CO_MUNICIPIO", "NO_MUNICIPIO", "ID_ESCOLA", "NO_ESCOLA", "REDE"]
+
+
+def _plan(scale: float) -> Dict[str, float]:
+    """UF -> multiplicador do tamanho da PB."""
+    n = max(1, min(len(UF_ORDER), math.ceil(scale)))
+    return {UF_BY_CODE[c]: scale / n for c in UF_ORDER[:n]}
+
+
+def _with_missing(rng: np.random.Generator, values: np.ndarray, frac: float) -> np.ndarray:
+    # como no INEP: parte das células vem como "-" ou "ND"
+    out = values.astype(object)
+    miss = rng.random(len(values)) < frac
+    out[miss] = AUSENTES[rng.integers(0, 2, miss.sum())]
+    return out
+
+
+def _ideb_table(rng: np.random.Generator, escolas: pd.DataFrame, stage: str) -> pd.DataFrame:
+    n = len(escolas)
+    df = escolas[ID_COLS].copy()
+    base = {"EF1": 5.5, "EF2": 4.5, "EM": 4.0}[stage]
+    nivel = rng.normal(0, 0.8, n)  # efeito da escola, comum aos anos
+    cols: Dict[str, np.ndarray] = {}
+    for ano in ANOS:
+        aprov = np.clip(rng.normal(92, 6, n), 40, 100).round(1)
+        rend = (aprov / 100 * rng.uniform(0.97, 1.0, n)).round(6)
+        mat = (rng.normal(220 + (ano - 2017), 20, n) + nivel * 10).round(2)
+        port = (rng.normal(210 + (ano - 2017), 20, n) + nivel * 10).round(2)
+        media = np.clip(base + nivel + rng.normal(0, 0.3, n), 0, 10).round(6)
+        obs = (media * rend).round(1)
+        cols[f"VL_APROVACAO_{ano}_SI_4"] = _with_missing(rng, aprov, 0.08)
+        cols[f"VL_INDICADOR_REND_{ano}"] = _with_missing(rng, rend, 0.08)
+        cols[f"VL_NOTA_MATEMATICA_{ano}"] = _with_missing(rng, mat, 0.15)
+        cols[f"VL_NOTA_PORTUGUES_{ano}"] = _with_missing(rng, port, 0.15)
+        cols[f"VL_NOTA_MEDIA_{ano}"] = _with_missing(rng, media, 0.15)
+        obs[rng.random(n) < 0.15] = np.nan
+        cols[f"VL_OBSERVADO_{ano}"] = obs
+        # o EM não tem projeção para 2017
+        if not (stage == "EM" and ano == 2017):
+            cols[f"VL_PROJECAO_{ano}"] = np.clip(base + rng.normal(0, 0.5, n), 0, 10).round(1)
+    # mesma ordem de colunas dos CSVs reais: indicador, depois ano; resultado no fim
+    for prefix in ("VL_APROVACAO", "VL_INDICADOR_REND", "VL_NOTA_MATEMATICA", "VL_NOTA_PORTUGUES",
+                   "VL_NOTA_MEDIA", "VL_OBSERVADO", "VL_PROJECAO"):
+        for ano in ANOS:
+            col = f"{prefix}_{ano}_SI_4" if prefix == "VL_APROVACAO" else f"{prefix}_{ano}"
+            if col in cols:
+                df[col] = cols[col]
+    for ano in ANOS:
+        if f"VL_PROJECAO_{ano}" in cols:
+            df[f"RESULTADO_{ano}"] = df[f"VL_OBSERVADO_{ano}"] - df[f"VL_PROJECAO_{ano}"]
+    return df
+
+
+def _infra_table(rng: np.random.Generator, ids: np.ndarray) -> pd.DataFrame:
+    n = len(ids)
+    df = pd.DataFrame({"ID_ESCOLA": ids})
+    parts = {}
+    for col in ("DOC", "APOIO", "TRANS", "CONN", "AMBI"):
+        vals = rng.random(n)
+        parts[col] = vals
+        df[col] = np.where(rng.random(n) < 0.1, np.nan, vals)
+    df["score_infraestrutura"] = np.nan_to_num(np.nanmean(df[list(parts)].to_numpy(), axis=1) * 100)
+    return df
+
+
+def _polygon(rng: np.random.Generator, cx: float, cy: float, r: float, vertices: int) -> List[List[float]]:
+    ang = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    rad = r * rng.uniform(0.7, 1.0, vertices)
+    ring = np.column_stack((cx + rad * np.cos(ang), cy + rad * np.sin(ang))).round(10)
+    ring = np.vstack((ring, ring[:1]))  # anel fechado, como no GeoJSON real
+    return ring.tolist()
+
+
+def generate(out: str, scale: float = 1.0, seed: int = 42, vertices: int = 120) -> Dict:
+    """Gera o conjunto em `out` e devolve um resumo (tamanhos, tempo)."""
+    t0 = time.perf_counter()
+    root = Path(out)
+    root.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    municipios, features = [], []
+    resumo = {"scale": scale, "seed": seed, "vertices": vertices, "ufs": {}, "municipios": 0, "escolas_ideb": 0}
+
+    for i, (uf, mult) in enumerate(_plan(scale).items()):
+        code = next(c for c, s in UF_BY_CODE.items() if s == uf)
+        n_mun = max(1, round(PB_MUNICIPIOS * mult))
+        # código IBGE de 7 dígitos: UF (2) + município (4) + verificador (1)
+        codes7 = np.array([int(f"{code}{k + 1:04d}{k % 10}") for k in range(n_mun)], dtype="int64")
+        nomes = np.array([f"Município {uf} {k + 1:04d}" for k in range(n_mun)], dtype=object)
+        # tamanho das cidades concentrado (capital grande, cauda longa de cidades pequenas)
+        peso = 1.0 / np.arange(1, n_mun + 1) ** 0.9
+        peso /= peso.sum()
+
+        # conjunto de escolas da UF; EF1, EF2 e EM são subconjuntos que se sobrepõem
+        n_total = round(max(PB_ESCOLAS.values()) * 1.3 * mult)
+        ids = code * 1_000_000 + rng.choice(899_999, size=n_total, replace=False) + 1
+        mun = rng.choice(n_mun, size=n_total, p=peso)
+        escolas = pd.DataFrame({
+            "SG_UF": uf,
+            "CO_MUNICIPIO": codes7[mun],
+            "NO_MUNICIPIO": nomes[mun],
+            "ID_ESCOLA": ids,
+            "NO_ESCOLA": [f"ESCOLA {uf} {j:06d}" for j in range(n_total)],
+            "REDE": REDES[rng.choice(3, size=n_total, p=[0.75, 0.23, 0.02])],
+        })
+        frames = {}
+        for stage, n_pb in PB_ESCOLAS.items():
+            n = min(n_total, max(1, round(n_pb * mult)))
+            sel = np.sort(rng.choice(n_total, size=n, replace=False))
+            df = _ideb_table(rng, escolas.iloc[sel].reset_index(drop=True), stage)
+            df.sort_values(["NO_MUNICIPIO", "ID_ESCOLA"], kind="stable").to_csv(
+                root / ARQUIVOS[stage].format(uf=uf), index=False
+            )
+            score = pd.to_numeric(df["VL_NOTA_MEDIA_2021"], errors="coerce")
+            for ano in (2019, 2017):
+                score = score.fillna(pd.to_numeric(df[f"VL_NOTA_MEDIA_{ano}"], errors="coerce"))
+            frames[stage] = df[ID_COLS].assign(IDEB_SCORE=score)
+            resumo["escolas_ideb"] += n
+        aggregate(uf, frames).to_csv(root / ARQUIVOS["SCHOOLS"].format(uf=uf), index=False)
+
+        # infra: mesmas escolas do IDEB + escolas sem IDEB (como no censo escolar)
+        for nivel, n_pb in PB_INFRA.items():
+            n = max(1, round(n_pb * mult))
+            fonte = ids if nivel == "FUND" else frames["EM"]["ID_ESCOLA"].to_numpy()
+            # faixa 900000+ nunca é sorteada para as escolas do IDEB
+            extra = code * 1_000_000 + 900_000 + np.arange(max(0, n - len(fonte)))
+            infra_ids = np.concatenate((fonte, extra))[:n]
+            _infra_table(rng, infra_ids).to_csv(root / ARQUIVOS[nivel].format(uf=uf))
+
+        # municípios e polígonos numa grade por UF
+        col, row = i % 6, i // 6
+        side = math.ceil(math.sqrt(n_mun))
+        step = 3.0 / side
+        for k in range(n_mun):
+            cx = -60 + col * 4 + (k % side) * step
+            cy = -30 + row * 4 + (k // side) * step
+            municipios.append({
+                "id": str(codes7[k] // 10),
+                "name": nomes[k],
+                "state": uf,
+                "population": int(rng.lognormal(9.5, 1.2)),
+                "internet_coverage_pct": round(float(rng.uniform(20, 95)), 1),
+                "accessibility_index": round(float(rng.uniform(0, 1)), 2),
+                "school_infrastructure_index": round(float(rng.uniform(0, 1)), 2),
+                "revenue_per_capita": round(float(rng.uniform(1000, 6000)), 1),
+            })
+            features.append({
+                "type": "Feature",
+                "properties": {"id": str(codes7[k]), "name": nomes[k], "description": nomes[k]},
+                "geometry": {"type": "Polygon", "coordinates": [_polygon(rng, cx, cy, step / 2, vertices)]},
+            })
+        resumo["ufs"][uf] = {"municipios": n_mun, "escolas": {s: len(f) for s, f in frames.items()}}
+        resumo["municipios"] += n_mun
+
+    (root / ARQUIVOS["MUNICIPIOS"]).write_text(json.dumps(municipios, ensure_ascii=False), encoding="utf-8")
+    (root / ARQUIVOS["POLIGONOS"]).write_text(
+        json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8"
+    )
+    resumo["seconds"] = round(time.perf_counter() - t0, 2)
+    resumo["bytes"] = sum(p.stat().st_size for p in root.iterdir() if p.is_file())
+    (root / "manifest.json").write_text(json.dumps(resumo, ensure_ascii=False, indent=1), encoding="utf-8")
+    return resumo
+
+
+def settings_env(out: str) -> Dict[str, str]:
+    """Variáveis de ambiente que apontam o backend para o conjunto gerado em `out`."""
+    root = Path(out).resolve()
+    return {
+        "DATA_FILE": str(root / ARQUIVOS["MUNICIPIOS"]),
+        "POLYGON_FILE": str(root / ARQUIVOS["POLIGONOS"]),
+        "IDEB_EF1_FILE": str(root / ARQUIVOS["EF1"]),
+        "IDEB_EF2_FILE": str(root / ARQUIVOS["EF2"]),
+        "IDEB_EM_FILE": str(root / ARQUIVOS["EM"]),
+        "INFRA_FUND_FILE": str(root / ARQUIVOS["FUND"]),
+        "INFRA_MED_FILE": str(root / ARQUIVOS["MED"]),
+        "SCHOOLS_FILE": str(root / ARQUIVOS["SCHOOLS"]),
+        "IDEB_STORE_DIR": "",
+        "DEFAULT_UF": "PB",
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Gera dados sintéticos no formato de data/ para os benchmarks.")
+    ap.add_argument("--scale", type=float, default=1.0, help="Tamanho relativo à PB (1 = PB, 27 = 27 UFs)")
+    ap.add_argument("--out", required=True, help="Diretório de saída")
+    ap.add_argument("--seed", type=int, default=42, help="Semente (padrão: 42)")
+    ap.add_argument("--vertices", type=int, default=120, help="Vértices por polígono (padrão: 120)")
+    args = ap.parse_args()
+    resumo = generate(args.out, args.scale, args.seed, args.vertices)
+    print(json.dumps({k: v for k, v in resumo.items() if k != "ufs"}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
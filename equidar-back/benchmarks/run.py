@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark reprodutível do backend sobre dados sintéticos (benchmarks/generate.py).
+
+Para cada escala, gera os dados (uma vez; reaproveitados se escala, semente e vértices baterem) e
+sobe o app num subprocesso novo, duas vezes:
+  - frio: sem snapshots em disco (lê os CSVs e grava os snapshots);
+  - quente: com os snapshots da rodada fria; mede também as rotas.
+Tudo roda no próprio processo (ASGI em memória, sem rede): tempo de import e
+de startup (lifespan), carga de cada UF na primeira requisição, pico de RSS e,
+por rota, latência sequencial (p50/p99) e vazão com requisições concorrentes.
+O relatório sai em JSON; com --baseline, imprime a variação contra um anterior.
+
+    python -m benchmarks.run --scale 1 --scale 27 --out bench.json
+    python -m benchmarks.run --scale 100 --requests 100 --data-dir /data/bench
+    python -m benchmarks.run --scale 1 --baseline bench.json --out bench_novo.json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import zip_longest
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+# rota -> caminho ("{cidade}" = código IBGE de 6 dígitos, "{id}" = id do município)
+ENDPOINTS = {
+    "scores_all": "/scores/",
+    "scores_one": "/scores/{id}",
+    "municipalities": "/municipalities",
+    "choropleth": "/municipalities/choropleth",
+    "ideb": "/ideb/municipios/{cidade}/ideb",
+    "ideb_metricas": "/ideb/municipios/{cidade}/ideb/metricas",
+    "indicadores": "/municipios/{cidade}/indicadores",
+    "infra": "/infra/municipios/{cidade}",
+}
+
+
+def _rss_mb() -> float:
+    # ru_maxrss: KiB no Linux, bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _latency(samples: List[float]) -> Dict[str, float]:
+    ms = [s * 1000 for s in samples]
+    return {
+        "p50_ms": round(_percentile(ms, 50), 3),
+        "p99_ms": round(_percentile(ms, 99), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+# ---------- subprocesso (um app por rodada) ----------
+
+async def _measure(app, cities: List[str], ids: List[str], requests: int, concurrency: int,
+                   endpoints: List[str]) -> Dict:
+    import httpx
+
+    out: Dict = {}
+    t0 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        out["startup_s"] = round(time.perf_counter() - t0, 3)
+        out["rss_after_startup_mb"] = _rss_mb()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # primeira requisição de cada UF carrega a partição (IDEB, infra, indicadores)
+            loads = {}
+            by_uf: Dict[str, str] = {}
+            for c in cities:
+                by_uf.setdefault(c[:2], c)
+            for prefix, cidade in by_uf.items():
+                t = time.perf_counter()
+                r = await client.get(f"/municipios/{cidade}/indicadores")
+                loads[prefix] = {"seconds": round(time.perf_counter() - t, 3), "status": r.status_code}
+            out["partition_load_s"] = {
+                "total": round(sum(v["seconds"] for v in loads.values()), 3),
+                "max": round(max((v["seconds"] for v in loads.values()), default=0.0), 3),
+                "ufs": len(loads),
+                "errors": sum(v["status"] != 200 for v in loads.values()),
+            }
+            out["rss_after_load_mb"] = _rss_mb()
+
+            results = {}
+            for name in endpoints:
+                template = ENDPOINTS[name]
+
+                def url(i: int) -> str:
+                    # cidades em rodízio: todas as UFs entram na medida
+                    return template.format(cidade=cities[i % len(cities)], id=ids[i % len(ids)])
+
+                status: Dict[str, int] = {}
+                size = 0
+                await client.get(url(0))  # aquece caches da rota
+                samples = []
+                for i in range(requests):
+                    t = time.perf_counter()
+                    r = await client.get(url(i))
+                    samples.append(time.perf_counter() - t)
+                    status[str(r.status_code)] = status.get(str(r.status_code), 0) + 1
+                    size += len(r.content)
+
+                sem = asyncio.Semaphore(concurrency)
+
+                async def one(i: int) -> None:
+                    async with sem:
+                        await client.get(url(i))
+
+                t = time.perf_counter()
+                await asyncio.gather(*(one(i) for i in range(requests)))
+                elapsed = time.perf_counter() - t
+                results[name] = {
+                    **_latency(samples),
+                    "throughput_rps": round(requests / elapsed, 1) if elapsed else None,
+                    "mean_bytes": round(size / requests),
+                    "status": status,
+                }
+            out["endpoints"] = results
+    out["rss_peak_mb"] = _rss_mb()
+    return out
+
+
+def worker(data_dir: str, requests: int, concurrency: int, endpoints: List[str]) -> Dict:
+    """Roda dentro do subprocesso: o ambiente já aponta para `data_dir`."""
+    t0 = time.perf_counter()
+    main_module = importlib.import_module("app.main")  # import do app e das dependências
+    import_s = round(time.perf_counter() - t0, 3)
+
+    municipios = json.loads((Path(data_dir) / "municipalities.json").read_text(encoding="utf-8"))
+    ids = [m["id"] for m in municipios]
+    # rodízio intercalando as UFs, para não medir só a primeira
+    by_uf: Dict[str, List[str]] = {}
+    for m in municipios:
+        by_uf.setdefault(m["id"][:2], []).append(m["id"])
+    cities = [c for group in zip_longest(*by_uf.values()) for c in group if c is not None] or ids
+
+    out = asyncio.run(_measure(main_module.app, cities, ids, requests, concurrency, endpoints if requests else []))
+    out["import_s"] = import_s
+    return out
+
+
+# ---------- processo principal ----------
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _dataset(data_dir: Path, scale: float, seed: int, vertices: int) -> Dict:
+    from benchmarks.generate import generate
+
+    manifest = data_dir / "manifest.json"
+    if manifest.exists():
+        resumo = json.loads(manifest.read_text(encoding="utf-8"))
+        if (resumo.get("scale"), resumo.get("seed"), resumo.get("vertices")) == (scale, seed, vertices):
+            return resumo
+    shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"gerando escala {scale:g} em {data_dir}...", flush=True)
+    return generate(str(data_dir), scale, seed, vertices)
+
+
+def _spawn(data_dir: Path, args, requests: int) -> Dict:
+    from benchmarks.generate import settings_env
+
+    env = dict(os.environ)
+    env.pop("UFS", None)  # UFs = as que têm arquivos no conjunto gerado
+    env.update(settings_env(str(data_dir)))
+    env.update({
+        "SNAPSHOT_DIR": str(data_dir / ".snapshots"),
+        # todas as UFs cabem na memória: mede a carga, não as evicções
+        "PARTITION_BUDGET_MB": str(args.budget_mb),
+        "RELOAD_POLL_SECONDS": "0",
+        "LLM_PROVIDER": "echo",
+        "AGENT_CACHE_DIR": "",
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")])),
+    })
+    cmd = [sys.executable, "-m", "benchmarks.run", "--worker", str(data_dir),
+           "--requests", str(requests), "--concurrency", str(args.concurrency)]
+    for name in args.endpoint or []:
+        cmd += ["--endpoint", name]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"subprocesso falhou ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    out["wall_s"] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+def _compare(old: Dict, new: Dict) -> List[str]:
+    """Variação percentual das métricas principais, escala a escala."""
+    def delta(a, b):
+        if not isinstance(a, (int, float)) or not isinstance(b, (int, float)) or not a:
+            return "   n/d"
+        return f"{(b - a) / a * 100:+6.1f}%"
+
+    lines = []
+    for scale, cur in new["scales"].items():
+        prev = old.get("scales", {}).get(scale)
+        if prev is None:
+            continue
+        lines.append(f"escala {scale}:")
+        for run in ("cold", "warm"):
+            for key in ("startup_s", "rss_peak_mb"):
+                a, b = prev.get(run, {}).get(key), cur.get(run, {}).get(key)
+                lines.append(f"  {run}.{key:<24} {a!s:>10} -> {b!s:>10} {delta(a, b)}")
+        for name, ep in cur.get("warm", {}).get("endpoints", {}).items():
+            pep = prev.get("warm", {}).get("endpoints", {}).get(name, {})
+            for key in ("p50_ms", "p99_ms", "throughput_rps"):
+                a, b = pep.get(key), ep.get(key)
+                lines.append(f"  {name + '.' + key:<31} {a!s:>10} -> {b!s:>10} {delta(a, b)}")
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark do backend com dados sintéticos em escala nacional.")
+    ap.add_argument("--scale", type=float, action="append", default=None,
+                    help="Escala relativa à PB (repetível; padrão: 1 e 27)")
+    ap.add_argument("--data-dir", default=os.path.join(os.environ.get("TMPDIR", "/tmp"), "equidar-bench"),
+                    help="Onde gerar os dados (um subdiretório por escala)")
+    ap.add_argument("--seed", type=int, default=42, help="Semente do gerador (padrão: 42)")
+    ap.add_argument("--vertices", type=int, default=120, help="Vértices por polígono (padrão: 120)")
+    ap.add_argument("--requests", type=int, default=200, help="Requisições por rota (padrão: 200)")
+    ap.add_argument("--concurrency", type=int, default=16, help="Requisições simultâneas na vazão (padrão: 16)")
+    ap.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS), default=None,
+                    help="Rota a medir (repetível; padrão: todas)")
+    ap.add_argument("--budget-mb", type=float, default=65536, help="PARTITION_BUDGET_MB dos subprocessos")
+    ap.add_argument("--out", default=None, help="Relatório JSON (padrão: só imprime)")
+    ap.add_argument("--baseline", default=None, help="Relatório anterior para comparar")
+    ap.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        endpoints = args.endpoint or list(ENDPOINTS)
+        print(json.dumps(worker(args.worker, args.requests, args.concurrency, endpoints)))
+        return
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "scales": {},
+    }
+    for scale in args.scale or [1.0, 27.0]:
+        data_dir = Path(args.data_dir) / f"x{scale:g}"
+        dataset = _dataset(data_dir, scale, args.seed, args.vertices)
+        shutil.rmtree(data_dir / ".snapshots", ignore_errors=True)
+        print(f"escala {scale:g}: rodada fria...", flush=True)
+        cold = _spawn(data_dir, args, 0)
+        print(f"escala {scale:g}: rodada quente...", flush=True)
+        warm = _spawn(data_dir, args, args.requests)
+        report["scales"][f"{scale:g}"] = {
+            "data": {k: v for k, v in dataset.items() if k != "ufs"} | {"n_ufs": len(dataset["ufs"])},
+            "cold": cold,
+            "warm": warm,
+        }
+        print(f"escala {scale:g}: startup frio {cold['startup_s']}s, quente {warm['startup_s']}s, "
+              f"pico RSS {warm['rss_peak_mb']} MB", flush=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+        print(f"✅ Relatório salvo em {args.out}")
+    else:
+        print(text)
+    if args.baseline:
+        old = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        print("\n".join(_compare(old, report)))
+
+
+if __name__ == "__main__":
+    main()
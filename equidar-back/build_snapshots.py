@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pré-gera os snapshots colunares dos datasets IDEB/infra e das médias por
+município do mapa (rodar no deploy), para que os workers subam lendo os
+snapshots em vez de processar os CSVs. Só os serviços com snapshot são
+montados: keyspace, indicadores e índice BM25 continuam sendo feitos na
+primeira requisição de cada UF.
+
+    python build_snapshots.py                 # usa SNAPSHOT_DIR / .env, todas as UFs
+    python build_snapshots.py --uf PB --uf RN # só algumas UFs
+    python build_snapshots.py --force         # descarta snapshots existentes
+"""
+import argparse
+import sys
+import time
+
+from app.config import settings
+from app.deps import _load_ideb, _load_infra, available_ufs, load_means, load_partition, partition_files
+from app.services import snapshot
+from app.services.partitions import PartitionManager
+from app.services.registry import DataRegistry
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Gera os snapshots colunares dos datasets do backend.")
+    ap.add_argument("--snapshot-dir", default=settings.snapshot_dir,
+                    help="Diretório dos snapshots (padrão: SNAPSHOT_DIR)")
+    ap.add_argument("--force", action="store_true",
+                    help="Apaga os snapshots existentes antes de gerar")
+    ap.add_argument("--uf", action="append", default=None,
+                    help="UF a gerar (repetível; padrão: todas as disponíveis)")
+    args = ap.parse_args()
+
+    if not args.snapshot_dir:
+        print("SNAPSHOT_DIR vazio: nada a fazer.")
+        sys.exit(2)
+    settings.snapshot_dir = args.snapshot_dir
+    if args.force:
+        snapshot.clear(args.snapshot_dir)
+
+    ufs = [u.upper() for u in args.uf] if args.uf else available_ufs()
+    # sem UFs fixas, nenhuma partição é carregada: load_means monta as médias só de IDEB + infra
+    partitions = PartitionManager(load_partition, ufs, budget_bytes=0)
+    # uma UF por vez: só os dados dela ficam em memória durante a geração
+    for uf in ufs:
+        files = partition_files(uf)
+        registry = DataRegistry()
+        registry.load("ideb", lambda: _load_ideb(uf, files))
+        registry.load("infra", lambda: _load_infra(files))
+        for name, st in registry.stats()["datasets"].items():
+            print(f"{uf} {name}: {st['load_seconds']:.3f}s, {st['frames_bytes']} bytes")
+        t0 = time.perf_counter()
+        means = load_means(uf, partitions)
+        size = 0 if means is None else int(means.memory_usage(index=True, deep=True).sum())
+        print(f"{uf} means: {time.perf_counter() - t0:.3f}s, {size} bytes")
+    print(f"✅ Snapshots em {args.snapshot_dir}")
+
+
+if __name__ == "__main__":
+    main()
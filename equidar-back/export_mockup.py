@@ -1,25 +1,55 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+"""
+Exporta o mockup (escolas por cidade, média infra e média IDEB) para Excel ou CSV.
+
+Dois modos:
+  - local (padrão sem --base-url): carrega os serviços do backend no próprio
+    processo, uma UF por vez, e monta as linhas das cidades de cada UF de uma vez;
+  - remoto (--base-url): consulta a API com um cliente HTTP com pool de
+    conexões, até --parallel cidades ao mesmo tempo.
+No modo local, as linhas de cada UF são gravadas (xlsxwriter em constant_memory
+ou csv) assim que a UF é processada, e o resumo por cidade é acumulado ao longo
+do caminho: só uma UF fica em memória. No remoto, as cidades são buscadas todas
+antes de gravar.
+
+    python export_mockup.py --out pb.xlsx                          # local, todas as cidades da UF padrão
+    python export_mockup.py --uf PB --uf RN --out ne.csv           # local, CSV (+ ne_resumo.csv)
+    python export_mockup.py --cities "João Pessoa" "Campina Grande"
+    python export_mockup.py --base-url http://127.0.0.1:8000 --cities "João Pessoa" --parallel 16
+"""
 import argparse
+import asyncio
+import csv
 import sys
-import requests
-import pandas as pd
-import numpy as np
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import quote
 
-def fetch_json(url):
+import numpy as np
+import pandas as pd
+
+from app.services.keys import school_ids, uf_from_code
+
+ESCOLAS_COLS = ["cidade", "id_escola", "escola", "score_infraestrutura", "nota_ideb_media", "indice_geral"]
+RESUMO_COLS = ["cidade", "media_score_infraestrutura", "media_nota_ideb", "n_escolas"]
+
+
+# ---------- modo remoto ----------
+
+async def fetch_json(client, url):
     try:
-        r = requests.get(url, timeout=60)
+        r = await client.get(url)
         if r.status_code == 200:
             return r.json()
         else:
             return {"__error__": f"HTTP {r.status_code}: {r.text[:200]}"}
     except Exception as e:
-        return {"__error__": str(e)}
+        return {"__error__": str(e) or type(e).__name__}
 
-def try_integrated(base_url, city):
+async def try_integrated(client, base_url, city):
     url = f"{base_url}/municipios/{quote(city)}/indicadores"
-    data = fetch_json(url)
+    data = await fetch_json(client, url)
     if isinstance(data, dict) and "__error__" in data:
         return None, data["__error__"]
     if isinstance(data, dict) and "detail" in data:
@@ -36,14 +66,13 @@ def try_integrated(base_url, city):
             "nota_ideb_media": item.get("nota_ideb_media"),
             "indice_geral": item.get("indice_geral")
         })
-    df_escolas = pd.DataFrame(rows)
+    df_escolas = pd.DataFrame(rows, columns=ESCOLAS_COLS)
     return df_escolas, None
 
-def try_separate(base_url, city):
+async def try_separate(client, base_url, city):
     url_infra = f"{base_url}/infra/municipios/{quote(city)}"
     url_ideb  = f"{base_url}/ideb/municipios/{quote(city)}/ideb"
-    infra = fetch_json(url_infra)
-    ideb  = fetch_json(url_ideb)
+    infra, ideb = await asyncio.gather(fetch_json(client, url_infra), fetch_json(client, url_ideb))
 
     if isinstance(infra, dict) and "__error__" in infra:
         return None, f"[infra] {infra['__error__']}"
@@ -54,9 +83,10 @@ def try_separate(base_url, city):
     if isinstance(ideb, dict) and "detail" in ideb:
         return None, f"[ideb] {ideb['detail']}"
 
+    # IDs na chave canônica int64 ("25033204.0" e "25033204" são a mesma escola)
     df_infra = pd.DataFrame(infra)
     if "id_escola" in df_infra.columns:
-        df_infra["id_escola"] = df_infra["id_escola"].astype(str)
+        df_infra["id_escola"] = school_ids(df_infra["id_escola"]).to_numpy()
 
     def media_ideb(ideb_dict):
         if not isinstance(ideb_dict, dict):
@@ -71,7 +101,7 @@ def try_separate(base_url, city):
 
     df_ideb = pd.DataFrame(ideb)
     if "id_escola" in df_ideb.columns:
-        df_ideb["id_escola"] = df_ideb["id_escola"].astype(str)
+        df_ideb["id_escola"] = school_ids(df_ideb["id_escola"]).to_numpy()
     if "ideb" in df_ideb.columns:
         df_ideb["nota_ideb_media"] = df_ideb["ideb"].apply(media_ideb)
     else:
@@ -84,32 +114,189 @@ def try_separate(base_url, city):
     )
     df["cidade"] = city
     df["indice_geral"] = df[["nota_ideb_media", "score_infraestrutura"]].mean(axis=1, skipna=True)
-    return df[["cidade", "id_escola", "escola", "score_infraestrutura", "nota_ideb_media", "indice_geral"]], None
+    return df[ESCOLAS_COLS], None
+
+async def fetch_remote(base_url: str, cities: List[str], parallel: int,
+                       timeout: float) -> Tuple[List[pd.DataFrame], List[str]]:
+    import httpx  # só o modo remoto precisa do cliente HTTP
+
+    # o pool do cliente limita as conexões; o semáforo, as cidades em andamento
+    limits = httpx.Limits(max_connections=parallel, max_keepalive_connections=parallel)
+    sem = asyncio.Semaphore(parallel)
+
+    async def one(city):
+        async with sem:
+            df, err = await try_integrated(client, base_url, city)
+            if df is None:
+                df, err2 = await try_separate(client, base_url, city)
+                if df is None:
+                    return None, f"{city}: {err} | {err2}"
+            return df, None
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        results = await asyncio.gather(*(one(c) for c in cities))
+    # mesma ordem das cidades pedidas, independente da ordem de chegada
+    return [df for df, _ in results if df is not None], [err for _, err in results if err]
+
+
+# ---------- modo local ----------
+
+def iter_local(cities: Optional[List[str]], ufs: Optional[List[str]], missing: List[str]) -> Iterator[pd.DataFrame]:
+    """Linhas de cada UF, uma UF por vez; cidades sem dados vão para `missing`."""
+    from app.config import settings
+    from app.deps import available_ufs, load_partition
+
+    # cidades por UF: código IBGE diz a UF; nomes vão para a primeira UF pedida (ou a padrão)
+    default_uf = (ufs or [settings.default_uf])[0].upper()
+    if cities is None:
+        plan: Dict[str, Optional[List[str]]] = {u: None for u in ([u.upper() for u in ufs] if ufs else available_ufs())}
+    else:
+        plan = {}
+        for city in cities:
+            uf = uf_from_code(city) if city.strip().isdigit() else default_uf
+            plan.setdefault(uf or default_uf, []).append(city)
+
+    # uma UF por vez: só uma partição (e as linhas dela) fica em memória
+    for uf, wanted in plan.items():
+        indicadores = load_partition(uf).get("indicadores")
+        df, miss = indicadores.rows_for_cities(wanted)
+        missing += [f"{c}: sem dados na UF {uf}" for c in miss]
+        yield df[ESCOLAS_COLS]
+
+
+# ---------- saída em streaming ----------
+
+class CitySummary:
+    """
+    Resumo por cidade (médias de infra e IDEB, escolas distintas) acumulado parte a
+    parte: guarda só somas e contagens por cidade. As partes (uma por UF ou por
+    cidade) não repetem escolas, então as contagens de escolas distintas se somam.
+    """
+    def __init__(self):
+        self.rows = 0
+        self._parts: List[pd.DataFrame] = []
+
+    def add(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        num = df.assign(
+            score_infraestrutura=pd.to_numeric(df["score_infraestrutura"], errors="coerce"),
+            nota_ideb_media=pd.to_numeric(df["nota_ideb_media"], errors="coerce"),
+        )
+        self._parts.append(num.groupby("cidade", dropna=False).agg(
+            infra_soma=("score_infraestrutura", "sum"),
+            infra_n=("score_infraestrutura", "count"),
+            ideb_soma=("nota_ideb_media", "sum"),
+            ideb_n=("nota_ideb_media", "count"),
+            n_escolas=("id_escola", "nunique"),
+        ))
+
+    def frame(self) -> pd.DataFrame:
+        if not self._parts:
+            return pd.DataFrame(columns=RESUMO_COLS)
+        t = pd.concat(self._parts).groupby(level=0, dropna=False).sum()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = pd.DataFrame({
+                "media_score_infraestrutura": t["infra_soma"] / t["infra_n"].where(t["infra_n"] > 0),
+                "media_nota_ideb": t["ideb_soma"] / t["ideb_n"].where(t["ideb_n"] > 0),
+                "n_escolas": t["n_escolas"],
+            })
+        return out.rename_axis("cidade").reset_index()[RESUMO_COLS]
+
+def _escolas_rows(frames: Iterable[pd.DataFrame], summary: CitySummary) -> Iterator[list]:
+    # cada parte é gravada e resumida assim que chega, sem juntar as partes
+    for df in frames:
+        summary.add(df)
+        yield from _records(df, ESCOLAS_COLS, ["score_infraestrutura", "nota_ideb_media", "indice_geral"])
+
+def _resumo_rows(summary: CitySummary) -> Iterator[list]:
+    # gerador: só roda depois que a aba de escolas foi toda gravada
+    yield from _records(summary.frame(), RESUMO_COLS, ["media_score_infraestrutura", "media_nota_ideb"])
+
+def _records(df: pd.DataFrame, cols: List[str], round_cols: Iterable[str]) -> Iterable[list]:
+    # arredondamento vetorizado; NaN vira célula vazia
+    out = df[cols].copy()
+    for c in round_cols:
+        out[c] = pd.to_numeric(out[c], errors="coerce").astype(float).round(2)
+    if "id_escola" in cols:
+        out["id_escola"] = [None if pd.isna(v) else str(v) for v in out["id_escola"].tolist()]
+    for row in out.itertuples(index=False, name=None):
+        yield [None if isinstance(v, float) and v != v else v for v in row]
+
+def write_xlsx(path: str, sheets: List[Tuple[str, List[str], Iterable[list]]]) -> None:
+    import xlsxwriter
+
+    # constant_memory: cada linha vai para o disco assim que a próxima começa
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        for name, cols, rows in sheets:
+            ws = wb.add_worksheet(name)
+            ws.write_row(0, 0, cols)
+            for r, row in enumerate(rows, start=1):
+                ws.write_row(r, 0, row)
+    finally:
+        wb.close()
+
+def write_csv(path: str, sheets: List[Tuple[str, List[str], Iterable[list]]]) -> List[str]:
+    # uma planilha por arquivo: <out>.csv e <out>_<aba>.csv para as demais
+    written = []
+    base = Path(path)
+    for i, (name, cols, rows) in enumerate(sheets):
+        target = base if i == 0 else base.with_name(f"{base.stem}_{name.split('_')[0]}{base.suffix}")
+        with open(target, "w", newline="", encoding="utf-8") as fh:
+            w = csv.writer(fh)
+            w.writerow(cols)
+            w.writerows(rows)
+        written.append(str(target))
+    return written
+
 
 def main():
     ap = argparse.ArgumentParser(
-        description="Exporta mockup (escolas por cidade, média infra e média ideb) para Excel."
+        description="Exporta mockup (escolas por cidade, média infra e média ideb) para Excel ou CSV."
     )
-    ap.add_argument("--base-url", required=True,
-                    help="Base URL do seu backend (ex.: http://127.0.0.1:8000)")
-    ap.add_argument("--cities", nargs="+", required=True,
-                    help='Lista de cidades (use aspas se houver espaço). Ex.: --cities "João Pessoa" "Campina Grande"')
+    ap.add_argument("--base-url", default=None,
+                    help="Base URL do backend (ex.: http://127.0.0.1:8000); sem ela, roda no próprio processo")
+    ap.add_argument("--cities", nargs="+", default=None,
+                    help='Lista de cidades (use aspas se houver espaço). Ex.: --cities "João Pessoa" "Campina Grande"; '
+                         "no modo local, sem a lista exporta todas as cidades")
+    ap.add_argument("--uf", action="append", default=None,
+                    help="Modo local: UF(s) a exportar (repetível; padrão: a UF padrão para nomes, todas sem --cities)")
+    ap.add_argument("--parallel", type=int, default=8,
+                    help="Modo remoto: cidades consultadas ao mesmo tempo (padrão: 8)")
+    ap.add_argument("--timeout", type=float, default=60.0,
+                    help="Modo remoto: timeout de cada requisição em segundos (padrão: 60)")
     ap.add_argument("--out", default="indicadores_mockup.xlsx",
-                    help="Nome do arquivo Excel de saída")
+                    help="Arquivo de saída (.xlsx ou .csv)")
     args = ap.parse_args()
 
-    all_rows, errors = [], []
+    # cidade repetida na lista entraria duas vezes (e contaria as escolas em dobro no resumo)
+    cities = list(dict.fromkeys(args.cities)) if args.cities else args.cities
+    errors: List[str] = []
+    if args.base_url:
+        if not cities:
+            ap.error("--cities é obrigatório no modo remoto")
+        frames, errors = asyncio.run(
+            fetch_remote(args.base_url.rstrip("/"), cities, max(1, args.parallel), args.timeout)
+        )
+    else:
+        frames = iter_local(cities, args.uf, errors)
 
-    for city in args.cities:
-        df, err = try_integrated(args.base_url, city)
-        if df is None:
-            df, err2 = try_separate(args.base_url, city)
-            if df is None:
-                errors.append(f"{city}: {err} | {err2}")
-                continue
-        all_rows.append(df)
+    summary = CitySummary()
+    sheets = [
+        ("escolas_por_cidade", ESCOLAS_COLS, _escolas_rows(frames, summary)),
+        ("resumo_cidades", RESUMO_COLS, _resumo_rows(summary)),
+    ]
+    out_path = args.out
+    if Path(out_path).suffix.lower() == ".csv":
+        written = write_csv(out_path, sheets)
+    else:
+        write_xlsx(out_path, sheets)
+        written = [out_path]
 
-    if not all_rows:
+    if summary.rows == 0:
+        # as linhas só são conhecidas depois de gravadas: arquivos vazios são removidos
+        for path in written:
+            Path(path).unlink(missing_ok=True)
         print("Nenhum dado exportado.")
         if errors:
             print("Erros:")
@@ -117,34 +304,15 @@ def main():
                 print(" -", e)
         sys.exit(2)
 
-    df_escolas = pd.concat(all_rows, ignore_index=True)
-    resumo = (
-        df_escolas.groupby("cidade", dropna=False)
-        .agg(
-            media_score_infraestrutura=("score_infraestrutura", "mean"),
-            media_nota_ideb=("nota_ideb_media", "mean"),
-            n_escolas=("id_escola", "nunique")
-        )
-        .reset_index()
-    )
-
-    for c in ["score_infraestrutura", "nota_ideb_media", "indice_geral"]:
-        if c in df_escolas.columns:
-            df_escolas[c] = df_escolas[c].astype(float).round(2)
-    for c in ["media_score_infraestrutura", "media_nota_ideb"]:
-        if c in resumo.columns:
-            resumo[c] = resumo[c].astype(float).round(2)
-
-    out_path = args.out
-    with pd.ExcelWriter(out_path, engine="xlsxwriter") as xw:
-        df_escolas.to_excel(xw, sheet_name="escolas_por_cidade", index=False)
-        resumo.to_excel(xw, sheet_name="resumo_cidades", index=False)
-
-    print(f"✅ OK! Arquivo salvo: {out_path}")
+    if len(written) > 1:
+        print(f"✅ OK! Arquivos salvos: {', '.join(written)}")
+    else:
+        print(f"✅ OK! Arquivo salvo: {out_path}")
+    print(f"{summary.rows} escolas em {len(summary.frame())} cidades")
     if errors:
         print("\n⚠️ Algumas cidades tiveram erros:")
         for e in errors:
             print(" -", e)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Ingestão das planilhas nacionais do IDEB (INEP) nos arquivos que o backend lê,
+substituindo os notebooks `ideb_data.ipynb` / `aggr.ipynb`.
+
+Cada planilha (EF1, EF2, EM) é lida linha a linha em modo read-only e filtrada
+por UF/rede durante a leitura, num processo próprio. Cada processo grava os
+`IDEB_<ETAPA>_<UF>.csv` das UFs pedidas; o processo principal junta as três
+etapas e grava `ALL_SCHOOLS_<UF>_WITH_SCORES.csv` (+ `.json`).
+
+    python ingest.py --ef1 divulgacao_anos_iniciais_escolas_2021.xlsx \\
+                     --ef2 divulgacao_anos_finais_escolas_2021.xlsx \\
+                     --em divulgacao_ensino_medio_escolas_2021.xlsx \\
+                     --uf PB --uf RN           # padrão: todas as UFs
+    python ingest.py ... --out-dir /tmp/data  # em vez dos caminhos configurados
+    python ingest.py ... --snapshots          # regera os snapshots das UFs
+    python ingest.py ... --ano 2023 --store   # só acrescenta a edição 2023 à base longa
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from app.config import settings
+from app.services.ideb_store import IDEBStore, melt_wide, numeric
+from app.services.keys import UF_BY_CODE
+
+# etapa -> (nome usado nos arquivos, bit da categoria, rótulo da categoria)
+STAGES = {
+    "EF1": ("ANOS_INICIAIS", 1, "Anos INICIAIS"),
+    "EF2": ("ANOS_FINAIS", 2, "Anos FINAIS"),
+    "EM": ("ENSINO_MEDIO", 4, "MEDIO"),
+}
+# ordem de prioridade na junção (a primeira etapa de cada escola dá ORIGEM e nome)
+AGGR_ORDER = ["EF2", "EF1", "EM"]
+REDES = ("Municipal", "Estadual", "Federal")
+ANOS = (2017, 2019, 2021)
+ID_COLS = ["SG_UF", "CO_MUNICIPIO", "NO_MUNICIPIO", "ID_ESCOLA", "NO_ESCOLA", "REDE"]
+# colunas por ano, na ordem dos CSVs de saída (indicador, depois ano); as ausentes (ex.: projeção 2017 do EM) são puladas
+YEAR_COLS = [
+    "VL_APROVACAO_{ano}_SI_4",
+    "VL_INDICADOR_REND_{ano}",
+    "VL_NOTA_MATEMATICA_{ano}",
+    "VL_NOTA_PORTUGUES_{ano}",
+    "VL_NOTA_MEDIA_{ano}",
+    "VL_OBSERVADO_{ano}",
+    "VL_PROJECAO_{ano}",
+]
+# categoria de cada combinação de etapas (soma dos bits), ex.: 3 -> "Anos FINAIS & Anos INICIAIS"
+CATEGORIES = {
+    mask: " & ".join(sorted(label for _, bit, label in STAGES.values() if mask & bit))
+    for mask in range(1, 8)
+}
+
+
+def _scan(path: str, ufs: set, redes: set, anos: Sequence[int]) -> pd.DataFrame:
+    """Lê a planilha em streaming e devolve só as linhas/colunas usadas."""
+    from openpyxl import load_workbook  # só a ingestão precisa do openpyxl
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        # o cabeçalho vem depois das linhas de título do INEP (linha 9 ou 10, conforme a planilha)
+        for header in rows:
+            header = [str(c).strip() if c is not None else "" for c in header]
+            if "SG_UF" in header:
+                break
+        else:
+            raise ValueError(f"{path}: cabeçalho com SG_UF não encontrado")
+
+        pos = {name: i for i, name in enumerate(header) if name}
+        missing = [c for c in ID_COLS if c not in pos]
+        if missing:
+            raise ValueError(f"{path}: colunas ausentes {missing}")
+        cols = ID_COLS + [c for t in YEAR_COLS for ano in anos if (c := t.format(ano=ano)) in pos]
+        pick = itemgetter(*(pos[c] for c in cols))
+        i_uf, i_rede = pos["SG_UF"], pos["REDE"]
+        # planilhas sem dimensão gravada (escritas em streaming) podem trazer linhas mais
+        # curtas que o cabeçalho: completadas com células vazias
+        width = len(header)
+
+        data: List[tuple] = []
+        for row in rows:
+            if len(row) <= max(i_uf, i_rede):
+                continue
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            uf, rede = row[i_uf], row[i_rede]
+            if uf is None or rede is None:
+                continue
+            uf, rede = str(uf).strip(), str(rede).strip()
+            # rodapé ("Fonte: ...") e UFs/redes fora do filtro caem aqui
+            if uf not in ufs or rede not in redes:
+                continue
+            data.append(pick(row))
+    finally:
+        wb.close()
+
+    df = pd.DataFrame(data, columns=cols)
+    for c in ("SG_UF", "REDE", "NO_MUNICIPIO", "NO_ESCOLA"):
+        df[c] = df[c].astype(str).str.strip()
+    for c in ("CO_MUNICIPIO", "ID_ESCOLA"):
+        df[c] = numeric(df[c]).astype("Int64")
+    return df
+
+
+def ingest_stage(stage: str, path: str, ufs: List[str], redes: List[str],
+                 anos: Sequence[int], out: Optional[Dict[str, str]],
+                 stores: Optional[Dict[str, str]] = None, replace: bool = False) -> Dict[str, pd.DataFrame]:
+    """
+    Processa uma etapa (roda num processo do pool): grava um CSV por UF em
+    `out[uf]` (sem `out`, nenhum CSV) e as partições por ano na base longa em
+    `stores[uf]`, e devolve, por UF, as colunas de identificação + IDEB_SCORE.
+    """
+    t0 = time.perf_counter()
+    df = _scan(path, set(ufs), set(redes), anos)
+
+    # observado/projeção numéricos e RESULTADO = observado - projeção (anos com as duas colunas)
+    for ano in anos:
+        obs, proj = f"VL_OBSERVADO_{ano}", f"VL_PROJECAO_{ano}"
+        for c in (obs, proj):
+            if c in df:
+                df[c] = numeric(df[c])
+        if obs in df and proj in df:
+            df[f"RESULTADO_{ano}"] = df[obs] - df[proj]
+
+    # IDEB_SCORE: nota média do ano mais recente, com recuo para os anos anteriores
+    score = pd.Series(float("nan"), index=df.index)
+    for ano in sorted(anos, reverse=True):
+        col = f"VL_NOTA_MEDIA_{ano}"
+        if col in df:
+            score = score.fillna(numeric(df[col]))
+    df["IDEB_SCORE"] = score
+
+    result = {}
+    for uf, part in df.groupby("SG_UF", sort=True):
+        if out:
+            target = Path(out[uf])
+            target.parent.mkdir(parents=True, exist_ok=True)
+            part.drop(columns="IDEB_SCORE").to_csv(target, index=False)
+        if stores:
+            # só as edições (ano, etapa) ainda ausentes, a não ser com --replace
+            written = IDEBStore(stores[uf]).append(melt_wide(part, stage), replace=replace)
+            print(f"{stage} {uf}: partições {[a for a, _ in written]} na base longa", flush=True)
+        result[uf] = part[ID_COLS + ["IDEB_SCORE"]].reset_index(drop=True)
+    print(f"{stage}: {len(df)} escolas em {len(result)} UF(s), {time.perf_counter() - t0:.1f}s", flush=True)
+    return result
+
+
+def aggregate(uf: str, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Uma linha por escola com IDEB_SCORE, ORIGEM (primeira etapa) e CATEGORY (todas as etapas)."""
+    parts = []
+    for stage in AGGR_ORDER:
+        df = frames.get(stage)
+        if df is None or df.empty:
+            continue
+        name, bit, _ = STAGES[stage]
+        parts.append(df.assign(ORIGEM=f"IDEB_{name}_{uf}", _bit=bit))
+    if not parts:
+        return pd.DataFrame(columns=ID_COLS + ["IDEB_SCORE", "ORIGEM", "CATEGORY"])
+    df = pd.concat(parts, ignore_index=True)
+    df = df[df["ID_ESCOLA"].notna()]
+
+    # soma dos bits distintos por escola = conjunto de etapas -> rótulo
+    bits = df.drop_duplicates(["ID_ESCOLA", "_bit"]).groupby("ID_ESCOLA")["_bit"].sum()
+    df = df.drop_duplicates("ID_ESCOLA", keep="first")
+    df["CATEGORY"] = df["ID_ESCOLA"].map(bits).map(CATEGORIES)
+    return df.drop(columns="_bit").reset_index(drop=True)
+
+
+def _output(pattern: str, uf: str, out_dir: Optional[str]) -> str:
+    path = Path(pattern.format(uf=uf))
+    return str(Path(out_dir) / path.name) if out_dir else str(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingestão das planilhas do IDEB (INEP) para o backend.")
+    ap.add_argument("--ef1", help="Planilha do IDEB anos iniciais (xlsx)")
+    ap.add_argument("--ef2", help="Planilha do IDEB anos finais (xlsx)")
+    ap.add_argument("--em", help="Planilha do IDEB ensino médio (xlsx)")
+    ap.add_argument("--uf", action="append", default=None,
+                    help="UF a extrair (repetível; padrão: todas)")
+    ap.add_argument("--rede", action="append", default=None,
+                    help=f"Rede a manter (repetível; padrão: {', '.join(REDES)})")
+    ap.add_argument("--ano", action="append", type=int, default=None,
+                    help=f"Ano da planilha a manter (repetível; padrão: {', '.join(map(str, ANOS))}). "
+                         "Com --store grava só na base longa; sem --store os CSVs ficam só com esses anos")
+    ap.add_argument("--out-dir", default=None,
+                    help="Diretório de saída (padrão: caminhos configurados em app/config.py)")
+    ap.add_argument("--workers", type=int, default=3,
+                    help="Processos em paralelo (um por planilha; padrão: 3)")
+    ap.add_argument("--store", action="store_true",
+                    help="Acrescenta as edições lidas à base longa por ano (IDEB_STORE_DIR)")
+    ap.add_argument("--replace", action="store_true",
+                    help="Com --store, regrava as edições que já existem na base")
+    ap.add_argument("--snapshots", action="store_true",
+                    help="Regera os snapshots colunares das UFs ingeridas (SNAPSHOT_DIR)")
+    args = ap.parse_args()
+
+    inputs = {stage: path for stage, path in (("EF1", args.ef1), ("EF2", args.ef2), ("EM", args.em)) if path}
+    if not inputs:
+        ap.error("informe ao menos uma planilha (--ef1, --ef2, --em)")
+    ufs = sorted({u.upper() for u in args.uf}) if args.uf else sorted(set(UF_BY_CODE.values()))
+    redes = args.rede or list(REDES)
+    anos = sorted(args.ano) if args.ano else list(ANOS)
+    patterns = {"EF1": settings.ideb_ef1_file, "EF2": settings.ideb_ef2_file, "EM": settings.ideb_em_file}
+    stores = None
+    if args.store:
+        if not settings.ideb_store_dir:
+            ap.error("--store requer IDEB_STORE_DIR")
+        stores = {uf: settings.ideb_store_dir.format(uf=uf) for uf in ufs}
+    # --ano com --store acrescenta edições à base: os CSVs (com todos os anos) ficam como estão
+    store_only = bool(args.ano) and args.store
+
+    t0 = time.perf_counter()
+    frames: Dict[str, Dict[str, pd.DataFrame]] = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(inputs)))) as pool:
+        futures = {
+            stage: pool.submit(
+                ingest_stage, stage, path, ufs, redes, anos,
+                None if store_only else {uf: _output(patterns[stage], uf, args.out_dir) for uf in ufs},
+                stores, args.replace,
+            )
+            for stage, path in inputs.items()
+        }
+        for stage, fut in futures.items():
+            frames[stage] = fut.result()
+
+    found = sorted({uf for per_uf in frames.values() for uf in per_uf})
+    if not found:
+        print("Nenhuma escola encontrada para os filtros informados.")
+        sys.exit(1)
+    if store_only:
+        print(f"Só a base longa atualizada (anos {', '.join(map(str, anos))}); CSVs e ALL_SCHOOLS intactos.")
+    for uf in ([] if store_only else found):
+        df = aggregate(uf, {stage: per_uf[uf] for stage, per_uf in frames.items() if uf in per_uf})
+        target = Path(_output(settings.schools_file, uf, args.out_dir))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(target, index=False)
+        df.to_json(target.with_suffix(".json"), orient="records", force_ascii=False)
+        print(f"{uf}: {len(df)} escolas -> {target}")
+
+    if args.snapshots:
+        if args.out_dir:
+            print("--snapshots ignorado com --out-dir (o backend lê os caminhos configurados).")
+        elif not settings.snapshot_dir:
+            print("SNAPSHOT_DIR vazio: snapshots não gerados.")
+        else:
+            from app.deps import load_partition
+            for uf in found:
+                load_partition(uf)
+            print(f"Snapshots em {settings.snapshot_dir}")
+    print(f"✅ Ingestão concluída em {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from benchmarks.generate import generate, settings_env
+
+
+@pytest.fixture
+def three_ufs(tmp_path, monkeypatch):
+    # PB + RO + AC, synthetic data in the layout of data/
+    data = tmp_path / "data"
+    generate(str(data), scale=3, vertices=8)
+    for name, value in settings_env(str(data)).items():
+        monkeypatch.setattr(settings, name.lower(), value)
+    monkeypatch.setattr(settings, "ufs", [])
+    monkeypatch.setattr(settings, "snapshot_dir", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(settings, "partition_budget_mb", 0.001)
+    return data
+
+
+@pytest.fixture
+def client(three_ufs):
+    # app over the synthetic UFs (the lifespan builds the snapshot from `settings`)
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,18 @@
+import os
+import sys
+
+from app.config import settings
+from app.deps import build_snapshot
+import build_snapshots
+
+
+def test_prebuild_covers_startup_snapshots(three_ufs, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["build_snapshots.py"])
+    build_snapshots.main()
+    built = set(os.listdir(settings.snapshot_dir))
+    # IDEB, infra e médias de cada UF
+    assert sorted(name.split("-")[0] for name in built) == ["ideb"] * 3 + ["infra"] * 3 + ["means"] * 3
+
+    # a subida (warm) só lê snapshots: nada novo é gravado
+    build_snapshot()
+    assert set(os.listdir(settings.snapshot_dir)) == built
@@ -0,0 +1,29 @@
+import csv
+import io
+import json
+from urllib.parse import unquote
+
+CITY = "Município PB 0001"
+
+
+def test_bulk_ndjson_matches_city_endpoint(client):
+    r = client.get("/municipios/indicadores/bulk", params={"cidade": [CITY, "Nada"]})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert unquote(r.headers["X-Missing-Cities"]) == "Nada"
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    single = client.get(f"/municipios/{CITY}/indicadores").json()
+    assert [row["id_escola"] for row in rows] == [row["id_escola"] for row in single]
+
+
+def test_bulk_csv_for_a_whole_uf(client):
+    r = client.post("/municipios/indicadores/bulk", json={"uf": "RO", "formato": "csv"})
+    assert r.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert rows and {row["id_escola"][:2] for row in rows} == {"11"}
+
+
+def test_bulk_errors(client):
+    assert client.get("/municipios/indicadores/bulk").status_code == 422
+    assert client.get("/municipios/indicadores/bulk", params={"cidade": "Nada"}).status_code == 404
+    assert client.get("/municipios/indicadores/bulk", params={"uf": "SP"}).status_code == 404
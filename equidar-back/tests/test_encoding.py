@@ -0,0 +1,19 @@
+import pytest
+
+from app.services.choropleth import negotiate_encoding
+
+BOTH = ("identity", "gzip", "br")
+
+
+@pytest.mark.parametrize("header, available, expected", [
+    ("gzip", BOTH, "gzip"),
+    ("gzip, br", BOTH, "br"),
+    ("gzip, br", ("identity", "gzip"), "gzip"),
+    ("gzip;q=0", BOTH, "identity"),
+    ("br;q=0, gzip", BOTH, "gzip"),
+    ("gzip;q=1, br;q=0.5", BOTH, "gzip"),
+    ("*;q=0", BOTH, "identity"),
+    ("", BOTH, "identity"),
+])
+def test_negotiate_encoding_honours_q_values(header, available, expected):
+    assert negotiate_encoding(header, available) == expected
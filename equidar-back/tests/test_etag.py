@@ -0,0 +1,22 @@
+def test_conditional_get(client):
+    first = client.get("/scores/")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "max-age" in first.headers["Cache-Control"]
+
+    again = client.get("/scores/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    assert client.get("/scores/", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    # another representation (query, path) gets another tag
+    assert client.get("/scores/?w_internet=0.5").headers["ETag"] != etag
+    assert client.get("/municipalities").headers["ETag"] != etag
+    assert client.get("/scores/", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_uncached_paths_have_no_etag(client):
+    assert "ETag" not in client.get("/agents/provider/stats").headers
+    assert client.get("/municipalities/nope").status_code == 404
+    assert "ETag" not in client.get("/municipalities/nope").headers
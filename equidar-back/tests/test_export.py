@@ -0,0 +1,24 @@
+import sys
+
+import pandas as pd
+
+import export_mockup
+
+
+def test_local_export_streams_every_uf(three_ufs, tmp_path, monkeypatch):
+    out = tmp_path / "todas.csv"
+    monkeypatch.setattr(sys, "argv", ["export_mockup.py", "--out", str(out)])
+    export_mockup.main()
+
+    escolas = pd.read_csv(out)
+    resumo = pd.read_csv(tmp_path / "todas_resumo.csv")
+    assert {str(c)[:2] for c in escolas["id_escola"]} == {"11", "12", "25"}
+    # o resumo acumulado UF a UF bate com o da tabela inteira (a menos do arredondamento das linhas)
+    esperado = (
+        escolas.groupby("cidade")
+        .agg(media_score_infraestrutura=("score_infraestrutura", "mean"),
+             media_nota_ideb=("nota_ideb_media", "mean"),
+             n_escolas=("id_escola", "nunique"))
+        .reset_index()
+    )
+    pd.testing.assert_frame_equal(resumo, esperado, check_dtype=False, check_exact=False, atol=0.011)
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from app.services.ideb import IDEBService
+from app.services.ideb_store import IDEBStore, melt_wide, numeric
+from benchmarks.generate import ARQUIVOS, generate
+
+
+def test_numeric_accepts_comma_decimals():
+    for dtype in (object, "str"):
+        values = pd.Series(["4,5", "5.1", "-", "ND", None], dtype=dtype)
+        assert numeric(values).tolist()[:2] == [4.5, 5.1]
+        assert numeric(values).isna().tolist() == [False, False, True, True, True]
+
+
+def _wide():
+    return pd.DataFrame({
+        "ID_ESCOLA": ["25000001", "25000002"],
+        "NO_ESCOLA": ["A", "B"],
+        "CO_MUNICIPIO": ["2500106", "2500106"],
+        "NO_MUNICIPIO": ["X", "X"],
+        "REDE": ["Municipal", "Estadual"],
+        "VL_NOTA_MEDIA_2019": ["4,5", "-"],
+        "VL_NOTA_MEDIA_2021": ["5,0", "6.1"],
+        "VL_OBSERVADO_2021": [5.0, 6.1],
+    })
+
+
+def test_store_year_partitions(tmp_path):
+    store = IDEBStore(str(tmp_path / "store"))
+    long = melt_wide(_wide(), "EF1")
+    assert store.append(long) == [(2019, "EF1"), (2021, "EF1")]
+    # partições existentes ficam intactas sem replace
+    assert store.append(long) == []
+
+    reopened = IDEBStore(str(tmp_path / "store"))
+    assert reopened.years() == [2019, 2021]
+    ano = reopened.read(anos=[2019])
+    assert set(ano["ano"]) == {2019}
+    assert ano["nota_media"].tolist()[0] == 4.5
+    assert ano["nota_media"].isna().tolist() == [False, True]
+    assert reopened.read(anos=[2021])["nota_media"].tolist() == [5.0, 6.1]
+
+    reopened.drop(2019)
+    assert IDEBStore(str(tmp_path / "store")).years() == [2021]
+
+
+def test_year_reads_are_bounded_by_store(tmp_path):
+    generate(str(tmp_path / "data"), scale=1, vertices=8)
+    csvs = [str(tmp_path / "data" / ARQUIVOS[e].format(uf="PB")) for e in ("EF1", "EF2", "EM")]
+    plain = IDEBService(*csvs)
+    stored = IDEBService(*csvs, store=IDEBStore(str(tmp_path / "store")))
+    city = plain.df_long["NO_MUNICIPIO"].iat[0]
+
+    assert stored.metricas_by_city(city, ano=2019) == plain.metricas_by_city(city, ano=2019)
+    for ano in (1900, 2020, 2999):
+        assert stored.metricas_by_city(city, ano=ano) == []
+    assert set(stored._years) == {2019}
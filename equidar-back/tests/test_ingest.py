@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+
+from app.services.ideb_store import IDEBStore
+from ingest import _scan, ingest_stage
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def _sheet(path):
+    # write-only workbooks do not record the sheet dimension: trailing empty cells are dropped
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["Título do INEP"])
+    ws.append(["SG_UF", "CO_MUNICIPIO", "NO_MUNICIPIO", "ID_ESCOLA", "NO_ESCOLA", "REDE",
+               "VL_NOTA_MEDIA_2019", "VL_NOTA_MEDIA_2021", "VL_OBSERVADO_2021", "VL_PROJECAO_2021"])
+    ws.append(["PB", 2500106, "X", 25000001, "A", "Municipal", "4,1", "4,5"])
+    ws.append(["PB", 2500106, "X", 25000002, "B", "Estadual", "-", "5.0", 5.0, 4.8])
+    ws.append(["RN", 2400109, "Y", 24000001, "C", "Municipal", "5,9", "6,0"])
+    ws.append(["Fonte: INEP"])
+    wb.save(path)
+    return str(path)
+
+
+def test_scan_pads_rows_shorter_than_header(tmp_path):
+    df = _scan(_sheet(tmp_path / "ef1.xlsx"), {"PB"}, {"Municipal", "Estadual"}, [2021])
+    assert df["ID_ESCOLA"].tolist() == [25000001, 25000002]
+    assert df["VL_OBSERVADO_2021"].isna().tolist() == [True, False]
+    assert df["VL_PROJECAO_2021"].tolist()[1] == 4.8
+
+
+def test_ingest_stage_backfills_the_store(tmp_path):
+    path = _sheet(tmp_path / "ef1.xlsx")
+    out = {uf: str(tmp_path / f"IDEB_ANOS_INICIAIS_{uf}.csv") for uf in ("PB", "RN")}
+    stores = {uf: str(tmp_path / "store" / uf) for uf in ("PB", "RN")}
+
+    result = ingest_stage("EF1", path, ["PB", "RN"], ["Municipal", "Estadual"], [2019, 2021], out, stores)
+    assert result["PB"]["IDEB_SCORE"].tolist() == [4.5, 5.0]
+    store = IDEBStore(stores["PB"])
+    assert store.partitions() == [(2019, "EF1"), (2021, "EF1")]
+    assert store.read(anos=[2019])["nota_media"].tolist()[0] == 4.1
+
+    # só o ano novo, sem CSVs: as partições existentes ficam intactas
+    for target in out.values():
+        Path(target).unlink()
+    ingest_stage("EF1", path, ["PB"], ["Municipal", "Estadual"], [2021], None, stores)
+    assert not any(Path(t).exists() for t in out.values())
+    assert IDEBStore(stores["PB"]).partitions() == [(2019, "EF1"), (2021, "EF1")]
@@ -0,0 +1,28 @@
+CITY = "Município PB 0001"
+
+
+def test_pages_cover_the_full_list(client):
+    full = client.get(f"/municipios/{CITY}/indicadores").json()
+    assert len(full) > 10
+    pages = []
+    for offset in range(0, len(full), 7):
+        r = client.get(f"/municipios/{CITY}/indicadores", params={"limit": 7, "offset": offset})
+        assert r.headers["X-Total-Count"] == str(len(full))
+        pages += r.json()
+    assert pages == full
+
+
+def test_sort_and_projection(client):
+    r = client.get(f"/municipios/{CITY}/indicadores",
+                   params={"sort": "-nota_ideb_media", "fields": "id_escola,nota_ideb_media", "limit": 20})
+    rows = r.json()
+    assert all(set(row) == {"id_escola", "nota_ideb_media"} for row in rows)
+    notas = [row["nota_ideb_media"] for row in rows if row["nota_ideb_media"] is not None]
+    assert notas == sorted(notas, reverse=True)
+
+
+def test_invalid_params(client):
+    url = f"/municipios/{CITY}/indicadores"
+    assert client.get(url, params={"fields": ","}).status_code == 422
+    assert client.get(url, params={"sort": "nope"}).status_code == 422
+    assert client.get(url, params={"limit": 0}).status_code == 422
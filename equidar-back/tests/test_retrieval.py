@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.deps import load_partition
+from app.services.registry import _frames_bytes
+from benchmarks.generate import generate, settings_env
+
+
+@pytest.fixture
+def retriever(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    generate(str(data), scale=1, vertices=8)
+    for name, value in settings_env(str(data)).items():
+        monkeypatch.setattr(settings, name.lower(), value)
+    monkeypatch.setattr(settings, "ufs", [])
+    monkeypatch.setattr(settings, "snapshot_dir", str(tmp_path / "snapshots"))
+    return load_partition("PB").get("retriever")
+
+
+def _bm25_full(r, terms, lo, hi):
+    # referência: pontua o corpus inteiro e recorta a cidade
+    scores = np.zeros(len(r.ids))
+    norm = r.k1 * (1 - r.b + r.b * r._len / (r._avgdl or 1))
+    for term in set(terms):
+        if term in r._postings:
+            rows, tf, idf = r._postings[term]
+            scores[rows] += idf * tf * (r.k1 + 1) / (tf + norm[rows])
+    return scores[lo:hi]
+
+
+def test_bm25_city_slice_matches_full_corpus(retriever):
+    assert retriever.ranges
+    for lo, hi in list(retriever.ranges.values())[:20]:
+        for terms in (["ef1"], ["em", "medio"], ["ef2", "fundamental", "ausente"]):
+            np.testing.assert_allclose(retriever._bm25(terms, lo, hi), _bm25_full(retriever, terms, lo, hi))
+
+
+def test_context_fits_budget(retriever):
+    city = next(iter(retriever.ranges))
+    text, keys = retriever.context(city, "escolas de ensino medio com ideb abaixo de 5", 200)
+    assert keys and all(k.startswith("school:") for k in keys)
+    assert (len(text) + 3) // 4 <= 200
+
+
+def test_nbytes_counts_python_structures(retriever):
+    arrays = retriever._len.nbytes + retriever._norm.nbytes + sum(a.nbytes for a in retriever.metrics.values())
+    postings = sum(rows.nbytes + tf.nbytes for rows, tf, _ in retriever._postings.values())
+    assert _frames_bytes(retriever) == retriever.nbytes() > 2 * (arrays + postings)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from app.services.geometry import read_polygons
+from app.services.spatial import SpatialIndex, _polygons_contain
+from benchmarks.generate import generate
+
+
+@pytest.fixture(scope="module")
+def features(tmp_path_factory):
+    data = tmp_path_factory.mktemp("data")
+    generate(str(data), scale=3, vertices=12)
+    polygons, _ = read_polygons(str(data / "municipalities.polygons.json"))
+    return polygons
+
+
+def _bounds(polys):
+    pts = np.concatenate([ring for poly in polys for ring in poly])
+    return pts[:, 0].min(), pts[:, 1].min(), pts[:, 0].max(), pts[:, 1].max()
+
+
+def test_in_bbox_matches_brute_force(features):
+    idx = SpatialIndex(features, node_size=4)
+    boxes = {fid: _bounds(p) for fid, p in features.items()}
+    rng = np.random.default_rng(0)
+    all_x = [v for b in boxes.values() for v in (b[0], b[2])]
+    all_y = [v for b in boxes.values() for v in (b[1], b[3])]
+    for _ in range(50):
+        x0, x1 = np.sort(rng.uniform(min(all_x), max(all_x), 2))
+        y0, y1 = np.sort(rng.uniform(min(all_y), max(all_y), 2))
+        expected = sorted(
+            fid for fid, (a, b, c, d) in boxes.items() if a <= x1 and c >= x0 and b <= y1 and d >= y0
+        )
+        assert idx.in_bbox(x0, y0, x1, y1) == expected
+
+
+def test_locate_matches_brute_force(features):
+    idx = SpatialIndex(features, node_size=4)
+    rng = np.random.default_rng(1)
+    for fid, polys in list(features.items())[::25]:
+        a, b, c, d = _bounds(polys)
+        for x, y in zip(rng.uniform(a, c, 10), rng.uniform(b, d, 10)):
+            expected = next((f for f in sorted(features) if _polygons_contain(features[f], x, y)), None)
+            found = idx.locate(x, y)
+            assert (found is None) == (expected is None)
+            if found is not None:
+                assert _polygons_contain(features[found], x, y)
+    assert idx.locate(-1000.0, -1000.0) is None
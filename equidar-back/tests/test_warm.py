@@ -0,0 +1,20 @@
+import json
+
+from app.config import settings
+from app.deps import build_snapshot
+from app.models import ScoreParams
+
+
+def test_warm_keeps_only_default_uf_resident(three_ufs):
+    snap = build_snapshot()  # runs warm()
+    stats = snap.partitions.stats()
+    assert stats["loaded"] == [settings.default_uf]
+    for uf, info in stats["partitions"].items():
+        assert info["loads"] == (1 if uf == settings.default_uf else 0)
+        assert info["evictions"] == 0
+
+    # the warmed choropleth still has means for the UFs that were not loaded
+    fc = json.loads(snap.choropleth.variant(ScoreParams(), 0)["identity"])
+    with_ideb = {f["properties"]["id"][:2] for f in fc["features"] if f["properties"]["nota_ideb_media"] is not None}
+    assert with_ideb == {"11", "12", "25"}
+    assert snap.partitions.stats()["loaded"] == [settings.default_uf]